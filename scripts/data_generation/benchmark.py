@@ -0,0 +1,245 @@
+"""Benchmarks for the generators and loaders.
+
+Every case runs in its own subprocess inside a scratch directory, once per
+scale factor (a fraction of the default row counts), and reports rows/sec, wall
+time and peak RSS. Results are written as JSON; --compare checks them against
+an earlier results file and exits non-zero when a case got slower than
+--threshold allows.
+
+The loaders run against db.py's SQLite backend, starting from empty
+master_script.sql tables in the scratch directory, so no SQL Server is needed.
+The loader numbers therefore track the Python-side cost of parsing and
+batching, not the server's insert speed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = 'benchmark_results.json'
+STANDIN_PATH = 'benchmark.db'
+DEFAULT_SCALES = [0.01, 0.1]
+DEFAULT_THRESHOLD = 0.2
+SEED = 22
+AS_OF = '2025-06-01 00:00:00'
+
+# Default row counts of the generator scripts, scaled per run.
+SIZES = {
+    'products': 100000,
+    'users': 10000,
+    'admins': 100,
+    'cart': 50000,
+    'orders': 500000,
+    'order_items': 400000,
+}
+
+# kind is 'row', 'columnar', 'sharded', 'script' or 'load'. For generators,
+# `args` names the SIZES passed positionally and `output` is the CSV whose rows
+# are counted; for loaders, `output` lists the tables whose rows are counted
+# and `requires` the cases that write their input CSVs.
+Case = namedtuple('Case', ['name', 'module', 'function', 'kind', 'args', 'output', 'requires'], defaults=((),))
+
+CASES = [
+    Case('categories', 'generate_categories', None, 'script', (), 'categories.csv'),
+    Case('products', 'generate_products', 'generate_products', 'row', ('products',), 'products.csv'),
+    Case('products-columnar', 'generate_products', 'generate_products_columnar', 'columnar', ('products',), 'products.csv'),
+    Case('products-sharded', 'generate_products', 'generate_products_sharded', 'sharded', ('products',), 'products.csv'),
+    Case('users', 'generate_users', 'generate_users', 'row', ('users',), 'users.csv'),
+    Case('users-columnar', 'generate_users', 'generate_users_columnar', 'columnar', ('users',), 'users.csv'),
+    Case('admins', 'generate_admins', 'generate_admins', 'row', ('admins',), 'admins.csv'),
+    Case('cart', 'generate_cart', 'generate_cart_items', 'row', ('cart', 'users', 'products'), 'cart.csv'),
+    Case('cart-columnar', 'generate_cart', 'generate_cart_items_columnar', 'columnar',
+         ('cart', 'users', 'products'), 'cart.csv'),
+    Case('cart-sharded', 'generate_cart', 'generate_cart_items_sharded', 'sharded',
+         ('cart', 'users', 'products'), 'cart.csv'),
+    Case('orders', 'generate_orders', 'generate_orders', 'row', ('orders', 'users'), 'orders.csv'),
+    Case('orders-columnar', 'generate_orders', 'generate_orders_columnar', 'columnar', ('orders', 'users'), 'orders.csv'),
+    Case('orders-sharded', 'generate_orders', 'generate_orders_sharded', 'sharded', ('orders', 'users'), 'orders.csv'),
+    Case('order_items', 'generate_order_items', 'generate_order_items', 'row',
+         ('order_items', 'orders', 'products'), 'order_items.csv'),
+    Case('order_items-columnar', 'generate_order_items', 'generate_order_items_columnar', 'columnar',
+         ('order_items', 'orders', 'products'), 'order_items.csv'),
+    Case('order_items-sharded', 'generate_order_items', 'generate_order_items_sharded', 'sharded',
+         ('order_items', 'orders', 'products'), 'order_items.csv'),
+    Case('load_categories_products', 'load_categories_products', 'load_categories_products', 'load',
+         (), ('Category', 'Product'), ('categories', 'products-columnar')),
+    Case('load_users_cart', 'load_users_cart', 'load_users_cart', 'load', (), ('User', 'Admin', 'Cart'),
+         ('users-columnar', 'admins', 'cart-columnar')),
+    Case('load_orders', 'load_orders', 'load_orders', 'load', (), ('Order', 'OrderItem'),
+         ('orders-columnar', 'order_items-columnar')),
+]
+
+CASES_BY_NAME = {case.name: case for case in CASES}
+
+
+def scaled_sizes(scale):
+    return {name: max(1, int(size * scale)) for name, size in SIZES.items()}
+
+
+def _count_rows(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f) - 1
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS; sharded cases also count their workers.
+    unit = 1 if sys.platform == 'darwin' else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * unit / (1024 * 1024)
+
+
+def run_case(case, scale):
+    """Run one case in the current directory and return its measurements."""
+    sizes = scaled_sizes(scale)
+    args = [sizes[name] for name in case.args]
+    random.seed(SEED)
+
+    if case.kind == 'script':
+        start = time.perf_counter()
+        runpy.run_path(os.path.join(SCRIPT_DIR, f"{case.module}.py"), run_name='__main__')
+        seconds = time.perf_counter() - start
+        rows = _count_rows(case.output)
+    elif case.kind == 'load':
+        from db import SqliteBackend
+        backend = SqliteBackend(STANDIN_PATH)
+        backend.reset()
+        conn = backend.connect()
+        function = getattr(__import__(case.module), case.function)
+        start = time.perf_counter()
+        function(conn)
+        seconds = time.perf_counter() - start
+        cursor = conn.cursor()
+        rows = sum(cursor.execute(f"SELECT COUNT(*) FROM [{table}]").fetchone()[0] for table in case.output)
+        conn.close()
+    else:
+        kwargs = {}
+        if case.kind in ('columnar', 'sharded'):
+            kwargs = {'seed': SEED, 'as_of': AS_OF}
+        function = getattr(__import__(case.module), case.function)
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        rows = _count_rows(case.output)
+
+    return {
+        'case': case.name,
+        'scale': scale,
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else 0.0,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def _run_in_subprocess(case, scale, workdir):
+    command = [sys.executable, os.path.abspath(__file__), '--run-case', case.name, '--scale', str(scale)]
+    completed = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{case.name} at scale {scale} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout)
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, selected=None):
+    """Run the cases at each scale, in CASES order so loaders find the generated CSVs.
+
+    Cases a selected loader requires but that were not selected themselves are
+    run to produce its input, without being reported.
+    """
+    cases = [case for case in CASES if not selected or any(name in case.name for name in selected)]
+    names = {case.name for case in cases}
+    needed = names | {name for case in cases for name in case.requires}
+    results = []
+    for scale in scales:
+        workdir = tempfile.mkdtemp(prefix='benchmark_')
+        try:
+            for case in CASES:
+                if case.name not in needed:
+                    continue
+                result = _run_in_subprocess(case, scale, workdir)
+                if case.name not in names:
+                    continue
+                results.append(result)
+                print(f"{case.name:<28} scale {scale:<6} {result['rows']:>9} rows {result['seconds']:>9.2f}s "
+                      f"{result['rows_per_sec']:>12,.0f} rows/sec {result['peak_rss_mb']:>8.1f} MB")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def save_results(results, path=RESULTS_PATH):
+    report = {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {len(results)} results to {path}")
+
+
+def compare(results, baseline_path, threshold=DEFAULT_THRESHOLD):
+    """Print rows/sec against a baseline file and return the cases that regressed beyond `threshold`."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['case'], r['scale']): r for r in json.load(f)['results']}
+
+    regressions = []
+    for result in results:
+        before = baseline.get((result['case'], result['scale']))
+        if before is None or not before['rows_per_sec']:
+            continue
+        change = result['rows_per_sec'] / before['rows_per_sec'] - 1
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(result)
+        print(f"{result['case']:<28} scale {result['scale']:<6} {before['rows_per_sec']:>12,.0f} -> "
+              f"{result['rows_per_sec']:>12,.0f} rows/sec ({change:+.1%}), "
+              f"{before['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the generators and loaders")
+    parser.add_argument('--scales', type=float, nargs='+', default=DEFAULT_SCALES,
+                        help=f"fractions of the default row counts to run at (default: {DEFAULT_SCALES})")
+    parser.add_argument('--cases', nargs='+', default=None, help="only run cases whose name contains one of these")
+    parser.add_argument('--output', default=RESULTS_PATH, help=f"results file (default: {RESULTS_PATH})")
+    parser.add_argument('--compare', default=None, help="baseline results file to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed rows/sec drop before a case counts as a regression (default: 0.2)")
+    parser.add_argument('--run-case', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Child process: run a single case in the current directory and print its result.
+        sys.path.insert(0, SCRIPT_DIR)
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                result = run_case(CASES_BY_NAME[args.run_case], args.scale)
+            finally:
+                sys.stdout = stdout
+        print(json.dumps(result))
+        sys.exit(0)
+
+    results = run_benchmarks(args.scales, args.cases)
+    save_results(results, args.output)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} cases regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
@@ -0,0 +1,302 @@
+"""Build and load the whole dataset from one scale factor.
+
+Scale factor 1 is the row counts the generator scripts default to (100,000
+products, 10,000 users, 50,000 cart items, 500,000 orders and 400,000 order
+items); every table is sized from the same factor, so no generator is told a
+different number of users, products or orders than the one that made them.
+Categories are a fixed list and admins a fixed 100, so neither is scaled.
+
+The build is a DAG of steps, each naming the steps it needs:
+
+    generate-orders      -> generate-order-items   (reads order_dates.npy)
+    load-categories      -> load-products
+    load-users           -> load-cart, load-orders
+    load-products        -> load-cart, load-order-items
+    load-orders          -> load-order-items -> reconcile-stock
+
+and every load also needs its own table's generate step. Nothing else is
+ordered: whenever a step's requirements are done it starts in the process pool,
+so the generators run side by side and the loads of early tables overlap the
+generation of later ones. The build then takes as long as its critical path,
+which is printed at the end next to the sum of all steps. --load-jobs caps how
+many steps write to the database at once; SQLite takes one writer at a time, so
+it defaults to 1 there.
+
+Each load uses its own connection and checkpoint file, and disables only the
+trigger and the secondary indexes (index_management.py) of its own table.
+Stock is applied once, by reconcile-stock, from the order items file. With
+--validate the CSVs are checked by validate_csv.py after generation and before
+any load.
+"""
+import argparse
+import os
+import random
+import runpy
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from bulk_load import DEFAULT_STRATEGY, add_strategy_argument
+from checkpoint import LoadCheckpoint, load_columns, load_csv
+from colstore import add_format_argument, output_path
+from db import DEFAULT_BACKEND, add_backend_argument, connect
+from distributions import DEFAULT_PROFILE, add_profile_argument
+from generate_admins import generate_admins
+from generate_cart import generate_cart_items_columnar
+from generate_order_items import generate_order_items_columnar
+from generate_orders import generate_orders_columnar
+from generate_products import generate_products_columnar
+from generate_users import generate_users_columnar
+from index_management import add_index_argument, indexes_disabled
+from instrumentation import METRICS, add_metrics_argument, configure, export
+from reconcile_stock import reconcile_stock
+from schema import TABLES
+from validate_csv import validate_all
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_SIZE = 5000
+DEFAULT_LOAD_JOBS = 4
+
+# Row counts at scale factor 1.
+SIZES = {
+    'products': 100000,
+    'users': 10000,
+    'admins': 100,
+    'cart': 50000,
+    'orders': 500000,
+    'order_items': 400000,
+}
+
+# Tables whose loads disable a trigger, and the trigger.
+TRIGGERS = {
+    'Cart': 'trg_InsteadOfCart_ValidateStock',
+    'OrderItem': 'trg_AfterOrderItem_UpdateStock',
+}
+
+# `function(**kwargs)` runs in a pool worker; `database` steps count against --load-jobs.
+Step = namedtuple('Step', ['name', 'requires', 'database', 'function', 'kwargs'])
+
+
+def scaled_sizes(scale):
+    sizes = {name: max(1, int(size * scale)) for name, size in SIZES.items()}
+    sizes['admins'] = SIZES['admins']
+    return sizes
+
+
+def step_seed(seed, stream):
+    """Independent seed for one generator step, derived from --seed like sharding.shard_rng derives one per shard."""
+    return None if seed is None else np.random.SeedSequence(seed, spawn_key=(stream,))
+
+
+def generate_categories():
+    runpy.run_path(os.path.join(SCRIPT_DIR, 'generate_categories.py'), run_name='__main__')
+
+
+def generate_admins_seeded(num_admins, seed=None):
+    random.seed(seed)
+    generate_admins(num_admins)
+
+
+def load_table(table_name, csv_path, label, strategy=DEFAULT_STRATEGY, backend=DEFAULT_BACKEND, data_format='csv',
+               keep_indexes=False):
+    """Load one generated table over its own connection."""
+    table = TABLES[table_name]
+    conn = connect(backend)
+    cursor = conn.cursor()
+    checkpoint = LoadCheckpoint(conn, f"build_dataset.{table_name}")
+    trigger = TRIGGERS.get(table_name)
+    if trigger:
+        conn.backend.disable_trigger(cursor, table_name, trigger)
+        conn.commit()
+    try:
+        with indexes_disabled(conn, [table], keep_indexes):
+            if data_format == 'columns':
+                load_columns(conn, checkpoint, table, output_path(csv_path, data_format), label, strategy, BATCH_SIZE)
+            else:
+                load_csv(conn, checkpoint, table, output_path(csv_path, data_format), label, strategy, BATCH_SIZE)
+    finally:
+        if trigger:
+            conn.backend.enable_trigger(cursor, table_name, trigger)
+            conn.commit()
+        cursor.close()
+        conn.close()
+    checkpoint.clear()
+
+
+def reconcile(path, backend=DEFAULT_BACKEND):
+    conn = connect(backend)
+    try:
+        reconcile_stock(conn, path)
+    finally:
+        conn.close()
+
+
+def validate(data_format='csv'):
+    rejected = validate_all('.', data_format=data_format)
+    print(f"{rejected} rows rejected in total")
+
+
+def build_steps(sizes, seed=None, as_of=None, data_format='csv', profile=DEFAULT_PROFILE, strategy=DEFAULT_STRATEGY,
+                backend=DEFAULT_BACKEND, load=True, validated=False, keep_indexes=False):
+    # Each NumPy generator gets its own stream of --seed; with one shared seed every table would draw the same
+    # numbers and row i of one table would mirror row i of another.
+    common = {'as_of': as_of, 'data_format': data_format}
+    steps = [
+        Step('generate-categories', (), False, generate_categories, {}),
+        Step('generate-products', (), False, generate_products_columnar,
+             dict(num_products=sizes['products'], profile=profile, seed=step_seed(seed, 0), **common)),
+        Step('generate-users', (), False, generate_users_columnar,
+             dict(num_users=sizes['users'], seed=step_seed(seed, 1), **common)),
+        Step('generate-admins', (), False, generate_admins_seeded, dict(num_admins=sizes['admins'], seed=seed)),
+        Step('generate-cart', (), False, generate_cart_items_columnar,
+             dict(num_items=sizes['cart'], num_users=sizes['users'], num_products=sizes['products'], profile=profile,
+                  seed=step_seed(seed, 2), **common)),
+        Step('generate-orders', (), False, generate_orders_columnar,
+             dict(num_orders=sizes['orders'], num_users=sizes['users'], profile=profile, seed=step_seed(seed, 3),
+                  **common)),
+        Step('generate-order-items', ('generate-orders',), False, generate_order_items_columnar,
+             dict(num_items=sizes['order_items'], num_orders=sizes['orders'], num_products=sizes['products'],
+                  profile=profile, seed=step_seed(seed, 4), **common)),
+    ]
+    generated = tuple(step.name for step in steps)
+    if validated:
+        steps.append(Step('validate', generated, False, validate, dict(data_format=data_format)))
+    if not load:
+        return steps
+
+    loads = [
+        # (step, table, csv, label, requires); categories and admins only exist as CSV.
+        ('load-categories', 'Category', 'categories.csv', "categories", ()),
+        ('load-products', 'Product', 'products.csv', "products", ('load-categories',)),
+        ('load-users', 'User', 'users.csv', "users", ()),
+        ('load-admins', 'Admin', 'admins.csv', "admins", ()),
+        ('load-cart', 'Cart', 'cart.csv', "cart items", ('load-users', 'load-products')),
+        ('load-orders', 'Order', 'orders.csv', "orders", ('load-users',)),
+        ('load-order-items', 'OrderItem', 'order_items.csv', "order items", ('load-orders', 'load-products')),
+    ]
+    for name, table_name, csv_path, label, requires in loads:
+        source = 'generate-' + name[len('load-'):]
+        table_format = 'csv' if table_name in ('Category', 'Admin') else data_format
+        requires = requires + (('validate',) if validated else (source,))
+        steps.append(Step(name, requires, True, load_table,
+                          dict(table_name=table_name, csv_path=csv_path, label=label, strategy=strategy,
+                               backend=backend, data_format=table_format, keep_indexes=keep_indexes)))
+    steps.append(Step('reconcile-stock', ('load-order-items',), True, reconcile,
+                      dict(path=output_path('order_items.csv', data_format), backend=backend)))
+    return steps
+
+
+def _run_step(function, kwargs, instrument):
+    # Pool workers are reused across steps, so each step records into an emptied
+    # registry and hands it back to the parent, like a shard in sharding.py.
+    METRICS.enabled = instrument
+    METRICS.samples, METRICS.rows, METRICS.spans = {}, {}, {}
+    function(**kwargs)
+    return METRICS.snapshot() if instrument else None
+
+
+def run_steps(steps, jobs=None, load_jobs=1):
+    """Run `steps` as soon as their requirements finish; return {name: (start, end)} in seconds."""
+    # Database steps mostly wait on the server, so they get slots on top of one per core.
+    jobs = jobs or (os.cpu_count() or 1) + load_jobs
+    names = {step.name for step in steps}
+    for step in steps:
+        unknown = set(step.requires) - names
+        if unknown:
+            raise ValueError(f"{step.name} requires unknown steps {sorted(unknown)}")
+
+    pending = list(steps)
+    running = {}
+    times = {}
+    origin = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            writers = sum(step.database for step in running.values())
+            for step in list(pending):
+                if len(running) >= jobs:
+                    break
+                if any(name not in times or times[name][1] is None for name in step.requires):
+                    continue
+                if step.database and writers >= load_jobs:
+                    continue
+                pending.remove(step)
+                writers += step.database
+                print(f"[{time.perf_counter() - origin:7.1f}s] starting {step.name}")
+                times[step.name] = (time.perf_counter() - origin, None)
+                running[pool.submit(_run_step, step.function, step.kwargs, METRICS.enabled)] = step
+            if not running:
+                raise ValueError(f"steps {[step.name for step in pending]} depend on each other in a cycle")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                snapshot = future.result()
+                if snapshot:
+                    METRICS.merge(snapshot)
+                start = times[step.name][0]
+                times[step.name] = (start, time.perf_counter() - origin)
+                print(f"[{times[step.name][1]:7.1f}s] finished {step.name} in {times[step.name][1] - start:.1f}s")
+
+    return times
+
+
+def critical_path(steps, times):
+    """The chain of steps, each waiting on the requirement that finished last, that ends the build."""
+    requires = {step.name: step.requires for step in steps}
+    name = max(times, key=lambda n: times[n][1])
+    path = [name]
+    while requires[name]:
+        name = max(requires[name], key=lambda n: times[n][1])
+        path.append(name)
+    return path[::-1]
+
+
+def build_dataset(scale=1.0, seed=None, as_of=None, data_format='csv', profile=DEFAULT_PROFILE,
+                  strategy=DEFAULT_STRATEGY, backend=DEFAULT_BACKEND, jobs=None, load_jobs=None, load=True,
+                  validated=False, keep_indexes=False):
+    sizes = scaled_sizes(scale)
+    print(f"Scale factor {scale}: " + ', '.join(f"{count} {name}" for name, count in sizes.items()))
+    if load_jobs is None:
+        load_jobs = 1 if backend == 'sqlite' else DEFAULT_LOAD_JOBS
+
+    steps = build_steps(sizes, seed, as_of, data_format, profile, strategy, backend, load, validated, keep_indexes)
+    times = run_steps(steps, jobs, load_jobs)
+
+    total = max(end for _, end in times.values())
+    print(f"\nDataset built in {total:.1f}s; its steps took {sum(end - start for start, end in times.values()):.1f}s "
+          f"in total")
+    print("Critical path: " + ' -> '.join(f"{name} ({times[name][1] - times[name][0]:.1f}s)"
+                                          for name in critical_path(steps, times)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate and load every table, sized by one scale factor")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="scale factor; 1 is 100,000 products and 500,000 orders, 0.1 a tenth of that (default: 1)")
+    parser.add_argument('--seed', type=int, default=None, help="random seed; the same seed reproduces the same rows")
+    parser.add_argument('--as-of', default=None, help="reference 'YYYY-MM-DD HH:MM:SS' that dates count back from (default: now)")
+    add_format_argument(parser)
+    add_profile_argument(parser)
+    parser.add_argument('--jobs', type=int, default=None, help="steps run at once (default: one per core plus --load-jobs)")
+    parser.add_argument('--load-jobs', type=int, default=None,
+                        help=f"steps writing to the database at once (default: 1 on sqlite, {DEFAULT_LOAD_JOBS} otherwise)")
+    parser.add_argument('--no-load', action='store_true', help="only generate the files")
+    parser.add_argument('--validate', action='store_true', help="run validate_csv.py on the CSVs before loading them")
+    add_strategy_argument(parser)
+    add_index_argument(parser)
+    add_backend_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    if args.validate and args.data_format == 'columns':
+        parser.error("--validate checks CSVs; use --format csv, csv.gz or csv.zst")
+    configure(args.metrics)
+
+    try:
+        build_dataset(args.scale, args.seed, args.as_of, args.data_format, args.profile, args.strategy, args.backend,
+                      args.jobs, args.load_jobs, not args.no_load, args.validate, args.keep_indexes)
+        export(args.metrics)
+    except Exception as e:
+        print(f"Error: {e}")
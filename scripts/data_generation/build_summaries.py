@@ -0,0 +1,331 @@
+"""Precomputed order and product summaries for dashboards.
+
+The UserOrderSummary and ProductSales CTEs in 09_ctes.sql group all of [Order]
+and OrderItem every time they run. This script computes the same aggregates
+in one pass over orders.csv and order_items.csv (or their column stores), a
+chunk at a time with np.bincount, and bulk-loads them into two tables:
+
+    UserOrderSummary  UserID, TotalOrders, TotalSpent, AverageOrderValue, LastOrderDate
+    ProductSales      ProductID, TimesOrdered, TotalQuantitySold, TotalRevenue
+
+Only users with orders and products that were ordered get a row; the CTEs
+filter the others out as well. Names, categories and stock are joined in at
+query time from their own tables by primary key, e.g.
+
+    SELECT TOP 10 u.FirstName, u.LastName, s.TotalSpent
+    FROM UserOrderSummary s INNER JOIN [User] u ON u.UserID = s.UserID
+    ORDER BY s.TotalSpent DESC;
+
+Money is summed in cents, so the totals match the database's DECIMAL sums.
+TimesOrdered counts distinct orders per product. order_items.csv lists items in
+random OrderID order, so a full build keeps one 8-byte code per distinct
+(OrderID, ProductID) pair until the end of the pass; delta.py generates items
+grouped by order and counts them a batch at a time instead.
+
+A full build drops and re-creates both tables. delta.py --summaries merges the
+aggregates of the rows it appends into the existing tables instead (see
+merge_summaries), so the summaries stay current without another full pass.
+"""
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from bulk_load import DEFAULT_STRATEGY, BulkLoader, add_strategy_argument
+from colstore import ColumnStoreReader, add_format_argument, output_path
+from columnar import format_dates
+from compressed_io import open_text_input
+from db import add_backend_argument, connect
+from schema import Column, Table
+
+CHUNK_SIZE = 100000
+BATCH_SIZE = 5000
+
+USER_ORDER_SUMMARY = Table('UserOrderSummary', None, [
+    Column('UserID', 'INT'),
+    Column('TotalOrders', 'INT'),
+    Column('TotalSpent', 'DECIMAL(18,2)'),
+    Column('AverageOrderValue', 'DECIMAL(18,2)'),
+    Column('LastOrderDate', 'DATETIME'),
+])
+
+PRODUCT_SALES = Table('ProductSales', None, [
+    Column('ProductID', 'INT'),
+    Column('TimesOrdered', 'INT'),
+    Column('TotalQuantitySold', 'INT'),
+    Column('TotalRevenue', 'DECIMAL(18,2)'),
+])
+
+# (OrderID, ProductID) pairs are encoded as OrderID << ORDER_SHIFT | ProductID.
+ORDER_SHIFT = 31
+
+
+def _cents(amounts):
+    return np.round(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+
+def _grow(values, size, fill=0):
+    if len(values) >= size:
+        return values
+    grown = np.full(size, fill, dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+class UserOrderTally:
+    """Running order count, spend (in cents) and latest OrderDate (epoch seconds) per UserID, as dense arrays."""
+
+    def __init__(self):
+        self.orders = np.zeros(0, dtype=np.int64)
+        self.spent = np.zeros(0, dtype=np.int64)
+        self.last = np.zeros(0, dtype=np.int64)
+
+    def add(self, user_ids, amounts, order_dates):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if not len(user_ids):
+            return
+        size = max(len(self.orders), int(user_ids.max()) + 1)
+        self.orders = _grow(self.orders, size)
+        self.spent = _grow(self.spent, size)
+        self.last = _grow(self.last, size)
+        self.orders += np.bincount(user_ids, minlength=size)
+        self.spent += np.bincount(user_ids, weights=_cents(amounts), minlength=size).astype(np.int64)
+        seconds = np.asarray(order_dates).astype('datetime64[s]').astype(np.int64)
+        np.maximum.at(self.last, user_ids, seconds)
+
+    def rows(self):
+        """(UserID, TotalOrders, TotalSpent, AverageOrderValue, LastOrderDate) for every user with orders."""
+        user_ids = np.flatnonzero(self.orders)
+        orders = self.orders[user_ids]
+        spent = self.spent[user_ids]
+        average = np.round(spent / orders) / 100
+        return list(zip(user_ids.tolist(), orders.tolist(), (spent / 100).tolist(), average.tolist(),
+                        format_dates(self.last[user_ids].astype('datetime64[s]')).tolist()))
+
+
+class ProductSalesTally:
+    """Running quantity, revenue (in cents) and distinct orders per ProductID.
+
+    With `grouped`, each batch must hold its items grouped by ascending OrderID,
+    as delta.py generates them. Distinct (OrderID, ProductID) pairs are then
+    counted a batch at a time, and only the pairs of the batch's last order are
+    carried into the next batch, in case that order continues there. Without it
+    (order_items.csv is in random OrderID order) the pairs seen so far are kept
+    in one sorted array. Each batch's distinct pairs are looked up in it with a
+    binary search, and the new ones are counted and inserted at the positions
+    found, so the array is never sorted again.
+    """
+
+    def __init__(self, grouped=False):
+        self.grouped = grouped
+        self.quantity = np.zeros(0, dtype=np.int64)
+        self.revenue = np.zeros(0, dtype=np.int64)
+        self.times = np.zeros(0, dtype=np.int64)
+        self.last_order = 0
+        self.open_pairs = np.zeros(0, dtype=np.int64)
+        self.seen_pairs = np.zeros(0, dtype=np.int64)
+
+    def add(self, order_ids, product_ids, quantities, prices):
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        if not len(product_ids):
+            return
+        order_ids = np.asarray(order_ids, dtype=np.int64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        size = max(len(self.quantity), int(product_ids.max()) + 1)
+        self.quantity = _grow(self.quantity, size)
+        self.revenue = _grow(self.revenue, size)
+        self.times = _grow(self.times, size)
+        self.quantity += np.bincount(product_ids, weights=quantities, minlength=size).astype(np.int64)
+        line_cents = quantities * _cents(prices)
+        self.revenue += np.bincount(product_ids, weights=line_cents, minlength=size).astype(np.int64)
+
+        pairs = (order_ids << ORDER_SHIFT) | product_ids
+        if not self.grouped:
+            pairs = np.unique(pairs)
+            positions = np.searchsorted(self.seen_pairs, pairs)
+            known = np.zeros(len(pairs), dtype=bool)
+            if len(self.seen_pairs):
+                known = self.seen_pairs[np.minimum(positions, len(self.seen_pairs) - 1)] == pairs
+            self.times += np.bincount(pairs[~known] & ((1 << ORDER_SHIFT) - 1), minlength=size)
+            self.seen_pairs = np.insert(self.seen_pairs, positions[~known], pairs[~known])
+            return
+        if order_ids[0] < self.last_order or np.any(np.diff(order_ids) < 0):
+            raise ValueError("order items are not grouped by ascending OrderID")
+        # union1d sorts the codes, so the last order's pairs are the ones from `split` on.
+        pairs = np.union1d(self.open_pairs, pairs)
+        self.last_order = int(order_ids[-1])
+        split = np.searchsorted(pairs, self.last_order << ORDER_SHIFT)
+        self.times += np.bincount(pairs[:split] & ((1 << ORDER_SHIFT) - 1), minlength=size)
+        self.open_pairs = pairs[split:]
+
+    def times_ordered(self):
+        open_counts = np.bincount(self.open_pairs & ((1 << ORDER_SHIFT) - 1), minlength=len(self.times))
+        return self.times + open_counts[:len(self.times)]
+
+    def rows(self):
+        """(ProductID, TimesOrdered, TotalQuantitySold, TotalRevenue) for every product that was ordered."""
+        product_ids = np.flatnonzero(self.quantity)
+        times = self.times_ordered()[product_ids]
+        return list(zip(product_ids.tolist(), times.tolist(), self.quantity[product_ids].tolist(),
+                        (self.revenue[product_ids] / 100).tolist()))
+
+
+def read_chunks(path, names, chunk_size=CHUNK_SIZE):
+    """Yield lists of column arrays from a CSV (as strings) or a column store (one chunk at a time)."""
+    if os.path.isdir(path):
+        reader = ColumnStoreReader(path)
+        for chunk in reader.chunks:
+            yield [reader.column(chunk, name) for name in names]
+        return
+
+    with open_text_input(path) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        indexes = [header.index(name) for name in names]
+        columns = [[] for _ in names]
+        for row in reader:
+            for column, index in zip(columns, indexes):
+                column.append(row[index])
+            if len(columns[0]) >= chunk_size:
+                yield [np.asarray(column) for column in columns]
+                columns = [[] for _ in names]
+        if columns[0]:
+            yield [np.asarray(column) for column in columns]
+
+
+def tally_orders(path='orders.csv'):
+    tally = UserOrderTally()
+    for user_ids, amounts, order_dates in read_chunks(path, ['UserID', 'TotalAmount', 'OrderDate']):
+        tally.add(user_ids.astype(np.int64), amounts.astype(np.float64), order_dates)
+    return tally
+
+
+def tally_order_items(path='order_items.csv'):
+    tally = ProductSalesTally()
+    for columns in read_chunks(path, ['OrderID', 'ProductID', 'Quantity', 'PriceAtPurchase']):
+        order_ids, product_ids, quantities, prices = columns
+        tally.add(order_ids.astype(np.int64), product_ids.astype(np.int64), quantities.astype(np.int64),
+                  prices.astype(np.float64))
+    return tally
+
+
+def create_table_sql(table, key):
+    columns = ', '.join(f"{c.name} {c.sql_type} NOT NULL" for c in table.columns)
+    return f"CREATE TABLE {table.name} ({columns}, PRIMARY KEY ({key}));"
+
+
+def _insert(conn, table, rows, strategy=None):
+    loader = BulkLoader(conn, table, strategy, BATCH_SIZE)
+    for start in range(0, len(rows), BATCH_SIZE):
+        loader.insert(rows[start:start + BATCH_SIZE])
+    return loader.finish()
+
+
+def load_summaries(conn, user_tally, product_tally, strategy=DEFAULT_STRATEGY):
+    """Replace both summary tables with the tallied rows."""
+    cursor = conn.cursor()
+    for table, key in ((USER_ORDER_SUMMARY, 'UserID'), (PRODUCT_SALES, 'ProductID')):
+        cursor.execute(f"DROP TABLE IF EXISTS {table.name};")
+        cursor.execute(create_table_sql(table, key))
+    conn.commit()
+    cursor.close()
+
+    _insert(conn, USER_ORDER_SUMMARY, user_tally.rows(), strategy)
+    _insert(conn, PRODUCT_SALES, product_tally.rows(), strategy)
+
+
+def check_summary_tables(conn):
+    """Raise unless both summary tables exist, so a merge can be ruled out before anything is loaded."""
+    cursor = conn.cursor()
+    missing = [table.name for table in (USER_ORDER_SUMMARY, PRODUCT_SALES)
+               if not conn.backend.table_exists(cursor, table.name)]
+    cursor.close()
+    if missing:
+        raise ValueError(f"missing summary tables {', '.join(missing)}; run build_summaries.py first")
+
+
+def merge_summaries(conn, user_tally, product_tally):
+    """Add the aggregates of newly appended orders and items to the existing summary rows.
+
+    New orders are distinct from the ones already summarised, so order counts,
+    sums and TimesOrdered add up exactly.
+    """
+    user_delta = Table('#UserOrderSummaryDelta', None, USER_ORDER_SUMMARY.columns)
+    product_delta = Table('#ProductSalesDelta', None, PRODUCT_SALES.columns)
+    cursor = conn.cursor()
+    for table, key in ((user_delta, 'UserID'), (product_delta, 'ProductID')):
+        cursor.execute(f"DROP TABLE IF EXISTS {table.name};")
+        cursor.execute(create_table_sql(table, key))
+    users = _insert(conn, user_delta, user_tally.rows())
+    products = _insert(conn, product_delta, product_tally.rows())
+
+    cursor.execute(f"""
+        UPDATE UserOrderSummary
+        SET TotalOrders = UserOrderSummary.TotalOrders + d.TotalOrders,
+            TotalSpent = UserOrderSummary.TotalSpent + d.TotalSpent,
+            AverageOrderValue = (UserOrderSummary.TotalSpent + d.TotalSpent)
+                                / (UserOrderSummary.TotalOrders + d.TotalOrders),
+            LastOrderDate = CASE WHEN d.LastOrderDate > UserOrderSummary.LastOrderDate
+                                 THEN d.LastOrderDate ELSE UserOrderSummary.LastOrderDate END
+        FROM {user_delta.name} d
+        WHERE UserOrderSummary.UserID = d.UserID;
+    """)
+    cursor.execute(f"""
+        INSERT INTO UserOrderSummary (UserID, TotalOrders, TotalSpent, AverageOrderValue, LastOrderDate)
+        SELECT d.UserID, d.TotalOrders, d.TotalSpent, d.AverageOrderValue, d.LastOrderDate
+        FROM {user_delta.name} d
+        WHERE NOT EXISTS (SELECT 1 FROM UserOrderSummary s WHERE s.UserID = d.UserID);
+    """)
+    cursor.execute(f"""
+        UPDATE ProductSales
+        SET TimesOrdered = ProductSales.TimesOrdered + d.TimesOrdered,
+            TotalQuantitySold = ProductSales.TotalQuantitySold + d.TotalQuantitySold,
+            TotalRevenue = ProductSales.TotalRevenue + d.TotalRevenue
+        FROM {product_delta.name} d
+        WHERE ProductSales.ProductID = d.ProductID;
+    """)
+    cursor.execute(f"""
+        INSERT INTO ProductSales (ProductID, TimesOrdered, TotalQuantitySold, TotalRevenue)
+        SELECT d.ProductID, d.TimesOrdered, d.TotalQuantitySold, d.TotalRevenue
+        FROM {product_delta.name} d
+        WHERE NOT EXISTS (SELECT 1 FROM ProductSales s WHERE s.ProductID = d.ProductID);
+    """)
+    cursor.execute(f"DROP TABLE {user_delta.name};")
+    cursor.execute(f"DROP TABLE {product_delta.name};")
+    conn.commit()
+    cursor.close()
+    print(f"Merged {users} user and {products} product summary rows")
+
+
+def build_summaries(conn, orders_path='orders.csv', items_path='order_items.csv', strategy=DEFAULT_STRATEGY):
+    print(f"Summarising orders per user from {orders_path}...")
+    user_tally = tally_orders(orders_path)
+    print(f"{int(user_tally.orders.sum())} orders across {np.count_nonzero(user_tally.orders)} users")
+    print(f"Summarising order items per product from {items_path}...")
+    product_tally = tally_order_items(items_path)
+    print(f"{int(product_tally.quantity.sum())} units sold across {np.count_nonzero(product_tally.quantity)} products")
+    load_summaries(conn, user_tally, product_tally, strategy)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the UserOrderSummary and ProductSales tables from the generated orders")
+    parser.add_argument('--orders', default=None, help="orders CSV or column store (default: orders.csv / orders.cols)")
+    parser.add_argument('--order-items', default=None,
+                        help="order items CSV or column store (default: order_items.csv / order_items.cols)")
+    add_format_argument(parser)
+    add_strategy_argument(parser)
+    add_backend_argument(parser)
+    args = parser.parse_args()
+
+    try:
+        conn = connect(args.backend)
+        print("Connected to database successfully!")
+
+        build_summaries(conn, args.orders or output_path('orders.csv', args.data_format),
+                        args.order_items or output_path('order_items.csv', args.data_format), args.strategy)
+
+        conn.close()
+        print("\nSummaries built successfully!")
+    except Exception as e:
+        print(f"Error: {e}")
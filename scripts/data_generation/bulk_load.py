@@ -0,0 +1,207 @@
+"""Shared bulk-insert layer for the load_*.py scripts.
+
+A BulkLoader takes batches of row tuples for one table and inserts them with
+one of these strategies:
+
+    executemany  plain cursor.executemany, one round trip per row
+    fast         fast_executemany with explicit setinputsizes, one round trip per batch
+    tvp          each batch sent as a single table-valued parameter to a generated procedure
+    bcp          batches appended to a tab-delimited file, then loaded by the bcp utility
+
+Every loader reports rows/sec, so the strategies can be compared on the same data.
+Which strategies are available, and which one is the default, depends on the
+connection's backend (see db.py).
+"""
+import os
+import re
+import subprocess
+import time
+
+import db
+from instrumentation import batch_timer
+from schema import insert_sql, quoted
+
+STRATEGIES = ('executemany', 'fast', 'tvp', 'bcp')
+# None picks the backend's default: fast on SQL Server, executemany on SQLite.
+DEFAULT_STRATEGY = None
+
+
+def _length(sql_type):
+    match = re.search(r'\((\d+)', sql_type)
+    return int(match.group(1)) if match else 0
+
+
+def input_sizes(table):
+    """setinputsizes() arguments matching the values the loaders pass for each column."""
+    import pyodbc
+
+    sizes = []
+    for column in table.columns:
+        sql_type = column.sql_type
+        if sql_type == 'INT':
+            sizes.append((pyodbc.SQL_INTEGER, 0, 0))
+        elif sql_type == 'BIT':
+            sizes.append((pyodbc.SQL_BIT, 0, 0))
+        elif sql_type.startswith('DECIMAL'):
+            # Prices arrive as floats; the server converts them to DECIMAL(10,2).
+            sizes.append((pyodbc.SQL_DOUBLE, 0, 0))
+        elif sql_type == 'DATETIME':
+            # Dates arrive as 'YYYY-MM-DD HH:MM:SS' strings.
+            sizes.append((pyodbc.SQL_VARCHAR, 19, 0))
+        elif sql_type == 'TEXT':
+            sizes.append((pyodbc.SQL_VARCHAR, 4000, 0))
+        else:
+            sizes.append((pyodbc.SQL_VARCHAR, _length(sql_type), 0))
+    return sizes
+
+
+def tvp_type_name(table):
+    return f"dbo.{table.name}BulkRows"
+
+
+def tvp_proc_name(table):
+    return f"dbo.usp_BulkInsert_{table.name}"
+
+
+def _tvp_column_type(sql_type):
+    # TVP columns carry the Python-side values; INSERT ... SELECT converts them.
+    if sql_type == 'DATETIME':
+        return 'VARCHAR(19)'
+    if sql_type.startswith('DECIMAL'):
+        return 'FLOAT'
+    if sql_type == 'TEXT':
+        return 'VARCHAR(MAX)'
+    return sql_type
+
+
+def create_tvp_objects(cursor, table, tablock=False):
+    """(Re)create the table type and insert procedure used by the tvp strategy."""
+    names = ', '.join(c.name for c in table.columns)
+    definition = ', '.join(f"{c.name} {_tvp_column_type(c.sql_type)}" for c in table.columns)
+    body = f"INSERT INTO {quoted(table)}{' WITH (TABLOCK)' if tablock else ''} ({names}) SELECT {names} FROM @Rows;"
+    if table.identity:
+        body = f"SET IDENTITY_INSERT {quoted(table)} ON; {body} SET IDENTITY_INSERT {quoted(table)} OFF;"
+    cursor.execute(f"DROP PROCEDURE IF EXISTS {tvp_proc_name(table)};")
+    cursor.execute(f"DROP TYPE IF EXISTS {tvp_type_name(table)};")
+    cursor.execute(f"CREATE TYPE {tvp_type_name(table)} AS TABLE ({definition});")
+    cursor.execute(f"CREATE PROCEDURE {tvp_proc_name(table)} @Rows {tvp_type_name(table)} READONLY AS {body}")
+
+
+def write_bcp_format_file(table, path):
+    """Non-XML bcp format file mapping tab-delimited field i onto server column i."""
+    lines = ['14.0', str(len(table.columns))]
+    for i, column in enumerate(table.columns, 1):
+        terminator = r'\n' if i == len(table.columns) else r'\t'
+        lines.append(f'{i}\tSQLCHAR\t0\t0\t"{terminator}"\t{i}\t{column.name}\t""')
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _bcp_field(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return str(int(value))
+    return str(value)
+
+
+class BulkLoader:
+    """Insert batches of tuples into one table with the chosen strategy, timing each one.
+
+    `tablock` takes a table lock for minimally logged inserts into an empty or
+    staging table. Rows carry their own primary key, which is inserted into the
+    table's IDENTITY column (IDENTITY_INSERT / bcp -E); finish() then reseeds
+    the column past the highest loaded ID.
+    """
+
+    def __init__(self, conn, table, strategy=DEFAULT_STRATEGY, batch_size=5000, tablock=False):
+        strategy = strategy or conn.backend.default_strategy
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown bulk load strategy {strategy!r}, expected one of {STRATEGIES}")
+        if strategy not in conn.backend.strategies:
+            raise ValueError(f"the {conn.backend.name} backend supports the strategies {conn.backend.strategies}, "
+                             f"not {strategy!r}")
+        self.conn = conn
+        self.table = table
+        self.strategy = strategy
+        self.batch_size = batch_size
+        self.tablock = tablock
+        self.cursor = conn.cursor()
+        self.sql = insert_sql(table, tablock)
+        self.rows = 0
+        self.seconds = 0.0
+        self.timer = batch_timer(table.name)
+
+        if table.identity and strategy in ('executemany', 'fast'):
+            conn.backend.identity_insert(self.cursor, table, True)
+        if strategy == 'fast':
+            self.cursor.fast_executemany = True
+        elif strategy == 'tvp':
+            create_tvp_objects(self.cursor, table, tablock)
+            conn.commit()
+        elif strategy == 'bcp':
+            self.data_path = f"{table.name}.bcp.dat"
+            self.format_path = f"{table.name}.bcp.fmt"
+            write_bcp_format_file(table, self.format_path)
+            self.data_file = open(self.data_path, 'w', encoding='utf-8', newline='\n')
+
+    def insert(self, batch):
+        """Insert and commit one batch (for bcp: stage it until finish())."""
+        # Everything since the previous batch was spent preparing this one.
+        self.timer.lap('build')
+        start = time.perf_counter()
+        if self.strategy == 'executemany':
+            self.cursor.executemany(self.sql, batch)
+        elif self.strategy == 'fast':
+            self.cursor.setinputsizes(input_sizes(self.table))
+            self.cursor.executemany(self.sql, batch)
+        elif self.strategy == 'tvp':
+            self.cursor.execute(f"EXEC {tvp_proc_name(self.table)} ?", (batch,))
+        else:
+            self.data_file.writelines('\t'.join(_bcp_field(v) for v in row) + '\n' for row in batch)
+        self.timer.lap('execute')
+        if self.strategy != 'bcp':
+            self.conn.commit()
+            self.timer.lap('commit', len(batch))
+        self.seconds += time.perf_counter() - start
+        self.rows += len(batch)
+
+    def _run_bcp(self):
+        self.data_file.close()
+        command = [
+            'bcp', f"{db.DATABASE}.dbo.{quoted(self.table)}", 'in', self.data_path,
+            '-f', self.format_path, '-S', db.SERVER, '-U', db.UID, '-P', db.PWD,
+            '-b', str(self.batch_size), '-h', 'TABLOCK', '-u',
+        ]
+        if self.table.identity:
+            command.append('-E')
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        os.remove(self.data_path)
+        os.remove(self.format_path)
+
+    def finish(self):
+        """Flush staged rows, reseed the IDENTITY column, close the cursor and print the achieved rows/sec."""
+        if self.strategy == 'bcp':
+            start = time.perf_counter()
+            self.timer.restart()
+            self._run_bcp()
+            self.timer.lap('bcp', self.rows)
+            self.seconds += time.perf_counter() - start
+        if self.table.identity:
+            if self.strategy in ('executemany', 'fast'):
+                self.conn.backend.identity_insert(self.cursor, self.table, False)
+            self.conn.backend.reseed(self.cursor, self.table)
+            self.conn.commit()
+        self.cursor.close()
+        self.report()
+        return self.rows
+
+    def report(self):
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        print(f"{self.table.name}: {self.rows} rows in {self.seconds:.2f}s "
+              f"({rate:,.0f} rows/sec, {self.strategy})")
+
+
+def add_strategy_argument(parser):
+    parser.add_argument('--strategy', choices=STRATEGIES, default=DEFAULT_STRATEGY,
+                        help="bulk insert strategy (default: fast on SQL Server, executemany on SQLite)")
@@ -0,0 +1,166 @@
+"""Checkpoints for resumable loads.
+
+Around every committed batch the loaders record, per table, the CSV byte offset
+just past the batch and the number of rows committed so far in
+<script>.checkpoint.json. With --resume a loader seeks straight to the last
+committed offset instead of reloading the table, and skips finished tables.
+Tables read from a column store (colstore.py) record a row offset instead of a
+byte offset. For compressed CSVs (compressed_io.py) the offset counts
+uncompressed bytes, and resuming reads forward to it.
+
+The entry for a batch is written as "pending" before the insert and promoted
+after the commit. On resume, a pending entry is kept only if the table's row
+count shows that its commit went through. A failure between commit and
+checkpoint therefore neither loses nor repeats a batch.
+"""
+import json
+import os
+
+from bulk_load import BulkLoader
+from colstore import ColumnStoreReader
+from instrumentation import METRICS
+from schema import quoted
+from typed_csv import TypedCsvReader
+
+
+class TableProgress:
+    """Checkpointed progress of one table within a load run."""
+
+    def __init__(self, checkpoint, table, state):
+        self.checkpoint = checkpoint
+        self.table = table
+        self.name = table.name
+        self.state = state
+        self.reader = None
+
+    @property
+    def complete(self):
+        return self.state.get('complete', False)
+
+    @property
+    def offset(self):
+        return self.state.get('offset')
+
+    @property
+    def rows(self):
+        return self.state.get('rows', 0)
+
+    def _announce(self, unit):
+        if self.complete:
+            print(f"{self.name} already loaded ({self.rows} rows), skipping...")
+        elif self.offset:
+            print(f"Resuming {self.name} at {unit} {self.offset} ({self.rows} rows already committed)...")
+
+    def open(self, path):
+        """Open the table's CSV positioned after the last committed row.
+
+        A table that finished in an earlier run is positioned at the end of its
+        file, so its load loop simply sees no rows.
+        """
+        self._announce('byte')
+        self.reader = TypedCsvReader(path, self.table, self.offset)
+        return self.reader
+
+    def open_columns(self, path):
+        """Open the table's column store positioned after the last committed row."""
+        self._announce('row')
+        self.reader = ColumnStoreReader(path, self.offset)
+        return self.reader
+
+    def insert(self, loader, batch, offset):
+        """Insert one batch through `loader`, checkpointing before and after the commit."""
+        if METRICS.enabled:
+            loader.timer.split('parse', self.reader.take_parse_seconds())
+        if loader.strategy == 'bcp':
+            # bcp only commits in finish(), so there is nothing to checkpoint per batch.
+            loader.insert(batch)
+            return
+        rows = self.rows + len(batch)
+        self.state['pending'] = {'offset': offset, 'rows': rows}
+        self.checkpoint.save()
+        loader.insert(batch)
+        self.state.update(offset=offset, rows=rows)
+        del self.state['pending']
+        self.checkpoint.save()
+
+    def finish(self, loader, offset):
+        if loader.strategy == 'bcp':
+            self.state['rows'] = self.rows + loader.rows
+        self.state.update(offset=offset, complete=True)
+        self.checkpoint.save()
+
+
+class LoadCheckpoint:
+    """The checkpoint file for one loader script."""
+
+    def __init__(self, conn, name, resume=False):
+        self.conn = conn
+        self.path = f"{name}.checkpoint.json"
+        self.tables = {}
+        if resume and os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.tables = json.load(f)
+
+    def start(self, table, csv_path):
+        """Progress for `table`, creating a fresh entry unless one was loaded by --resume."""
+        state = self.tables.get(table.name)
+        if state is None:
+            state = self.tables[table.name] = {'csv': csv_path, 'base_rows': self._count(table), 'rows': 0}
+            self.save()
+        elif 'pending' in state:
+            pending = state.pop('pending')
+            if self._count(table) == state['base_rows'] + pending['rows']:
+                state.update(pending)
+            self.save()
+        return TableProgress(self, table, state)
+
+    def _count(self, table):
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COUNT_BIG(*) FROM {quoted(table)};")
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return count
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.tables, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """Remove the checkpoint once every table of the script has loaded."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def load_csv(conn, checkpoint, table, path, label, strategy=None, batch_size=5000):
+    """Load `table` from the CSV at `path`, checkpointing every batch."""
+    progress = checkpoint.start(table, path)
+    with progress.open(path) as reader:
+        loader = BulkLoader(conn, table, strategy, batch_size)
+        for batch in reader.batches(batch_size):
+            progress.insert(loader, batch, reader.offset)
+            print(f"Loaded {progress.rows} {label}...")
+
+        loader.finish()
+        progress.finish(loader, reader.offset)
+        print(f"Loaded {progress.rows} {label} successfully!")
+
+
+def load_columns(conn, checkpoint, table, path, label, strategy=None, batch_size=5000):
+    """Load `table` from the column store at `path`, checkpointing every batch."""
+    progress = checkpoint.start(table, path)
+    with progress.open_columns(path) as reader:
+        loader = BulkLoader(conn, table, strategy, batch_size)
+        for batch in reader.batches(batch_size):
+            progress.insert(loader, batch, reader.offset)
+            print(f"Loaded {progress.rows} {label}...")
+
+        loader.finish()
+        progress.finish(loader, reader.offset)
+        print(f"Loaded {progress.rows} {label} successfully!")
+
+
+def add_resume_argument(parser):
+    parser.add_argument('--resume', action='store_true',
+                        help="continue from the last checkpoint after a failed load instead of starting over")
@@ -0,0 +1,214 @@
+"""Columnar on-disk format for the generated tables.
+
+A table stored in this format is a directory, e.g. orders.cols/, instead of
+orders.csv:
+
+    orders.cols/manifest.json              table name, column names and dtypes
+    orders.cols/000000000001/OrderID.npy   one .npy file per column per chunk
+    orders.cols/000000000001/UserID.npy
+    ...
+
+Every column is fixed-width. The dtype comes from the column's SQL type in
+schema.py: INT as int32, BIT as uint8, DECIMAL as float64, DATETIME as
+datetime64[s], and strings as UTF-8 bytes padded to the chunk's longest value.
+Chunks are named after their first id, so sharded workers write their chunks
+straight into the same directory and nothing has to be concatenated afterwards.
+
+Readers open every file with np.load(mmap_mode='r'), so reading a column maps
+its bytes and nothing is parsed. Batches are cut as slices of those arrays.
+The only per-value work left is turning each slice into the Python values the
+DB driver binds.
+
+Arrow IPC or Parquet would do the same job, but pyarrow is not a dependency of
+these scripts and NumPy already is.
+
+The csv.gz and csv.zst formats are CSV compressed with compressed_io.py, e.g.
+orders.csv.gz.
+"""
+import bisect
+import csv
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from columnar import format_dates, write_chunk
+from compressed_io import open_text_output
+
+FORMATS = ('csv', 'csv.gz', 'csv.zst', 'columns')
+COMPRESSED_SUFFIXES = {'csv.gz': '.gz', 'csv.zst': '.zst'}
+MANIFEST = 'manifest.json'
+STORE_EXT = '.cols'
+
+
+def store_path(csv_path):
+    """Directory that holds the columnar form of `csv_path`, e.g. orders.csv -> orders.cols."""
+    return os.path.splitext(csv_path)[0] + STORE_EXT
+
+
+def output_path(csv_path, data_format='csv'):
+    """The file or store directory a generator writes for `csv_path` in `data_format`."""
+    if data_format == 'columns':
+        return store_path(csv_path)
+    return csv_path + COMPRESSED_SUFFIXES.get(data_format, '')
+
+
+def column_dtype(sql_type):
+    sql_type = sql_type.upper()
+    if sql_type == 'INT':
+        return '<i4'
+    if sql_type == 'BIT':
+        return 'u1'
+    if sql_type.startswith('DECIMAL'):
+        return '<f8'
+    if sql_type == 'DATETIME':
+        return 'datetime64[s]'
+    return 'S'
+
+
+def _encode(values, dtype):
+    values = np.asarray(values)
+    if dtype == 'S':
+        return np.char.encode(values.astype(str), 'utf-8')
+    if dtype == 'datetime64[s]' and values.dtype.kind != 'M':
+        # The generators format dates as 'YYYY-MM-DD HH:MM:SS'; NumPy parses those directly.
+        return values.astype('datetime64[s]')
+    return values.astype(dtype)
+
+
+def _decode(values):
+    """Python values of a column slice, as csv.DictReader plus int()/float() would produce them."""
+    if values.dtype.kind == 'M':
+        return format_dates(values).tolist()
+    if values.dtype.kind == 'S':
+        return np.char.decode(values, 'utf-8').tolist()
+    return values.tolist()
+
+
+def create(path, table):
+    """Create an empty store for `table` at `path`, replacing any previous one."""
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    manifest = {
+        'table': table.name,
+        'columns': [{'name': c.name, 'dtype': column_dtype(c.sql_type)} for c in table.columns],
+    }
+    with open(os.path.join(path, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+class ColumnStoreWriter:
+    """Writes chunks of column arrays into a store directory."""
+
+    def __init__(self, path, table, fresh=True):
+        self.path = path
+        if fresh:
+            create(path, table)
+        self.dtypes = [column_dtype(c.sql_type) for c in table.columns]
+        self.names = [c.name for c in table.columns]
+
+    def write(self, first_id, columns):
+        chunk_dir = os.path.join(self.path, f"{first_id:012d}")
+        os.makedirs(chunk_dir, exist_ok=True)
+        for name, dtype, values in zip(self.names, self.dtypes, columns):
+            np.save(os.path.join(chunk_dir, f"{name}.npy"), _encode(values, dtype))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvWriter:
+    """The same interface over a CSV file, so generators can write either format."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.file = open_text_output(path)
+        self.writer = csv.writer(self.file)
+        if header:
+            self.writer.writerow(header)
+
+    def write(self, first_id, columns):
+        write_chunk(self.writer, columns)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_output(csv_path, header, table, data_format='csv', fresh=True):
+    """A writer for output_path(csv_path, data_format); a CSV without `header` gets no header row."""
+    if data_format == 'columns':
+        return ColumnStoreWriter(output_path(csv_path, data_format), table, fresh)
+    return CsvWriter(output_path(csv_path, data_format), header)
+
+
+class ColumnStoreReader:
+    """Reads a store as batches of row tuples, starting `offset` rows in.
+
+    `offset` is the number of rows returned so far, which is what the load
+    checkpoints record for this format in place of a byte offset. The time
+    spent turning slices into Python values accumulates in `parse_seconds`.
+    """
+
+    def __init__(self, path, offset=None):
+        self.path = path
+        self.parse_seconds = 0.0
+        with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.fieldnames = [c['name'] for c in manifest['columns']]
+        self.chunks = sorted(name for name in os.listdir(path) if name.isdigit())
+        self.starts = [0]
+        for chunk in self.chunks:
+            self.starts.append(self.starts[-1] + len(self.column(chunk, self.fieldnames[0])))
+        self.offset = min(offset or 0, self.starts[-1])
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def column(self, chunk, name):
+        """One column of one chunk, memory-mapped."""
+        return np.load(os.path.join(self.path, chunk, f"{name}.npy"), mmap_mode='r')
+
+    def batches(self, batch_size):
+        """Yield lists of row tuples; a batch never spans two chunks."""
+        chunk_index = bisect.bisect_right(self.starts, self.offset) - 1
+        for chunk_index in range(chunk_index, len(self.chunks)):
+            chunk = self.chunks[chunk_index]
+            arrays = [self.column(chunk, name) for name in self.fieldnames]
+            start = self.offset - self.starts[chunk_index]
+            for begin in range(start, len(arrays[0]), batch_size):
+                started = time.perf_counter()
+                values = [_decode(values[begin:begin + batch_size]) for values in arrays]
+                batch = list(zip(*values))
+                self.parse_seconds += time.perf_counter() - started
+                self.offset += len(batch)
+                yield batch
+
+    def take_parse_seconds(self):
+        seconds, self.parse_seconds = self.parse_seconds, 0.0
+        return seconds
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def add_format_argument(parser):
+    parser.add_argument('--format', dest='data_format', choices=FORMATS, default='csv',
+                        help=f"intermediate data format: CSV files, gzip/zstd-compressed CSV files or memory-mapped column "
+                             f"stores (<table>{STORE_EXT}/)")
@@ -0,0 +1,73 @@
+"""Helpers for the columnar generation mode.
+
+The row-by-row generators call random.* once per field per row. The columnar
+mode instead builds whole chunks of each column with NumPy and hands them to
+csv.writer.writerows in one call, keeping the CSV schemas unchanged.
+"""
+from datetime import datetime
+
+import numpy as np
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+DEFAULT_CHUNK_SIZE = 100000
+SECONDS_PER_DAY = 86400
+
+
+def as_datetime64(value=None):
+    """Return `value` (a datetime or date string, default now) as datetime64[s]."""
+    if value is None:
+        value = datetime.now()
+    if isinstance(value, str):
+        value = datetime.strptime(value, DATE_FORMAT)
+    return np.datetime64(value.replace(microsecond=0), 's')
+
+
+def days_before(rng, end, max_days, n):
+    """`end` minus a random whole number of days in [0, max_days], like the row generators."""
+    offsets = rng.integers(0, max_days + 1, n) * SECONDS_PER_DAY
+    return end - offsets.astype('timedelta64[s]')
+
+
+def days_after(rng, start, max_days, n):
+    """`start` plus a random whole number of days in [0, max_days]."""
+    offsets = rng.integers(0, max_days + 1, n) * SECONDS_PER_DAY
+    return start + offsets.astype('timedelta64[s]')
+
+
+def format_dates(values):
+    """Format a datetime64 array as 'YYYY-MM-DD HH:MM:SS' strings."""
+    return np.char.replace(np.datetime_as_string(values, unit='s'), 'T', ' ')
+
+
+def pick(rng, values, n, p=None):
+    """Vectorised random.choice/random.choices over a small list of strings."""
+    return np.asarray(values)[rng.choice(len(values), n, p=p)]
+
+
+def prices(rng, low, high, n):
+    """Vectorised round(random.uniform(low, high), 2)."""
+    return np.round(rng.uniform(low, high, n), 2)
+
+
+def digits(rng, low, high, n):
+    """Random integers in [low, high] as strings, e.g. street numbers and postal codes."""
+    return rng.integers(low, high + 1, n).astype(str)
+
+
+def join(*parts):
+    """Element-wise string concatenation of arrays and scalar strings."""
+    result = parts[0]
+    for part in parts[1:]:
+        result = np.char.add(result, part)
+    return result
+
+
+def write_chunk(writer, columns):
+    """Write one chunk of columns with a single writerows call."""
+    writer.writerows(zip(*[c.tolist() if isinstance(c, np.ndarray) else c for c in columns]))
+
+
+def chunk_ranges(total, chunk_size):
+    """Yield (first_id, count) pairs covering ids 1..total."""
+    for start in range(1, total + 1, chunk_size):
+        yield start, min(chunk_size, total + 1 - start)
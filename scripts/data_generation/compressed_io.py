@@ -0,0 +1,215 @@
+"""Transparent gzip/zstd compression for the generated CSVs.
+
+With --format csv.gz or csv.zst the generators write orders.csv.gz or
+orders.csv.zst instead of orders.csv, and the loaders read that file back. The
+codec follows from the file's suffix, so readers just open the path they are
+given and plain .csv files are opened as before.
+
+In both directions the codec runs on a background thread, connected to the
+caller by a bounded queue of 1 MiB blocks. zlib and zstandard release the GIL
+while they work, so a loader parses and inserts one block while the next one
+is read from disk and decompressed, and a generator builds its next chunk while
+the previous one is compressed and written.
+
+Compressed streams cannot seek. Resuming readers read forward to their offset
+instead (skip()), and offsets always count uncompressed bytes. A file may hold
+several gzip members or zstd frames back to back, which is how sharded
+generation concatenates its parts. zstd needs the zstandard package; gzip only
+needs the standard library.
+"""
+import io
+import os
+import queue
+import threading
+import zlib
+
+SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+BLOCK_SIZE = 1 << 20
+QUEUE_BLOCKS = 8
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# zlib window bits that read and write a gzip header and trailer.
+_GZIP_WBITS = 31
+_DONE = object()
+
+
+def codec(path):
+    """'gzip', 'zstd' or None, from the suffix of `path`."""
+    return SUFFIXES.get(os.path.splitext(path)[1])
+
+
+def _compressor(name):
+    if name == 'gzip':
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, _GZIP_WBITS)
+    import zstandard
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def _decompressor(name):
+    if name == 'gzip':
+        return zlib.decompressobj(_GZIP_WBITS)
+    import zstandard
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+class _DecompressingReader(io.RawIOBase):
+    """Raw stream of the uncompressed bytes, decompressed ahead on a background thread."""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.decompressor = _decompressor(name)
+        self.file = open(path, 'rb')
+        self.blocks = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self.block = memoryview(b'')
+        self.error = None
+        self.finished = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self._decompress, name=f"decompress-{os.path.basename(path)}",
+                                       daemon=True)
+        self.thread.start()
+
+    def _put(self, block):
+        # Gives up once the reader is closed, so the thread never waits on a reader that is gone.
+        while not self.stopped:
+            try:
+                self.blocks.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _decompress(self):
+        try:
+            decompressor = self.decompressor
+            in_frame = False
+            while not self.stopped:
+                data = self.file.read(BLOCK_SIZE)
+                if not data:
+                    break
+                while data:
+                    in_frame = True
+                    block = decompressor.decompress(data)
+                    if block:
+                        self._put(block)
+                    if not decompressor.eof:
+                        break
+                    # The next member or frame starts in the bytes left over.
+                    data = decompressor.unused_data
+                    decompressor = _decompressor(self.name)
+                    in_frame = False
+            if in_frame and not self.stopped:
+                raise EOFError(f"{self.path} ends in the middle of a {self.name} stream")
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.file.close()
+            self._put(_DONE)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.block:
+            if self.finished:
+                return 0
+            block = self.blocks.get()
+            if block is _DONE:
+                self.finished = True
+                if self.error:
+                    raise self.error
+                return 0
+            self.block = memoryview(block)
+        n = min(len(buffer), len(self.block))
+        buffer[:n] = self.block[:n]
+        self.block = self.block[n:]
+        return n
+
+    def close(self):
+        # The thread notices within one put timeout and closes the file itself. Not
+        # joining it keeps close() safe from finalizers at interpreter exit, when
+        # daemon threads no longer run.
+        self.stopped = True
+        super().close()
+
+
+class _CompressingWriter(io.RawIOBase):
+    """Raw stream that compresses and writes what it is given on a background thread."""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.compressor = _compressor(name)
+        self.file = open(path, 'wb')
+        self.blocks = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self.error = None
+        self.thread = threading.Thread(target=self._compress, name=f"compress-{os.path.basename(path)}", daemon=True)
+        self.thread.start()
+
+    def _compress(self):
+        while True:
+            block = self.blocks.get()
+            if block is _DONE:
+                break
+            if self.error:
+                continue
+            try:
+                self.file.write(self.compressor.compress(block))
+            except BaseException as e:
+                self.error = e
+        if not self.error:
+            try:
+                self.file.write(self.compressor.flush())
+            except BaseException as e:
+                self.error = e
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.error:
+            raise self.error
+        self.blocks.put(bytes(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self.blocks.put(_DONE)
+            self.thread.join()
+            self.file.close()
+            if self.error:
+                raise self.error
+
+
+def open_input(path):
+    """`path` opened for binary reading, decompressed in the background if its suffix says so."""
+    name = codec(path)
+    if name is None:
+        return open(path, 'rb')
+    return io.BufferedReader(_DecompressingReader(path, name), BLOCK_SIZE)
+
+
+def open_text_input(path):
+    """open_input() as UTF-8 text for csv.reader/csv.DictReader."""
+    return io.TextIOWrapper(open_input(path), encoding='utf-8', newline='')
+
+
+def open_text_output(path):
+    """`path` opened for writing UTF-8 CSV text, compressed in the background if its suffix says so."""
+    name = codec(path)
+    if name is None:
+        return open(path, 'w', newline='', encoding='utf-8')
+    raw = io.BufferedWriter(_CompressingWriter(path, name), BLOCK_SIZE)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+def skip(stream, count):
+    """Move a stream from open_input() `count` bytes forward."""
+    if stream.seekable():
+        stream.seek(count, io.SEEK_CUR)
+        return
+    while count > 0:
+        data = stream.read(min(count, BLOCK_SIZE))
+        if not data:
+            return
+        count -= len(data)
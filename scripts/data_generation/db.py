@@ -0,0 +1,264 @@
+"""Database backends for the loaders.
+
+Every connection comes from a backend and carries it as `conn.backend`. The
+backend supplies the statements that differ between engines: trigger toggles,
+IDENTITY_INSERT and reseeding.
+
+    sqlserver  ECommerceDB on SQL Server through pyodbc, with a connection pool
+    sqlite     a local SQLite file with the master_script.sql tables, for
+               developing and benchmarking the load path without a server
+"""
+import os
+import queue
+import re
+import sqlite3
+import threading
+
+SERVER = 'localhost'
+# SERVER = 'localhost,1433'
+DATABASE = 'ECommerceDB'
+UID = 'sa'
+PWD = 'YourStrong!Passw0rd'
+
+conn_str = (
+    'DRIVER={ODBC Driver 18 for SQL Server};'
+    f'SERVER={SERVER};'
+    f'DATABASE={DATABASE};'
+    f'UID={UID};'
+    f'PWD={PWD};'
+    'TrustServerCertificate=yes;'
+)
+
+SQLITE_PATH = 'ECommerceDB.sqlite'
+MASTER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'master_script.sql')
+
+BACKENDS = ('sqlserver', 'sqlite')
+DEFAULT_BACKEND = 'sqlserver'
+POOL_SIZE = 8
+
+
+class Connection:
+    """A DB-API connection together with the backend that opened it.
+
+    close() hands the connection back to the backend, which may keep it for reuse.
+    """
+
+    def __init__(self, backend, raw):
+        self.backend = backend
+        self.raw = raw
+
+    def cursor(self):
+        return self.backend.cursor(self.raw)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.backend.release(self.raw)
+
+
+class SqlServerBackend:
+    name = 'sqlserver'
+    strategies = ('executemany', 'fast', 'tvp', 'bcp')
+    default_strategy = 'fast'
+
+    def __init__(self, connection_string=conn_str, pool_size=POOL_SIZE):
+        self.connection_string = connection_string
+        self.idle = queue.LifoQueue(maxsize=pool_size)
+
+    def connect(self):
+        """A pooled connection, opening a new one when none is idle."""
+        try:
+            raw = self.idle.get_nowait()
+        except queue.Empty:
+            import pyodbc
+            raw = pyodbc.connect(self.connection_string)
+        return Connection(self, raw)
+
+    def release(self, raw):
+        # Roll back anything left uncommitted so the next user starts clean.
+        raw.rollback()
+        try:
+            self.idle.put_nowait(raw)
+        except queue.Full:
+            raw.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def cursor(self, raw):
+        return raw.cursor()
+
+    def disable_trigger(self, cursor, table, trigger):
+        cursor.execute(f"DISABLE TRIGGER {trigger} ON {table};")
+
+    def enable_trigger(self, cursor, table, trigger):
+        cursor.execute(f"ENABLE TRIGGER {trigger} ON {table};")
+
+    def identity_insert(self, cursor, table, enabled):
+        cursor.execute(f"SET IDENTITY_INSERT [{table.name}] {'ON' if enabled else 'OFF'};")
+
+    def reseed(self, cursor, table):
+        """Move the table's IDENTITY seed to its highest ID, so later inserts continue after the loaded rows."""
+        cursor.execute(f"DBCC CHECKIDENT ('[{table.name}]', RESEED);")
+
+    def table_exists(self, cursor, name):
+        cursor.execute("SELECT OBJECT_ID(?, 'U');", f"[{name}]")
+        return cursor.fetchone()[0] is not None
+
+    def secondary_indexes(self, cursor, table):
+        """Names of the table's enabled, non-unique nonclustered indexes, which no constraint relies on."""
+        cursor.execute("SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID(?) AND type = 2 AND is_unique = 0 "
+                       "AND is_disabled = 0 AND is_hypothetical = 0 ORDER BY name;", f"[{table.name}]")
+        return [row[0] for row in cursor.fetchall()]
+
+    def disable_index(self, cursor, table, index):
+        cursor.execute(f"ALTER INDEX [{index}] ON [{table.name}] DISABLE;")
+
+    def rebuild_index(self, cursor, table, index):
+        cursor.execute(f"ALTER INDEX [{index}] ON [{table.name}] REBUILD;")
+
+
+class _SqliteCursor:
+    """sqlite3 cursor that accepts the loaders' T-SQL: COUNT_BIG and #temp tables."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.fast_executemany = False
+
+    @staticmethod
+    def _translate(sql):
+        sql = sql.replace('COUNT_BIG(', 'COUNT(')
+        return re.sub(r'\[?#(\w+)\]?', r'temp.\1', sql)
+
+    def execute(self, sql, *params):
+        self.cursor.execute(self._translate(sql), *params)
+        return self
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(self._translate(sql), rows)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def close(self):
+        self.cursor.close()
+
+
+def sqlite_schema(script_path=MASTER_SCRIPT):
+    """The CREATE TABLE statements of master_script.sql, translated for SQLite.
+
+    IDENTITY columns become INTEGER PRIMARY KEY (or plain INTEGER inside a
+    composite key) and partition schemes are dropped. Constraints are kept;
+    SQLite leaves foreign keys unenforced by default, so tables can load in any order.
+    """
+    with open(script_path, 'r', encoding='utf-8') as f:
+        script = f.read()
+    statements = []
+    for match in re.finditer(r'CREATE TABLE .*?\n\)(?: ON \w+\(\w+\))?;', script, re.DOTALL):
+        statement = match.group(0)
+        statement = statement.replace('INT PRIMARY KEY IDENTITY(1,1)', 'INTEGER PRIMARY KEY')
+        statement = statement.replace('INT IDENTITY(1,1)', 'INTEGER')
+        statement = statement.replace('GETDATE()', 'CURRENT_TIMESTAMP')
+        statement = re.sub(r'\) ON \w+\(\w+\);$', ');', statement)
+        statements.append(statement)
+    return statements
+
+
+class SqliteBackend:
+    name = 'sqlite'
+    strategies = ('executemany',)
+    default_strategy = 'executemany'
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """A new connection; the tables are created on first use."""
+        raw = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock:
+            if not raw.execute("SELECT 1 FROM sqlite_master WHERE name = 'Category'").fetchone():
+                self.create_tables(raw)
+        return Connection(self, raw)
+
+    def create_tables(self, raw):
+        for statement in sqlite_schema():
+            raw.execute(statement)
+        raw.commit()
+
+    def reset(self):
+        """Delete the database file, so the next connection starts from empty tables."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def release(self, raw):
+        raw.close()
+
+    def close_all(self):
+        pass
+
+    def cursor(self, raw):
+        return _SqliteCursor(raw.cursor())
+
+    # SQLite has no triggers from 07_triggers.sql or indexes from 05_indexes.sql, and accepts
+    # explicit INTEGER PRIMARY KEY values.
+    def disable_trigger(self, cursor, table, trigger):
+        pass
+
+    def enable_trigger(self, cursor, table, trigger):
+        pass
+
+    def identity_insert(self, cursor, table, enabled):
+        pass
+
+    def reseed(self, cursor, table):
+        pass
+
+    def table_exists(self, cursor, name):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (name,))
+        return cursor.fetchone() is not None
+
+    def secondary_indexes(self, cursor, table):
+        return []
+
+    def disable_index(self, cursor, table, index):
+        pass
+
+    def rebuild_index(self, cursor, table, index):
+        pass
+
+
+_backends = {}
+
+
+def get_backend(name=DEFAULT_BACKEND):
+    """The shared backend instance for `name`, so all its connections share one pool."""
+    if name not in BACKENDS:
+        raise ValueError(f"unknown database backend {name!r}, expected one of {BACKENDS}")
+    if name not in _backends:
+        _backends[name] = SqlServerBackend() if name == 'sqlserver' else SqliteBackend()
+    return _backends[name]
+
+
+def connect(backend=DEFAULT_BACKEND):
+    return get_backend(backend).connect()
+
+
+def add_backend_argument(parser):
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help=f"database to load into (default: {DEFAULT_BACKEND}; sqlite writes {SQLITE_PATH})")
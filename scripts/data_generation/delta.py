@@ -0,0 +1,275 @@
+"""Incremental delta generation and loading on top of an existing database.
+
+A full load regenerates every table from ID 1. A delta continues from the
+database's current high-water marks instead:
+
+    MAX(UserID), MAX(CartID), MAX(OrderID), MAX(OrderItemID)   new IDs start after these
+    MAX(OrderDate)                                             the delta covers the --days
+                                                               whole days after this one
+
+It generates --users-per-day new users (joined inside the window), cart rows
+for the new users, and --orders-per-day orders with their items over all users,
+priced from the Product table (see generate_orders_with_items.py). The rows
+are streamed through the bulk loaders, with the stock triggers disabled and
+the stock changes applied once afterwards (see reconcile_stock.py). With
+--summaries the new orders and items are also merged into the
+build_summaries.py tables.
+
+On SQL Server, pf_OrderDate gets a monthly boundary for every month the window
+reaches past its last boundary, so new orders keep landing in new partitions.
+Only ranges that hold no rows yet are split, so no data moves.
+
+The marks after each run are written to delta_manifest.json, together with
+the end of the window just generated. With --from-manifest the next run starts
+from that file instead of querying the MAX values, which on a large
+partitioned [Order] saves scanning every partition for MAX(OrderDate), and its
+window starts at the recorded window end, so consecutive windows never overlap
+even when no order was drawn on a window's last day.
+"""
+import argparse
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from build_summaries import ProductSalesTally, UserOrderTally, check_summary_tables, merge_summaries
+from bulk_load import DEFAULT_STRATEGY, add_strategy_argument
+from columnar import DATE_FORMAT, SECONDS_PER_DAY, chunk_ranges, days_after, format_dates
+from db import DEFAULT_BACKEND, add_backend_argument, connect
+from distributions import DEFAULT_PROFILE, add_profile_argument
+from generate_cart import cart_columns, users_per_chunk
+from generate_orders_with_items import MAX_ITEMS_PER_ORDER, order_with_item_columns
+from generate_users import user_columns
+from instrumentation import add_metrics_argument, configure, export
+from partition_load import PARTITION_FUNCTION, read_boundaries
+from pipeline import BATCH_SIZE, QUEUE_BATCHES, stream_load, tally_items, to_rows
+from reconcile_stock import StockTally, apply_stock_changes
+from schema import CART, ORDER, ORDER_ITEM, USER
+
+MANIFEST_PATH = 'delta_manifest.json'
+PARTITION_SCHEME = 'ps_OrderDate'
+
+# window_end is only known from a manifest; manifests from before it was added load with None.
+HighWaterMarks = namedtuple('HighWaterMarks', ['user_id', 'cart_id', 'order_id', 'order_item_id', 'order_date',
+                                               'window_end'], defaults=[None])
+
+
+def read_marks(cursor):
+    """Current high-water marks of the database; order_date is None while [Order] is empty."""
+    cursor.execute("""
+        SELECT (SELECT COALESCE(MAX(UserID), 0) FROM [User]),
+               (SELECT COALESCE(MAX(CartID), 0) FROM Cart),
+               (SELECT COALESCE(MAX(OrderID), 0) FROM [Order]),
+               (SELECT COALESCE(MAX(OrderItemID), 0) FROM OrderItem),
+               (SELECT MAX(OrderDate) FROM [Order]);
+    """)
+    user_id, cart_id, order_id, order_item_id, order_date = cursor.fetchone()
+    # pyodbc returns datetimes, SQLite the stored 'YYYY-MM-DD HH:MM:SS' text.
+    if order_date is not None and not isinstance(order_date, str):
+        order_date = order_date.strftime(DATE_FORMAT)
+    return HighWaterMarks(user_id, cart_id, order_id, order_item_id, order_date)
+
+
+def read_manifest(path=MANIFEST_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return HighWaterMarks(**json.load(f))
+
+
+def write_manifest(marks, path=MANIFEST_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(marks._asdict(), f, indent=2)
+
+
+def read_prices(cursor):
+    """Product prices in cents, indexed by ProductID - 1, as load_catalog_prices returns them."""
+    cursor.execute("SELECT ProductID, Price FROM Product;")
+    rows = cursor.fetchall()
+    if not rows:
+        raise ValueError("the Product table is empty; load the full dataset before a delta")
+    product_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    prices = np.array([float(row[1]) for row in rows])
+    cents = np.zeros(product_ids.max(), dtype=np.int64)
+    cents[product_ids - 1] = np.round(prices * 100)
+    return cents
+
+
+def window_start(marks):
+    """The previous window's end if known, else midnight after the latest OrderDate; today's midnight without orders."""
+    if marks.window_end is not None:
+        return np.datetime64(marks.window_end, 's')
+    if marks.order_date is None:
+        return np.datetime64('today', 'D').astype('datetime64[s]')
+    return (np.datetime64(marks.order_date, 'D') + 1).astype('datetime64[s]')
+
+
+def month_boundaries(after, end):
+    """First days of the months in (after, end), as 'YYYY-MM-DD HH:MM:SS' strings."""
+    month = np.datetime64(after, 'M') + 1
+    boundaries = []
+    while month.astype('datetime64[s]') < end:
+        boundaries.append(format_dates(month.astype('datetime64[s]')).item())
+        month += 1
+    return boundaries
+
+
+def extend_partitions(cursor, start, end):
+    """Split pf_OrderDate at every month boundary the window [start, end) reaches past the last one."""
+    boundaries = read_boundaries(cursor)
+    after = max(np.datetime64(boundaries[-1]), start) if boundaries else start
+    added = month_boundaries(after, end)
+    for boundary in added:
+        cursor.execute(f"ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY];")
+        cursor.execute(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() SPLIT RANGE ('{boundary}');")
+    return added
+
+
+def iter_user_batches(rng, marks, n, start, days):
+    for first_id, count in chunk_ranges(n, BATCH_SIZE):
+        columns = user_columns(rng, marks.user_id + first_id, count, start)
+        # DateJoined falls inside the window rather than in the 730 days before it.
+        columns[9] = format_dates(days_after(rng, start, days - 1, count))
+        yield to_rows(columns)
+
+
+def iter_new_cart_batches(rng, marks, num_users, num_items, num_products, now, profile):
+    """Cart rows for the new users only; user and cart IDs are shifted past the marks."""
+    if num_items > num_users * num_products:
+        raise ValueError(f"cannot draw {num_items} unique cart rows from {num_users * num_products} (user, product) pairs")
+    for first_user, n_users in chunk_ranges(num_users, users_per_chunk(num_users, num_items, BATCH_SIZE)):
+        columns = cart_columns(rng, first_user, n_users, num_users, num_items, num_products, now, profile)
+        columns[0] = columns[0] + marks.cart_id
+        columns[1] = columns[1] + marks.user_id
+        yield to_rows(columns)
+
+
+def iter_order_batches(rng, marks, num_orders, num_users, start, days, price_cents, max_items, profile, item_chunks,
+                       summaries=None):
+    """Order batches; each batch's item columns are kept in `item_chunks` for the item stage.
+
+    With `summaries`, a (UserOrderTally, ProductSalesTally) pair, every batch is
+    also added to the summary tallies.
+    """
+    next_item_id = marks.order_item_id + 1
+    for first_id, n in chunk_ranges(num_orders, BATCH_SIZE):
+        orders, items = order_with_item_columns(rng, marks.order_id + first_id, next_item_id, n, num_users, start,
+                                                price_cents, max_items, profile=profile, days=days - 1)
+        item_chunks.append(items)
+        if summaries:
+            summaries[0].add(orders[1], orders[3], orders[2])
+            summaries[1].add(items[1], items[3], items[4], items[5])
+        next_item_id += len(items[0])
+        yield to_rows(orders)
+
+
+def iter_item_batches(item_chunks):
+    for items in item_chunks:
+        for begin in range(0, len(items[0]), BATCH_SIZE):
+            yield to_rows([values[begin:begin + BATCH_SIZE] for values in items])
+
+
+def run_delta(days=1, users_per_day=20, orders_per_day=700, cart_per_user=5, max_items=MAX_ITEMS_PER_ORDER,
+              seed=None, strategy=DEFAULT_STRATEGY, queue_batches=QUEUE_BATCHES, backend=DEFAULT_BACKEND,
+              profile=DEFAULT_PROFILE, from_manifest=False, manifest_path=MANIFEST_PATH, summaries=False):
+    rng = np.random.default_rng(seed)
+
+    conn = connect(backend)
+    cursor = conn.cursor()
+    print("Connected to database successfully!")
+
+    marks = read_manifest(manifest_path) if from_manifest else read_marks(cursor)
+    print(f"High-water marks: {marks._asdict()}")
+    start = window_start(marks)
+    end = start + np.timedelta64(days * SECONDS_PER_DAY, 's')
+    print(f"Generating {days} days from {format_dates(start).item()} to {format_dates(end).item()}")
+
+    price_cents = read_prices(cursor)
+    if summaries:
+        check_summary_tables(conn)
+    num_products = len(price_cents)
+    num_new_users = users_per_day * days
+    num_users = marks.user_id + num_new_users
+    num_orders = orders_per_day * days
+
+    if conn.backend.name == 'sqlserver':
+        added = extend_partitions(cursor, start, end)
+        conn.commit()
+        if added:
+            print(f"Added {PARTITION_FUNCTION} boundaries: {', '.join(added)}")
+
+    print("Disabling cart validation and stock update triggers...")
+    conn.backend.disable_trigger(cursor, 'Cart', 'trg_InsteadOfCart_ValidateStock')
+    conn.backend.disable_trigger(cursor, 'OrderItem', 'trg_AfterOrderItem_UpdateStock')
+    conn.commit()
+
+    try:
+        stream_load(conn, USER, iter_user_batches(rng, marks, num_new_users, start, days),
+                    "users", strategy, queue_batches)
+        cart_batches = iter_new_cart_batches(rng, marks, num_new_users, num_new_users * cart_per_user, num_products,
+                                             end, profile)
+        num_carts = stream_load(conn, CART, cart_batches, "cart items", strategy, queue_batches)
+
+        item_chunks = []
+        tallies = (UserOrderTally(), ProductSalesTally(grouped=True)) if summaries else None
+        order_batches = iter_order_batches(rng, marks, num_orders, num_users, start, days, price_cents, max_items,
+                                           profile, item_chunks, tallies)
+        stream_load(conn, ORDER, order_batches, "orders", strategy, queue_batches)
+        tally = StockTally()
+        item_batches = tally_items(iter_item_batches(item_chunks), tally)
+        num_items = stream_load(conn, ORDER_ITEM, item_batches, "order items", strategy, queue_batches)
+        apply_stock_changes(conn, tally)
+        if summaries:
+            merge_summaries(conn, *tallies)
+    finally:
+        print("Re-enabling cart validation and stock update triggers...")
+        conn.backend.enable_trigger(cursor, 'Cart', 'trg_InsteadOfCart_ValidateStock')
+        conn.backend.enable_trigger(cursor, 'OrderItem', 'trg_AfterOrderItem_UpdateStock')
+        conn.commit()
+
+    # Still None when [Order] was empty and no orders were added; the manifest stores that as null.
+    last_date = max((str(max(items[2])) for items in item_chunks), default=marks.order_date)
+    marks = HighWaterMarks(marks.user_id + num_new_users, marks.cart_id + num_carts, marks.order_id + num_orders,
+                           marks.order_item_id + num_items, last_date, format_dates(end).item())
+    write_manifest(marks, manifest_path)
+    print(f"Wrote high-water marks to {manifest_path}")
+    cursor.close()
+    conn.close()
+
+    print(f"\nDelta of {days} days loaded successfully!")
+    return marks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate and append the next days of users, carts, orders and items")
+    parser.add_argument('--days', type=int, default=1, help="whole days after the latest OrderDate to generate (default: 1)")
+    parser.add_argument('--users-per-day', type=int, default=20, help="new users per day (default: 20)")
+    parser.add_argument('--orders-per-day', type=int, default=700, help="new orders per day (default: 700)")
+    parser.add_argument('--cart-per-user', type=int, default=5, help="cart rows per new user (default: 5)")
+    parser.add_argument('--max-items', type=int, default=MAX_ITEMS_PER_ORDER,
+                        help=f"most items per order; each order gets 1 to this many (default: {MAX_ITEMS_PER_ORDER})")
+    parser.add_argument('--seed', type=int, default=None, help="random seed; the same seed reproduces the same rows")
+    parser.add_argument('--from-manifest', action='store_true',
+                        help="start from the marks in the manifest instead of the database's MAX values")
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help=f"high-water mark file (default: {MANIFEST_PATH})")
+    parser.add_argument('--summaries', action='store_true',
+                        help="also merge the new rows into UserOrderSummary and ProductSales (see build_summaries.py)")
+    add_profile_argument(parser)
+    add_strategy_argument(parser)
+    add_backend_argument(parser)
+    add_metrics_argument(parser)
+    parser.add_argument('--queue-batches', type=int, default=QUEUE_BATCHES, help="generated batches allowed to wait for the writer")
+    args = parser.parse_args()
+    configure(args.metrics)
+
+    if args.days < 1:
+        parser.error("--days must be at least 1")
+    if args.from_manifest and not os.path.exists(args.manifest):
+        parser.error(f"{args.manifest} does not exist; run a delta without --from-manifest first")
+
+    try:
+        run_delta(args.days, args.users_per_day, args.orders_per_day, args.cart_per_user, args.max_items, args.seed,
+                  args.strategy, args.queue_batches, args.backend, args.profile, args.from_manifest, args.manifest,
+                  args.summaries)
+        export(args.metrics)
+    except Exception as e:
+        print(f"Error: {e}")
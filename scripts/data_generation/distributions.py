@@ -0,0 +1,153 @@
+"""Skewed workload profiles for the columnar and sharded generators.
+
+The default 'uniform' profile draws users, products, categories and dates
+uniformly, exactly as before. The other profiles add skew:
+
+    product_zipf   product popularity (order items and cart rows) follows
+                   Zipf(s) over a fixed random ranking of the products
+    category_zipf  products per category follows Zipf(s)
+    user_tail      orders and cart rows per user follow a Pareto(alpha) weight
+                   per user, so a few power users place many orders
+    weekly         OrderDate leans towards Friday to Sunday
+    seasonal       OrderDate follows a monthly curve that peaks in November and
+                   December
+
+Weighted draws go through alias tables (Vose's method), built once per process
+and then sampled with two vectorised lookups per value. Skewed generation
+therefore runs at about the speed of rng.integers.
+
+Which products are hot and which users are heavy comes from PROFILE_SEED, not
+from --seed. Every generator and every shard therefore agrees on them.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from columnar import SECONDS_PER_DAY, days_after
+
+PROFILE_SEED = 1729
+DEFAULT_PROFILE = 'uniform'
+
+# Spawn keys under PROFILE_SEED, one per kind of id.
+USER_KEY, PRODUCT_KEY, CATEGORY_KEY = 1, 2, 3
+
+Profile = namedtuple('Profile', ['product_zipf', 'category_zipf', 'user_tail', 'weekly', 'seasonal'])
+
+PROFILES = {
+    'uniform': Profile(None, None, None, False, False),
+    'realistic': Profile(1.07, 0.8, 1.5, True, True),
+    'hot': Profile(1.4, 1.2, 1.1, True, True),
+}
+
+# Monday..Sunday and January..December.
+WEEKDAY_WEIGHTS = np.array([0.95, 0.9, 0.9, 0.95, 1.1, 1.25, 1.2])
+MONTH_WEIGHTS = np.array([0.85, 0.8, 0.9, 0.9, 0.95, 0.95, 1.0, 1.0, 0.95, 1.0, 1.35, 1.6])
+
+
+class AliasTable:
+    """Vose's alias method: O(k) to build, O(1) per draw, vectorised with NumPy.
+
+    sample() returns values[i] with probability weights[i] / sum(weights);
+    `values` defaults to the indices 0..k-1.
+    """
+
+    def __init__(self, weights, values=None):
+        weights = np.asarray(weights, dtype=np.float64)
+        k = len(weights)
+        scaled = weights * (k / weights.sum())
+        self.prob = np.ones(k)
+        self.alias = np.arange(k)
+        self.values = np.arange(k) if values is None else np.asarray(values)
+
+        small = list(np.flatnonzero(scaled < 1.0))
+        large = list(np.flatnonzero(scaled >= 1.0))
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left over has probability 1 up to rounding error.
+
+    def sample(self, rng, n):
+        columns = rng.integers(0, len(self.prob), n)
+        keep = rng.random(n) < self.prob[columns]
+        return self.values[np.where(keep, columns, self.alias[columns])]
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"unknown profile {name!r}, expected one of {tuple(PROFILES)}")
+    return PROFILES[name]
+
+
+def zipf_weights(k, s):
+    return 1.0 / np.arange(1, k + 1) ** s
+
+
+@lru_cache(maxsize=8)
+def _zipf_ids(k, s, key):
+    # Rank r maps to a fixed random id, so the hottest ids are spread over 1..k.
+    ids = np.random.default_rng((PROFILE_SEED, key)).permutation(k) + 1
+    return AliasTable(zipf_weights(k, s), ids)
+
+
+def user_weights(num_users, alpha):
+    """Pareto(alpha) weight per UserID; the same for every generator and shard."""
+    return np.random.default_rng((PROFILE_SEED, USER_KEY)).pareto(alpha, num_users) + 1.0
+
+
+@lru_cache(maxsize=8)
+def _user_ids(num_users, alpha):
+    return AliasTable(user_weights(num_users, alpha), np.arange(1, num_users + 1))
+
+
+@lru_cache(maxsize=8)
+def _day_offsets(start, days, weekly, seasonal):
+    day_starts = start + np.arange(days + 1) * np.timedelta64(SECONDS_PER_DAY, 's')
+    weights = np.ones(days + 1)
+    if weekly:
+        # 1970-01-01 was a Thursday, i.e. weekday 3 counting from Monday.
+        weights *= WEEKDAY_WEIGHTS[(day_starts.astype('datetime64[D]').astype(np.int64) + 3) % 7]
+    if seasonal:
+        weights *= MONTH_WEIGHTS[day_starts.astype('datetime64[M]').astype(np.int64) % 12]
+    return AliasTable(weights)
+
+
+def pick_products(rng, profile, num_products, n):
+    """ProductIDs in 1..num_products, Zipf-distributed unless the profile is uniform."""
+    s = get_profile(profile).product_zipf
+    if s is None:
+        return rng.integers(1, num_products + 1, n)
+    return _zipf_ids(num_products, s, PRODUCT_KEY).sample(rng, n)
+
+
+def pick_categories(rng, profile, num_categories, n):
+    s = get_profile(profile).category_zipf
+    if s is None:
+        return rng.integers(1, num_categories + 1, n)
+    return _zipf_ids(num_categories, s, CATEGORY_KEY).sample(rng, n)
+
+
+def pick_users(rng, profile, num_users, n):
+    """UserIDs in 1..num_users, heavy-tailed unless the profile is uniform."""
+    alpha = get_profile(profile).user_tail
+    if alpha is None:
+        return rng.integers(1, num_users + 1, n)
+    return _user_ids(num_users, alpha).sample(rng, n)
+
+
+def pick_dates(rng, profile, start, max_days, n):
+    """columnar.days_after, following the profile's weekly and seasonal curves."""
+    p = get_profile(profile)
+    if not (p.weekly or p.seasonal):
+        return days_after(rng, start, max_days, n)
+    offsets = _day_offsets(start, max_days, p.weekly, p.seasonal).sample(rng, n)
+    return start + (offsets * SECONDS_PER_DAY).astype('timedelta64[s]')
+
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', choices=tuple(PROFILES), default=DEFAULT_PROFILE,
+                        help="distribution of users, products and dates (default: uniform; "
+                             "realistic and hot add Zipf products, power users and weekly/seasonal dates)")
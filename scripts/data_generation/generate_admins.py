@@ -15,7 +15,7 @@ roles = ["Admin", "SuperAdmin", "Manager", "Moderator"]
 def generate_admins(num_admins=100):
     with open('admins.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['Email', 'PasswordHash', 'FirstName', 'LastName', 'Role', 'DateCreated', 'IsActive'])
+        writer.writerow(['AdminID', 'Email', 'PasswordHash', 'FirstName', 'LastName', 'Role', 'DateCreated', 'IsActive'])
         
         for i in range(1, num_admins + 1):
             first_name = random.choice(admin_first_names)
@@ -34,7 +34,7 @@ def generate_admins(num_admins=100):
             # All admins are active
             is_active = 1
             
-            writer.writerow([email, password_hash, first_name, last_name, role, date_created, is_active])
+            writer.writerow([i, email, password_hash, first_name, last_name, role, date_created, is_active])
             
             if i % 20 == 0:
                 print(f"Generated {i} admins...")
@@ -1,42 +1,177 @@
+import argparse
 import csv
 import random
 from datetime import datetime, timedelta
 
+import numpy as np
+
+from columnar import DEFAULT_CHUNK_SIZE, as_datetime64, chunk_ranges, days_before, format_dates
+from colstore import open_output, output_path
+from distributions import DEFAULT_PROFILE, AliasTable, get_profile, pick_products, user_weights
+from instrumentation import batch_timer, configure, export
+from schema import CART
+from sharding import DEFAULT_SEED, add_generation_arguments, parse_generation_arguments, run_sharded
+
+CART_COLUMNS = ['CartID', 'UserID', 'ProductID', 'Quantity', 'DateAdded']
+
+# Cart shards are cut by user, so every (UserID, ProductID) pair lives in exactly one shard.
+USERS_PER_SHARD = 1000
+
 def generate_cart_items(num_items=50000, num_users=10000, num_products=100000):
+    check_capacity(num_items, num_users, num_products)
     with open('cart.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['UserID', 'ProductID', 'Quantity', 'DateAdded'])
-        
-        used_combinations = set()
+        writer.writerow(CART_COLUMNS)
         
         count = 0
-        attempts = 0
-        max_attempts = num_items * 2 
-        
-        while count < num_items and attempts < max_attempts:
-            attempts += 1
-            
-            user_id = random.randint(1, num_users)
-            product_id = random.randint(1, num_products)
-
-            combo = (user_id, product_id)
-            if combo in used_combinations:
-                continue
-            
-            used_combinations.add(combo)
-
-            quantity = random.randint(1, 5)
-
-            days_ago = random.randint(0, 30)
-            date_added = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
-            
-            writer.writerow([user_id, product_id, quantity, date_added])
-            count += 1
-            
-            if count % 5000 == 0:
-                print(f"Generated {count} cart items...")
+        for first_user, n_users in chunk_ranges(num_users, users_per_chunk(num_users, num_items)):
+            # random.sample over the block's (user, product) codes draws without replacement.
+            k = items_for_users(first_user, n_users, num_users, num_items)
+            for code in random.sample(range(n_users * num_products), k):
+                user_id = first_user + code // num_products
+                product_id = code % num_products + 1
+
+                quantity = random.randint(1, 5)
+
+                days_ago = random.randint(0, 30)
+                date_added = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
+                
+                count += 1
+                writer.writerow([count, user_id, product_id, quantity, date_added])
+                
+                if count % 5000 == 0:
+                    print(f"Generated {count} cart items...")
         
         print(f"Completed! Generated {count} cart items in cart.csv")
 
+
+def check_capacity(num_items, num_users, num_products):
+    if num_items > num_users * num_products:
+        raise ValueError(f"cannot draw {num_items} unique cart rows from {num_users} users x {num_products} products")
+
+
+def users_per_chunk(num_users, num_items, rows=DEFAULT_CHUNK_SIZE):
+    """Users per block so that a block holds about `rows` cart rows, keeping memory bounded."""
+    return max(1, rows * num_users // max(num_items, 1))
+
+
+def items_for_users(first_user, n_users, num_users, num_items):
+    """Share of num_items that falls on users first_user..first_user + n_users - 1.
+
+    Shares for consecutive user ranges always add up to exactly num_items.
+    """
+    end = first_user + n_users - 1
+    return num_items * end // num_users - num_items * (first_user - 1) // num_users
+
+
+def first_cart_id(first_user, num_users, num_items):
+    """CartID of the first cart row of user first_user: one past the rows of all earlier users."""
+    return num_items * (first_user - 1) // num_users + 1
+
+
+def _unique_codes(rng, space, k):
+    # k distinct codes from [0, space) in random order. Generator.choice uses Floyd's
+    # algorithm (O(k) memory) for sparse draws and a partial shuffle of at most
+    # 50 * k codes for dense ones, so it never retries and never falls short.
+    if k > space:
+        raise ValueError(f"cannot draw {k} unique cart rows from {space} (user, product) pairs")
+    return rng.choice(space, k, replace=False)
+
+
+def _weighted_codes(rng, profile, first_user, n_users, num_products, k, max_rounds=8):
+    # k distinct codes with users and products drawn from a skewed profile. Pairs are
+    # drawn independently and de-duplicated for up to max_rounds; a block that is
+    # still short (only when it is nearly full) is topped up uniformly from the
+    # pairs not taken yet, so the count is always exact.
+    alpha = get_profile(profile).user_tail
+    users = None
+    if alpha is not None:
+        users = AliasTable(user_weights(first_user + n_users - 1, alpha)[first_user - 1:])
+
+    def draw(m):
+        local_users = rng.integers(0, n_users, m) if users is None else users.sample(rng, m)
+        return local_users * num_products + pick_products(rng, profile, num_products, m) - 1
+
+    codes = np.unique(draw(k))
+    for _ in range(max_rounds):
+        if len(codes) >= k:
+            break
+        codes = np.unique(np.concatenate([codes, draw(k - len(codes))]))
+    if len(codes) < k:
+        spare = np.setdiff1d(rng.choice(n_users * num_products, k, replace=False), codes)
+        codes = np.concatenate([codes, rng.permutation(spare)[:k - len(codes)]])
+    return rng.permutation(codes)
+
+
+def cart_columns(rng, first_user, n_users, num_users, num_items, num_products, now, profile=DEFAULT_PROFILE):
+    """Cart rows for users first_user..first_user + n_users - 1, in CART_COLUMNS order.
+
+    Pairs are sampled as codes (user - first_user) * num_products + (product - 1),
+    so they are unique without keeping a set of tuples. CartIDs continue from
+    the rows of the preceding users, so they do not depend on how users are chunked.
+    A skewed `profile` shifts rows towards heavy users and popular products
+    within the block; each block keeps its uniform share of the rows.
+    """
+    k = items_for_users(first_user, n_users, num_users, num_items)
+    if profile == DEFAULT_PROFILE:
+        codes = _unique_codes(rng, n_users * num_products, k)
+    else:
+        codes = _weighted_codes(rng, profile, first_user, n_users, num_products, k)
+    first_id = first_cart_id(first_user, num_users, num_items)
+    cart_ids = np.arange(first_id, first_id + k)
+    user_ids = codes // num_products + first_user
+    product_ids = codes % num_products + 1
+    quantity = rng.integers(1, 6, k)
+    date_added = format_dates(days_before(rng, now, 30, k))
+    return [cart_ids, user_ids, product_ids, quantity, date_added]
+
+
+def generate_cart_items_columnar(num_items=50000, num_users=10000, num_products=100000, seed=None, as_of=None,
+                                 data_format='csv', profile=DEFAULT_PROFILE):
+    check_capacity(num_items, num_users, num_products)
+    rng = np.random.default_rng(seed)
+    now = as_datetime64(as_of)
+    count = 0
+
+    with open_output('cart.csv', CART_COLUMNS, CART, data_format) as out:
+        timer = batch_timer(out.path)
+        for first_user, n_users in chunk_ranges(num_users, users_per_chunk(num_users, num_items)):
+            columns = cart_columns(rng, first_user, n_users, num_users, num_items, num_products, now, profile)
+            timer.lap('build')
+            out.write(first_user, columns)
+            timer.lap('write', len(columns[0]))
+            count += len(columns[0])
+            print(f"Generated {count} cart items...")
+
+    print(f"Completed! Generated {count} cart items in {out.path}")
+
+
+def generate_cart_items_sharded(num_items=50000, num_users=10000, num_products=100000,
+                                seed=DEFAULT_SEED, workers=None, as_of=None, keep_parts=False, data_format='csv',
+                                profile=DEFAULT_PROFILE):
+    check_capacity(num_items, num_users, num_products)
+    count = run_sharded(cart_columns, num_users, 'cart.csv', CART_COLUMNS, seed=seed, workers=workers,
+                        shard_size=USERS_PER_SHARD, chunk_size=users_per_chunk(num_users, num_items),
+                        keep_parts=keep_parts, table=CART, data_format=data_format, num_users=num_users,
+                        num_items=num_items, num_products=num_products, now=as_datetime64(as_of), profile=profile)
+    print(f"Completed! Generated {count} cart items in {output_path('cart.csv', data_format)}")
+
+
 if __name__ == "__main__":
-    generate_cart_items(50000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate cart.csv")
+    add_generation_arguments(parser)
+    args = parse_generation_arguments(parser)
+    configure(args.metrics)
+
+    if args.sharded:
+        seed = DEFAULT_SEED if args.seed is None else args.seed
+        generate_cart_items_sharded(50000, seed=seed, workers=args.workers, as_of=args.as_of, keep_parts=args.keep_parts,
+                                    data_format=args.data_format, profile=args.profile)
+    elif args.columnar:
+        generate_cart_items_columnar(50000, seed=args.seed, as_of=args.as_of, data_format=args.data_format,
+                                     profile=args.profile)
+    else:
+        random.seed(args.seed)
+        generate_cart_items(50000)
+
+    export(args.metrics)
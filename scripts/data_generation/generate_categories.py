@@ -56,11 +56,11 @@ categories = [
 
 with open("categories.csv", "w", newline="", encoding="utf-8") as f:
     writer = csv.writer(f)
-    writer.writerow(["CategoryName", "Description", "IsActive"])
+    writer.writerow(["CategoryID", "CategoryName", "Description", "IsActive"])
 
     for i, category in enumerate(categories, 1):
         description = f"High-quality {category.lower()} products for all your needs"
         is_active = 1
-        writer.writerow([category, description, is_active])
+        writer.writerow([i, category, description, is_active])
 
 print(f"Generated {len(categories)} categories in categories.csv")
@@ -1,27 +1,38 @@
+import argparse
 import csv
 import random
 from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+import order_index
+from columnar import DEFAULT_CHUNK_SIZE, as_datetime64, chunk_ranges, format_dates, prices
+from colstore import open_output, output_path
+from distributions import DEFAULT_PROFILE, pick_products
+from instrumentation import batch_timer, configure, export
+from schema import ORDER_ITEM
+from sharding import DEFAULT_SEED, add_generation_arguments, parse_generation_arguments, run_sharded
+
+ORDER_ITEM_COLUMNS = ['OrderItemID', 'OrderID', 'OrderDate', 'ProductID', 'Quantity', 'PriceAtPurchase']
 
 def generate_order_items(num_items=400000, num_orders=500000, num_products=100000):
-    print("Reading orders file for date alignment...")
-    order_dates = {}
-    with open('orders.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader, 1):
-            order_dates[idx] = row['OrderDate']
+    print("Loading order date index...")
+    order_dates = order_index.load()
     
     print(f"Loaded {len(order_dates)} order dates")
     
     with open('order_items.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['OrderID', 'OrderDate', 'ProductID', 'Quantity', 'PriceAtPurchase'])
-
-        items_per_order = {}
+        writer.writerow(ORDER_ITEM_COLUMNS)
         
         for i in range(1, num_items + 1):
             order_id = random.randint(1, num_orders)
 
-            order_date = order_dates.get(order_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            if order_id <= len(order_dates):
+                order_date = str(order_dates[order_id - 1]).replace('T', ' ')
+            else:
+                order_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
             product_id = random.randint(1, num_products)
 
@@ -29,12 +40,91 @@ def generate_order_items(num_items=400000, num_orders=500000, num_products=10000
 
             price = round(random.uniform(5.00, 9999.99), 2)
             
-            writer.writerow([order_id, order_date, product_id, quantity, price])
+            writer.writerow([i, order_id, order_date, product_id, quantity, price])
             
             if i % 50000 == 0:
                 print(f"Generated {i} order items...")
         
         print(f"Completed! Generated {num_items} order items in order_items.csv")
 
+
+def order_item_columns(rng, first_id, n, order_dates, num_orders, num_products, fallback_date, profile=DEFAULT_PROFILE):
+    """Build one chunk of `n` order items in ORDER_ITEM_COLUMNS order; ProductIDs follow `profile`."""
+    item_ids = np.arange(first_id, first_id + n)
+    order_ids = rng.integers(1, num_orders + 1, n)
+    known = order_ids <= len(order_dates)
+    dates = np.full(n, fallback_date, dtype='datetime64[s]')
+    dates[known] = order_dates[order_ids[known] - 1]
+
+    product_ids = pick_products(rng, profile, num_products, n)
+    quantity = rng.integers(1, 11, n)
+    price = prices(rng, 5.00, 9999.99, n)
+    return [item_ids, order_ids, format_dates(dates), product_ids, quantity, price]
+
+
+def _fallback_date(as_of):
+    # Items pointing past the end of orders.csv get the reference time, as in the row generator.
+    return as_datetime64(as_of)
+
+
+@lru_cache(maxsize=1)
+def _cached_order_dates(path):
+    # Each worker process maps the index once and reuses it for all its shards.
+    return order_index.load(path)
+
+
+def _sharded_order_item_columns(rng, first_id, n, index_path, **params):
+    return order_item_columns(rng, first_id, n, _cached_order_dates(index_path), **params)
+
+
+def generate_order_items_columnar(num_items=400000, num_orders=500000, num_products=100000,
+                                  chunk_size=DEFAULT_CHUNK_SIZE, seed=None, as_of=None, data_format='csv',
+                                  profile=DEFAULT_PROFILE):
+    print("Loading order date index...")
+    order_dates = order_index.load()
+    print(f"Loaded {len(order_dates)} order dates")
+
+    rng = np.random.default_rng(seed)
+    fallback_date = _fallback_date(as_of)
+
+    with open_output('order_items.csv', ORDER_ITEM_COLUMNS, ORDER_ITEM, data_format) as out:
+        timer = batch_timer(out.path)
+        for first_id, n in chunk_ranges(num_items, chunk_size):
+            columns = order_item_columns(rng, first_id, n, order_dates, num_orders, num_products, fallback_date,
+                                         profile)
+            timer.lap('build')
+            out.write(first_id, columns)
+            timer.lap('write', n)
+            print(f"Generated {first_id + n - 1} order items...")
+
+    print(f"Completed! Generated {num_items} order items in {out.path}")
+
+
+def generate_order_items_sharded(num_items=400000, num_orders=500000, num_products=100000,
+                                 seed=DEFAULT_SEED, workers=None, as_of=None, keep_parts=False, data_format='csv',
+                                 profile=DEFAULT_PROFILE):
+    rows = run_sharded(_sharded_order_item_columns, num_items, 'order_items.csv', ORDER_ITEM_COLUMNS,
+                       seed=seed, workers=workers, keep_parts=keep_parts, table=ORDER_ITEM, data_format=data_format,
+                       index_path=order_index.INDEX_PATH, num_orders=num_orders, num_products=num_products,
+                       fallback_date=_fallback_date(as_of), profile=profile)
+    print(f"Completed! Generated {rows} order items in {output_path('order_items.csv', data_format)}")
+
+
 if __name__ == "__main__":
-    generate_order_items(400000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate order_items.csv from orders.csv")
+    add_generation_arguments(parser)
+    args = parse_generation_arguments(parser)
+    configure(args.metrics)
+
+    if args.sharded:
+        seed = DEFAULT_SEED if args.seed is None else args.seed
+        generate_order_items_sharded(400000, seed=seed, workers=args.workers, as_of=args.as_of, keep_parts=args.keep_parts,
+                                     data_format=args.data_format, profile=args.profile)
+    elif args.columnar:
+        generate_order_items_columnar(400000, seed=args.seed, as_of=args.as_of, data_format=args.data_format,
+                                      profile=args.profile)
+    else:
+        random.seed(args.seed)
+        generate_order_items(400000)
+
+    export(args.metrics)
@@ -1,6 +1,19 @@
+import argparse
 import csv
 import random
+from array import array
 from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+import order_index
+from columnar import DEFAULT_CHUNK_SIZE, as_datetime64, chunk_ranges, digits, format_dates, join, pick, prices
+from colstore import open_output, output_path
+from distributions import DEFAULT_PROFILE, pick_dates, pick_users
+from instrumentation import batch_timer, configure, export
+from schema import ORDER
+from sharding import DEFAULT_SEED, add_generation_arguments, parse_generation_arguments, run_sharded
 
 statuses = ['Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled']
 status_weights = [0.05, 0.10, 0.15, 0.65, 0.05]  
@@ -13,17 +26,22 @@ cities = [
 
 street_names = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Elm St", "Park Ave", "Washington Blvd", "Lincoln Way"]
 
+ORDER_COLUMNS = ['OrderID', 'UserID', 'OrderDate', 'TotalAmount', 'Status', 'ShippingAddress', 'ShippingCity', 'ShippingPostalCode']
+
 def generate_orders(num_orders=500000, num_users=10000):
     with open('orders.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['UserID', 'OrderDate', 'TotalAmount', 'Status', 'ShippingAddress', 'ShippingCity', 'ShippingPostalCode'])
+        writer.writerow(ORDER_COLUMNS)
 
-        start_date = datetime.now() - timedelta(days=730)
+        start_date = datetime.now().replace(microsecond=0) - timedelta(days=730)
+        order_dates = array('q')
         
         for i in range(1, num_orders + 1):
             user_id = random.randint(1, num_users)
             days_offset = random.randint(0, 730)
-            order_date = (start_date + timedelta(days=days_offset)).strftime('%Y-%m-%d %H:%M:%S')
+            order_datetime = start_date + timedelta(days=days_offset)
+            order_dates.append(order_index.to_epoch(order_datetime))
+            order_date = order_datetime.strftime('%Y-%m-%d %H:%M:%S')
 
             total_amount = round(random.uniform(10.00, 5000.00), 2)
 
@@ -34,12 +52,94 @@ def generate_orders(num_orders=500000, num_users=10000):
             shipping_city = random.choice(cities)
             shipping_postal = f"{random.randint(10000, 99999)}"
             
-            writer.writerow([user_id, order_date, total_amount, status, shipping_address, shipping_city, shipping_postal])
+            writer.writerow([i, user_id, order_date, total_amount, status, shipping_address, shipping_city, shipping_postal])
             
             if i % 50000 == 0:
                 print(f"Generated {i} orders...")
-    
+
+    order_index.save(order_dates)
     print(f"Completed! Generated {num_orders} orders in orders.csv")
 
+
+def order_columns(rng, first_id, n, num_users, start_date, days=730, date_index=None, profile=DEFAULT_PROFILE):
+    """Build one chunk of `n` orders as a list of column arrays in ORDER_COLUMNS order.
+
+    When `date_index` is given the chunk's OrderDates are also recorded in it
+    (see order_index.py). `profile` names the distributions.py profile for
+    UserID and OrderDate.
+    """
+    order_ids = np.arange(first_id, first_id + n)
+    user_ids = pick_users(rng, profile, num_users, n)
+    dates = pick_dates(rng, profile, start_date, days, n)
+    if date_index is not None:
+        order_index.record(date_index, first_id, dates)
+    order_dates = format_dates(dates)
+    total_amount = prices(rng, 10.00, 5000.00, n)
+    status = pick(rng, statuses, n, p=status_weights)
+    shipping_address = join(digits(rng, 1, 9999, n), ' ', pick(rng, street_names, n))
+    shipping_city = pick(rng, cities, n)
+    shipping_postal = digits(rng, 10000, 99999, n)
+    return [order_ids, user_ids, order_dates, total_amount, status, shipping_address, shipping_city, shipping_postal]
+
+
+def generate_orders_columnar(num_orders=500000, num_users=10000, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, as_of=None,
+                             data_format='csv', profile=DEFAULT_PROFILE):
+    rng = np.random.default_rng(seed)
+    start_date = as_datetime64(as_of) - np.timedelta64(730, 'D')
+    date_index = order_index.create(num_orders)
+
+    with open_output('orders.csv', ORDER_COLUMNS, ORDER, data_format) as out:
+        timer = batch_timer(out.path)
+        for first_id, n in chunk_ranges(num_orders, chunk_size):
+            columns = order_columns(rng, first_id, n, num_users, start_date, date_index=date_index, profile=profile)
+            timer.lap('build')
+            out.write(first_id, columns)
+            timer.lap('write', n)
+            print(f"Generated {first_id + n - 1} orders...")
+
+    date_index.flush()
+    print(f"Completed! Generated {num_orders} orders in {out.path}")
+
+
+@lru_cache(maxsize=1)
+def _shared_date_index(path):
+    # Shards write disjoint slices of the same memory-mapped index file.
+    return order_index.open_for_update(path)
+
+
+def _sharded_order_columns(rng, first_id, n, index_path, **params):
+    date_index = _shared_date_index(index_path)
+    columns = order_columns(rng, first_id, n, date_index=date_index, **params)
+    date_index.flush()
+    return columns
+
+
+def generate_orders_sharded(num_orders=500000, num_users=10000, seed=DEFAULT_SEED, workers=None, as_of=None, keep_parts=False,
+                            data_format='csv', profile=DEFAULT_PROFILE):
+    start_date = as_datetime64(as_of) - np.timedelta64(730, 'D')
+    order_index.create(num_orders).flush()
+    rows = run_sharded(_sharded_order_columns, num_orders, 'orders.csv', ORDER_COLUMNS, seed=seed, workers=workers,
+                       keep_parts=keep_parts, table=ORDER, data_format=data_format,
+                       index_path=order_index.INDEX_PATH, num_users=num_users, start_date=start_date,
+                       profile=profile)
+    print(f"Completed! Generated {rows} orders in {output_path('orders.csv', data_format)}")
+
+
 if __name__ == "__main__":
-    generate_orders(500000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate orders.csv")
+    add_generation_arguments(parser)
+    args = parse_generation_arguments(parser)
+    configure(args.metrics)
+
+    if args.sharded:
+        seed = DEFAULT_SEED if args.seed is None else args.seed
+        generate_orders_sharded(500000, seed=seed, workers=args.workers, as_of=args.as_of, keep_parts=args.keep_parts,
+                                data_format=args.data_format, profile=args.profile)
+    elif args.columnar:
+        generate_orders_columnar(500000, seed=args.seed, as_of=args.as_of, data_format=args.data_format,
+                                 profile=args.profile)
+    else:
+        random.seed(args.seed)
+        generate_orders(500000)
+
+    export(args.metrics)
@@ -0,0 +1,129 @@
+"""Generate orders.csv and order_items.csv together, in one pass.
+
+generate_orders.py picks TotalAmount at random and generate_order_items.py
+picks PriceAtPurchase at random, so revenue queries (sp_GetTopSellingProducts,
+the CTEs in 09_ctes.sql) see totals that have nothing to do with the catalog.
+This script keeps the Price column of products.csv in memory and builds every
+chunk of orders together with their items:
+
+    PriceAtPurchase  the product's catalog Price
+    TotalAmount      SUM(Quantity * PriceAtPurchase) over the order's items
+                     (computed in cents, so it matches the database's DECIMAL sum)
+    OrderDate        copied from the order onto its items
+
+Every order gets between 1 and --max-items items. The order date index
+(order_dates.npy) is written as well, so generate_order_items.py can still be
+run on the same orders.
+"""
+import argparse
+import csv
+import os
+
+import numpy as np
+
+import order_index
+from colstore import ColumnStoreReader, add_format_argument, open_output
+from columnar import DEFAULT_CHUNK_SIZE, as_datetime64, chunk_ranges
+from compressed_io import open_text_input
+from distributions import DEFAULT_PROFILE, add_profile_argument, pick_products
+from generate_order_items import ORDER_ITEM_COLUMNS
+from generate_orders import ORDER_COLUMNS, order_columns
+from instrumentation import add_metrics_argument, batch_timer, configure, export
+from schema import ORDER, ORDER_ITEM
+
+MAX_ITEMS_PER_ORDER = 5
+
+
+def load_catalog_prices(path='products.csv'):
+    """Product prices in cents, indexed by ProductID - 1, from products.csv or a products.cols store."""
+    if os.path.isdir(path):
+        reader = ColumnStoreReader(path)
+        product_ids = np.concatenate([reader.column(chunk, 'ProductID') for chunk in reader.chunks])
+        prices = np.concatenate([reader.column(chunk, 'Price') for chunk in reader.chunks])
+    else:
+        product_ids, prices = [], []
+        with open_text_input(path) as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            id_idx = header.index('ProductID')
+            price_idx = header.index('Price')
+            for row in reader:
+                product_ids.append(int(row[id_idx]))
+                prices.append(float(row[price_idx]))
+        product_ids, prices = np.asarray(product_ids, dtype=np.int64), np.asarray(prices)
+
+    cents = np.zeros(product_ids.max(), dtype=np.int64)
+    cents[product_ids - 1] = np.round(prices * 100)
+    return cents
+
+
+def order_with_item_columns(rng, first_id, first_item_id, n, num_users, start_date, price_cents,
+                            max_items=MAX_ITEMS_PER_ORDER, date_index=None, profile=DEFAULT_PROFILE, days=730):
+    """One chunk of `n` orders and their items, as (order columns, item columns).
+
+    OrderDates fall on start_date plus 0..`days` whole days.
+    """
+    orders = order_columns(rng, first_id, n, num_users, start_date, days, date_index, profile)
+    order_ids, order_dates = orders[0], orders[2]
+
+    counts = rng.integers(1, max_items + 1, n)
+    k = int(counts.sum())
+    item_ids = np.arange(first_item_id, first_item_id + k)
+    owner = np.repeat(np.arange(n), counts)
+    product_ids = pick_products(rng, profile, len(price_cents), k)
+    quantity = rng.integers(1, 11, k)
+    unit_cents = price_cents[product_ids - 1]
+
+    line_cents = quantity * unit_cents
+    orders[3] = np.bincount(owner, weights=line_cents, minlength=n).astype(np.int64) / 100
+    items = [item_ids, order_ids[owner], order_dates[owner], product_ids, quantity, unit_cents / 100]
+    return orders, items
+
+
+def generate_orders_with_items(num_orders=500000, num_users=10000, products_path='products.csv',
+                               max_items=MAX_ITEMS_PER_ORDER, chunk_size=DEFAULT_CHUNK_SIZE, seed=None,
+                               as_of=None, data_format='csv', profile=DEFAULT_PROFILE):
+    print(f"Loading catalog prices from {products_path}...")
+    price_cents = load_catalog_prices(products_path)
+    print(f"Loaded {len(price_cents)} product prices")
+
+    rng = np.random.default_rng(seed)
+    start_date = as_datetime64(as_of) - np.timedelta64(730, 'D')
+    date_index = order_index.create(num_orders)
+    num_items = 0
+
+    with open_output('orders.csv', ORDER_COLUMNS, ORDER, data_format) as orders_out, \
+            open_output('order_items.csv', ORDER_ITEM_COLUMNS, ORDER_ITEM, data_format) as items_out:
+        timer = batch_timer(orders_out.path)
+        for first_id, n in chunk_ranges(num_orders, chunk_size):
+            orders, items = order_with_item_columns(rng, first_id, num_items + 1, n, num_users, start_date,
+                                                    price_cents, max_items, date_index, profile)
+            timer.lap('build')
+            orders_out.write(first_id, orders)
+            items_out.write(num_items + 1, items)
+            timer.lap('write', n)
+            num_items += len(items[0])
+            print(f"Generated {first_id + n - 1} orders and {num_items} order items...")
+
+    date_index.flush()
+    print(f"Completed! Generated {num_orders} orders in {orders_out.path} and {num_items} order items "
+          f"in {items_out.path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate orders.csv and order_items.csv with catalog prices and consistent totals")
+    parser.add_argument('--products', default='products.csv', help="products CSV or column store to take prices from")
+    parser.add_argument('--max-items', type=int, default=MAX_ITEMS_PER_ORDER,
+                        help=f"most items per order; each order gets 1 to this many (default: {MAX_ITEMS_PER_ORDER})")
+    parser.add_argument('--seed', type=int, default=None, help="random seed; the same seed reproduces the same rows")
+    parser.add_argument('--as-of', default=None, help="reference 'YYYY-MM-DD HH:MM:SS' that dates count back from (default: now)")
+    add_format_argument(parser)
+    add_profile_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    configure(args.metrics)
+
+    generate_orders_with_items(500000, products_path=args.products, max_items=args.max_items, seed=args.seed,
+                               as_of=args.as_of, data_format=args.data_format, profile=args.profile)
+
+    export(args.metrics)
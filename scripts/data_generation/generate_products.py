@@ -1,7 +1,17 @@
+import argparse
 import csv
 import random
 from datetime import datetime, timedelta
 
+import numpy as np
+
+from columnar import DEFAULT_CHUNK_SIZE, as_datetime64, chunk_ranges, days_before, format_dates, join, pick, prices
+from colstore import open_output, output_path
+from distributions import DEFAULT_PROFILE, pick_categories
+from instrumentation import batch_timer, configure, export
+from schema import PRODUCT
+from sharding import DEFAULT_SEED, add_generation_arguments, parse_generation_arguments, run_sharded
+
 
 product_templates = [
     "Premium",
@@ -49,22 +59,23 @@ product_types = [
     "Blender",
 ]
 
+PRODUCT_COLUMNS = [
+    "ProductID",
+    "CategoryID",
+    "ProductName",
+    "Description",
+    "Price",
+    "StockQuantity",
+    "ImageURL",
+    "DateAdded",
+    "IsActive",
+]
+
 
 def generate_products(num_products=100000):
     with open("products.csv", "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(
-            [
-                "CategoryID",
-                "ProductName",
-                "Description",
-                "Price",
-                "StockQuantity",
-                "ImageURL",
-                "DateAdded",
-                "IsActive",
-            ]
-        )
+        writer.writerow(PRODUCT_COLUMNS)
 
         for i in range(1, num_products + 1):
             category_id = random.randint(1, 50)
@@ -90,6 +101,7 @@ def generate_products(num_products=100000):
 
             writer.writerow(
                 [
+                    i,
                     category_id,
                     product_name,
                     description,
@@ -107,5 +119,114 @@ def generate_products(num_products=100000):
     print(f"Completed! Generated {num_products} products in products.csv")
 
 
+def product_columns(rng, first_id, n, now, profile=DEFAULT_PROFILE):
+    """Build one chunk of `n` products, numbered from `first_id`, in PRODUCT_COLUMNS order.
+
+    CategoryIDs follow the distributions.py `profile`.
+    """
+    product_ids = np.arange(first_id, first_id + n)
+    ids = product_ids.astype(str)
+    category_id = pick_categories(rng, profile, 50, n)
+
+    product_type = pick(rng, product_types, n)
+    product_name = join(pick(rng, product_templates, n), " ", product_type, " ", ids)
+
+    description = join(
+        "High-quality ",
+        np.char.lower(product_type),
+        " with excellent features and durability",
+    )
+
+    price = prices(rng, 5.00, 9999.99, n)
+    stock = rng.integers(0, 1001, n)
+    image_url = join("https://example.com/images/product_", ids, ".jpg")
+    date_added = format_dates(days_before(rng, now, 365, n))
+    is_active = (rng.random(n) < 0.95).astype(np.int8)
+
+    return [
+        product_ids,
+        category_id,
+        product_name,
+        description,
+        price,
+        stock,
+        image_url,
+        date_added,
+        is_active,
+    ]
+
+
+def generate_products_columnar(
+    num_products=100000,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    seed=None,
+    as_of=None,
+    data_format="csv",
+    profile=DEFAULT_PROFILE,
+):
+    rng = np.random.default_rng(seed)
+    now = as_datetime64(as_of)
+
+    with open_output("products.csv", PRODUCT_COLUMNS, PRODUCT, data_format) as out:
+        timer = batch_timer(out.path)
+        for first_id, n in chunk_ranges(num_products, chunk_size):
+            columns = product_columns(rng, first_id, n, now, profile)
+            timer.lap("build")
+            out.write(first_id, columns)
+            timer.lap("write", n)
+            print(f"Generated {first_id + n - 1} products...")
+
+    print(f"Completed! Generated {num_products} products in {out.path}")
+
+
+def generate_products_sharded(
+    num_products=100000,
+    seed=DEFAULT_SEED,
+    workers=None,
+    as_of=None,
+    keep_parts=False,
+    data_format="csv",
+    profile=DEFAULT_PROFILE,
+):
+    rows = run_sharded(
+        product_columns,
+        num_products,
+        "products.csv",
+        PRODUCT_COLUMNS,
+        seed=seed,
+        workers=workers,
+        keep_parts=keep_parts,
+        table=PRODUCT,
+        data_format=data_format,
+        now=as_datetime64(as_of),
+        profile=profile,
+    )
+    print(f"Completed! Generated {rows} products in {output_path('products.csv', data_format)}")
+
+
 if __name__ == "__main__":
-    generate_products(100000)
+    parser = argparse.ArgumentParser(description="Generate products.csv")
+    add_generation_arguments(parser)
+    args = parse_generation_arguments(parser)
+    configure(args.metrics)
+
+    if args.sharded:
+        seed = DEFAULT_SEED if args.seed is None else args.seed
+        generate_products_sharded(
+            100000,
+            seed=seed,
+            workers=args.workers,
+            as_of=args.as_of,
+            keep_parts=args.keep_parts,
+            data_format=args.data_format,
+            profile=args.profile,
+        )
+    elif args.columnar:
+        generate_products_columnar(
+            100000, seed=args.seed, as_of=args.as_of, data_format=args.data_format, profile=args.profile
+        )
+    else:
+        random.seed(args.seed)
+        generate_products(100000)
+
+    export(args.metrics)
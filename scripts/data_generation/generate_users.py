@@ -1,7 +1,16 @@
+import argparse
 import csv
 import random
 from datetime import datetime, timedelta
 
+import numpy as np
+
+from columnar import DEFAULT_CHUNK_SIZE, as_datetime64, chunk_ranges, days_before, digits, format_dates, join, pick
+from colstore import open_output
+from instrumentation import batch_timer, configure, export
+from schema import USER
+from sharding import add_generation_arguments, parse_generation_arguments
+
 first_names = [
     "John", "Jane", "Michael", "Sarah", "David", "Emily", "Chris", "Lisa", "Daniel", "Ashley",
     "James", "Jessica", "Robert", "Amanda", "William", "Melissa", "Richard", "Jennifer", "Joseph", "Laura",
@@ -20,11 +29,15 @@ cities = [
     "Denver", "Boston", "Portland", "Las Vegas", "Detroit", "Memphis", "Nashville", "Baltimore", "Milwaukee"
 ]
 
+street_names = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Elm St", "Park Ave"]
+
+USER_COLUMNS = ['UserID', 'Email', 'PasswordHash', 'FirstName', 'LastName', 'PhoneNumber',
+                'Address', 'City', 'PostalCode', 'DateJoined', 'IsActive']
+
 def generate_users(num_users=10000):
     with open('users.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['Email', 'PasswordHash', 'FirstName', 'LastName', 'PhoneNumber', 
-                        'Address', 'City', 'PostalCode', 'DateJoined', 'IsActive'])
+        writer.writerow(USER_COLUMNS)
         
         for i in range(1, num_users + 1):
             first_name = random.choice(first_names)
@@ -36,7 +49,6 @@ def generate_users(num_users=10000):
             phone = f"+1-{random.randint(200, 999)}-{random.randint(100, 999)}-{random.randint(1000, 9999)}"
 
             street_num = random.randint(1, 9999)
-            street_names = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Elm St", "Park Ave"]
             address = f"{street_num} {random.choice(street_names)}"
             
             city = random.choice(cities)
@@ -47,7 +59,7 @@ def generate_users(num_users=10000):
 
             is_active = 1 if random.random() < 0.98 else 0
             
-            writer.writerow([email, password_hash, first_name, last_name, phone, 
+            writer.writerow([i, email, password_hash, first_name, last_name, phone, 
                            address, city, postal_code, date_joined, is_active])
             
             if i % 1000 == 0:
@@ -55,5 +67,53 @@ def generate_users(num_users=10000):
     
     print(f"Completed! Generated {num_users} users in users.csv")
 
+
+def user_columns(rng, first_id, n, now):
+    """Build one chunk of `n` users, numbered from `first_id`, in USER_COLUMNS order."""
+    user_ids = np.arange(first_id, first_id + n)
+    ids = user_ids.astype(str)
+    first_name = pick(rng, first_names, n)
+    last_name = pick(rng, last_names, n)
+    email = join(np.char.lower(first_name), '.', np.char.lower(last_name), ids, '@email.com')
+
+    password_hash = join('hash_', digits(rng, 100000, 999999, n))
+    phone = join('+1-', digits(rng, 200, 999, n), '-', digits(rng, 100, 999, n), '-', digits(rng, 1000, 9999, n))
+    address = join(digits(rng, 1, 9999, n), ' ', pick(rng, street_names, n))
+    city = pick(rng, cities, n)
+    postal_code = digits(rng, 10000, 99999, n)
+    date_joined = format_dates(days_before(rng, now, 730, n))
+    is_active = (rng.random(n) < 0.98).astype(np.int8)
+
+    return [user_ids, email, password_hash, first_name, last_name, phone,
+            address, city, postal_code, date_joined, is_active]
+
+
+def generate_users_columnar(num_users=10000, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, as_of=None, data_format='csv'):
+    rng = np.random.default_rng(seed)
+    now = as_datetime64(as_of)
+
+    with open_output('users.csv', USER_COLUMNS, USER, data_format) as out:
+        timer = batch_timer(out.path)
+        for first_id, n in chunk_ranges(num_users, chunk_size):
+            columns = user_columns(rng, first_id, n, now)
+            timer.lap('build')
+            out.write(first_id, columns)
+            timer.lap('write', n)
+            print(f"Generated {first_id + n - 1} users...")
+
+    print(f"Completed! Generated {num_users} users in {out.path}")
+
+
 if __name__ == "__main__":
-    generate_users(10000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate users.csv")
+    add_generation_arguments(parser, sharded=False, profile=False)
+    args = parse_generation_arguments(parser)
+    configure(args.metrics)
+
+    if args.columnar:
+        generate_users_columnar(10000, seed=args.seed, as_of=args.as_of, data_format=args.data_format)
+    else:
+        random.seed(args.seed)
+        generate_users(10000)
+
+    export(args.metrics)
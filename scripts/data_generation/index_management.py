@@ -0,0 +1,101 @@
+"""Disable secondary indexes around bulk loads and rebuild them afterwards.
+
+While a nonclustered index is enabled, every inserted row also has to be
+inserted into it, one random B-tree position at a time. For the indexes from
+05_indexes.sql (IX_Product_CategoryID, IX_Product_Active_Stock, IX_User_Email
+and IX_Cart_UserID) that maintenance runs through the whole load. Disabling
+them first and rebuilding them at the end builds each one once from a sorted
+scan of the loaded table instead.
+
+Only enabled, non-unique nonclustered indexes are disabled. Clustered indexes
+hold the table itself, and unique indexes back the UNIQUE constraints (such as
+User.Email) and the foreign keys that reference them, so those stay on.
+
+The rebuilds run in parallel, one connection per index. They are timed
+separately from the load (and recorded under the `index_rebuild` phase with
+--metrics), so the load time plus the rebuild time can be compared with a load
+made with --keep-indexes, which maintains the indexes during the insert.
+Rebuilds also run when the load fails, so a failed load never leaves indexes
+disabled. On SQLite there is nothing to disable.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from instrumentation import METRICS
+
+
+def disable_indexes(conn, tables):
+    """Disable the secondary indexes of `tables`; return the (table, index) pairs that were disabled."""
+    cursor = conn.cursor()
+    disabled = []
+    for table in tables:
+        for index in conn.backend.secondary_indexes(cursor, table):
+            conn.backend.disable_index(cursor, table, index)
+            disabled.append((table, index))
+    conn.commit()
+    cursor.close()
+    if disabled:
+        print(f"Disabled {len(disabled)} indexes: {', '.join(index for _, index in disabled)}")
+    return disabled
+
+
+def _rebuild(backend, table, index):
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        backend.rebuild_index(cursor, table, index)
+        conn.commit()
+        cursor.close()
+        return time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def rebuild_indexes(backend, indexes, workers=None):
+    """Rebuild (and so re-enable) `indexes` in parallel; return the wall-clock seconds it took."""
+    if not indexes:
+        return 0.0
+    print(f"Rebuilding {len(indexes)} indexes...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or len(indexes)) as pool:
+        futures = [(table, index, pool.submit(_rebuild, backend, table, index)) for table, index in indexes]
+        errors = []
+        for table, index, future in futures:
+            try:
+                seconds = future.result()
+            except Exception as e:
+                errors.append(e)
+                print(f"Rebuilding {index} on {table.name} failed: {e}")
+                continue
+            if METRICS.enabled:
+                METRICS.observe(table.name, 'index_rebuild', seconds)
+            print(f"Rebuilt {index} on {table.name} in {seconds:.2f}s")
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    print(f"Rebuilt {len(indexes)} indexes in {elapsed:.2f}s")
+    return elapsed
+
+
+@contextmanager
+def indexes_disabled(conn, tables, keep=False, workers=None):
+    """Disable the secondary indexes of `tables` for the body of the block, then rebuild them.
+
+    With `keep` nothing is disabled, for comparison runs that maintain the indexes during the load.
+    """
+    indexes = [] if keep else disable_indexes(conn, tables)
+    start = time.perf_counter()
+    try:
+        yield indexes
+    finally:
+        if indexes:
+            print(f"Load with indexes disabled took {time.perf_counter() - start:.2f}s")
+        rebuild_indexes(conn.backend, indexes, workers)
+
+
+def add_index_argument(parser):
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help="maintain the nonclustered indexes during the load instead of disabling them "
+                             "and rebuilding them afterwards")
@@ -0,0 +1,188 @@
+"""Per-batch instrumentation for the generate and load loops.
+
+A batch loop takes a timer from batch_timer(label) and calls lap(phase) after
+each step, so every batch's time is split into phases:
+
+    loaders     parse (CSV reading), build (tuple building; in pipeline.py, waiting
+                for the generator thread), execute (executemany / TVP call /
+                bcp staging), commit, and bcp for the final bcp run
+    generators  build (column arrays) and write (csv.writer)
+
+Samples are kept per label and phase and summarised as p50/p95/p99 latencies and
+rows/sec. They are written as a JSON summary and a Prometheus text-format file.
+Instrumentation is off unless --metrics is given. When it is off, batch_timer()
+returns a timer whose methods do nothing, and no clock is read per row.
+"""
+import json
+import time
+from array import array
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_PREFIX = 'ecommerce_datagen'
+
+
+class Metrics:
+    """Phase timings and row counts per label (a table name or an output CSV)."""
+
+    def __init__(self):
+        self.enabled = False
+        self.samples = {}
+        self.rows = {}
+        self.spans = {}
+
+    def start(self, label):
+        # Wall-clock spans, so spans recorded in worker processes can be merged.
+        now = time.time()
+        self.spans.setdefault(label, [now, now])
+
+    def observe(self, label, phase, seconds):
+        key = (label, phase)
+        if key not in self.samples:
+            self.samples[key] = array('d')
+        self.samples[key].append(seconds)
+
+    def count(self, label, rows):
+        self.rows[label] = self.rows.get(label, 0) + rows
+        self.spans.setdefault(label, [time.time()] * 2)[1] = time.time()
+
+    def snapshot(self):
+        """Picklable copy of everything recorded, for merging in another process."""
+        return self.samples, self.rows, self.spans
+
+    def merge(self, snapshot):
+        samples, rows, spans = snapshot
+        for key, values in samples.items():
+            self.samples.setdefault(key, array('d')).extend(values)
+        for label, count in rows.items():
+            self.rows[label] = self.rows.get(label, 0) + count
+        for label, (first, last) in spans.items():
+            span = self.spans.setdefault(label, [first, last])
+            span[0], span[1] = min(span[0], first), max(span[1], last)
+
+    def summary(self):
+        labels = sorted({label for label, _ in self.samples} | set(self.rows))
+        result = {}
+        for label in labels:
+            first, last = self.spans.get(label, (0.0, 0.0))
+            seconds = last - first
+            rows = self.rows.get(label, 0)
+            phases = {}
+            for (sample_label, phase), values in sorted(self.samples.items()):
+                if sample_label != label:
+                    continue
+                values = np.frombuffer(values, dtype=np.float64)
+                phases[phase] = {
+                    'batches': len(values),
+                    'total_seconds': round(float(values.sum()), 6),
+                    **{f"p{p}": round(float(v), 6) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+                }
+            result[label] = {
+                'rows': rows,
+                'seconds': round(seconds, 3),
+                'rows_per_sec': round(rows / seconds, 1) if seconds else 0.0,
+                'phases': phases,
+            }
+        return result
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_prometheus(self, path):
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_batch_seconds Time per batch spent in each phase.",
+            f"# TYPE {PROMETHEUS_PREFIX}_batch_seconds histogram",
+        ]
+        for (label, phase), values in sorted(self.samples.items()):
+            values = np.frombuffer(values, dtype=np.float64)
+            labels = f'label="{label}",phase="{phase}"'
+            counts = np.searchsorted(np.sort(values), BUCKETS, side='right')
+            for bound, count in zip(BUCKETS, counts):
+                lines.append(f'{PROMETHEUS_PREFIX}_batch_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{PROMETHEUS_PREFIX}_batch_seconds_bucket{{{labels},le="+Inf"}} {len(values)}')
+            lines.append(f'{PROMETHEUS_PREFIX}_batch_seconds_sum{{{labels}}} {values.sum():.6f}')
+            lines.append(f'{PROMETHEUS_PREFIX}_batch_seconds_count{{{labels}}} {len(values)}')
+
+        summary = self.summary()
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_rows_total Rows generated or loaded.")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_rows_total counter")
+        for label, stats in summary.items():
+            lines.append(f'{PROMETHEUS_PREFIX}_rows_total{{label="{label}"}} {stats["rows"]}')
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_rows_per_second Rows per second over the whole run.")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_rows_per_second gauge")
+        for label, stats in summary.items():
+            lines.append(f'{PROMETHEUS_PREFIX}_rows_per_second{{label="{label}"}} {stats["rows_per_sec"]}')
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+class BatchTimer:
+    """Splits the time of a batch loop into phases, one lap per phase per batch."""
+
+    def __init__(self, metrics, label):
+        self.metrics = metrics
+        self.label = label
+        self.credited = 0.0
+        metrics.start(label)
+        self.last = time.perf_counter()
+
+    def restart(self):
+        """Start the next lap now, discarding the time since the previous one."""
+        self.last = time.perf_counter()
+        self.credited = 0.0
+
+    def split(self, phase, seconds):
+        """Record `seconds` of the current lap, measured elsewhere, under `phase`."""
+        self.metrics.observe(self.label, phase, seconds)
+        self.credited += seconds
+
+    def lap(self, phase, rows=0):
+        """Record the time since the previous lap (minus any splits) under `phase`."""
+        now = time.perf_counter()
+        self.metrics.observe(self.label, phase, now - self.last - self.credited)
+        self.last = now
+        self.credited = 0.0
+        if rows:
+            self.metrics.count(self.label, rows)
+
+
+class _NullTimer:
+    def restart(self):
+        pass
+
+    def split(self, phase, seconds):
+        pass
+
+    def lap(self, phase, rows=0):
+        pass
+
+
+METRICS = Metrics()
+_NULL_TIMER = _NullTimer()
+
+
+def batch_timer(label, metrics=METRICS):
+    return BatchTimer(metrics, label) if metrics.enabled else _NULL_TIMER
+
+
+def configure(prefix):
+    """Turn instrumentation on when an output prefix was given."""
+    METRICS.enabled = bool(prefix)
+
+
+def export(prefix):
+    """Write <prefix>.json and <prefix>.prom, if instrumentation is on."""
+    if not (prefix and METRICS.enabled):
+        return
+    METRICS.write_json(f"{prefix}.json")
+    METRICS.write_prometheus(f"{prefix}.prom")
+    print(f"Wrote metrics to {prefix}.json and {prefix}.prom")
+
+
+def add_metrics_argument(parser):
+    parser.add_argument('--metrics', default=None, metavar='PREFIX',
+                        help="record per-batch phase timings and write them to PREFIX.json and PREFIX.prom")
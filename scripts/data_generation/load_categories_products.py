@@ -1,74 +1,52 @@
-import pyodbc
-import csv
+import argparse
 
-conn_str = (
-    'DRIVER={ODBC Driver 18 for SQL Server};'
-    # 'SERVER=localhost,1433;'
-    'SERVER=localhost;'
-    'DATABASE=ECommerceDB;'
-    'UID=sa;'
-    'PWD=YourStrong!Passw0rd;'
-    'TrustServerCertificate=yes;'
-)
+from bulk_load import DEFAULT_STRATEGY, add_strategy_argument
+from checkpoint import LoadCheckpoint, add_resume_argument, load_columns, load_csv
+from colstore import add_format_argument, output_path
+from db import add_backend_argument, connect
+from index_management import add_index_argument, indexes_disabled
+from instrumentation import add_metrics_argument, configure, export
+from schema import CATEGORY, PRODUCT
 
-try:
-    conn = pyodbc.connect(conn_str)
-    cursor = conn.cursor()
-    print("Connected to database successfully!")
+BATCH_SIZE = 1000
+
+
+def load_categories_products(conn, strategy=DEFAULT_STRATEGY, resume=False, data_format='csv', keep_indexes=False):
+    checkpoint = LoadCheckpoint(conn, 'load_categories_products', resume)
 
     print("Loading categories...")
-    with open('categories.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
-        for row in reader:
-            cursor.execute(
-                "INSERT INTO Category (CategoryName, Description, IsActive) VALUES (?, ?, ?)",
-                row['CategoryName'], row['Description'], int(row['IsActive'])
-            )
-            count += 1
-        conn.commit()
-        print(f"Loaded {count} categories successfully!")
+    load_csv(conn, checkpoint, CATEGORY, 'categories.csv', "categories", strategy, BATCH_SIZE)
 
     print("Loading products...")
-    with open('products.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
-        batch = []
-        for row in reader:
-            batch.append((
-                int(row['CategoryID']),
-                row['ProductName'],
-                row['Description'],
-                float(row['Price']),
-                int(row['StockQuantity']),
-                row['ImageURL'],
-                row['DateAdded'],
-                int(row['IsActive'])
-            ))
+    with indexes_disabled(conn, [PRODUCT], keep_indexes):
+        if data_format == 'columns':
+            load_columns(conn, checkpoint, PRODUCT, 'products.cols', "products", strategy, BATCH_SIZE)
+        else:
+            load_csv(conn, checkpoint, PRODUCT, output_path('products.csv', data_format), "products", strategy, BATCH_SIZE)
+
+    checkpoint.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load categories.csv and products.csv")
+    add_strategy_argument(parser)
+    add_resume_argument(parser)
+    add_format_argument(parser)
+    add_index_argument(parser)
+    add_backend_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    configure(args.metrics)
+
+    try:
+        conn = connect(args.backend)
+        print("Connected to database successfully!")
 
-            if len(batch) >= 1000:
-                cursor.executemany(
-                    "INSERT INTO Product (CategoryID, ProductName, Description, Price, StockQuantity, ImageURL, DateAdded, IsActive) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    batch
-                )
-                conn.commit()
-                count += len(batch)
-                print(f"Loaded {count} products...")
-                batch = []
+        load_categories_products(conn, args.strategy, args.resume, args.data_format, args.keep_indexes)
 
-        if batch:
-            cursor.executemany(
-                "INSERT INTO Product (CategoryID, ProductName, Description, Price, StockQuantity, ImageURL, DateAdded, IsActive) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                batch
-            )
-            conn.commit()
-            count += len(batch)
+        conn.close()
+        print("\nAll data loaded successfully!")
+        export(args.metrics)
         
-        print(f"Loaded {count} products successfully!")
-    
-    cursor.close()
-    conn.close()
-    print("\nAll data loaded successfully!")
-    
-except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+    except Exception as e:
+        print(f"Error: {e}")
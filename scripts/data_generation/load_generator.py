@@ -0,0 +1,307 @@
+"""Concurrent shopper load generator for the live workload.
+
+The loaders fill tables with the triggers off. This script drives the
+database the way the storefront does, through the objects in
+master_script.sql:
+
+    browse         SELECT TOP 20 ... FROM vw_ProductCatalog for one category
+    add_to_cart    INSERT INTO Cart, through trg_InsteadOfCart_ValidateStock
+    place_order    EXEC sp_PlaceOrder for a shopper with items in their cart
+    update_status  EXEC sp_UpdateOrderStatus on an existing or newly placed order
+
+Requests arrive open-loop at --rate per second for --duration seconds, each
+for a random shopper (a UserID from users.csv) with the --mix of operations.
+They are executed by --concurrency worker threads, each on its own pooled
+connection (pyodbc calls block, so threads rather than asyncio). Latency is
+measured from a request's scheduled start, so time spent queued behind a slow
+database counts against it instead of quietly lowering the request rate.
+
+Outcomes per operation:
+
+    ok         committed
+    rejected   refused by the schema's own checks (RAISERROR in a trigger or
+               procedure, constraint violations)
+    deadlock   chosen as deadlock victim (error 1205)
+    error      anything else
+    dropped    not started because more than --max-backlog requests were waiting
+
+The report lists throughput, p50/p95/p99 latency of the committed requests and
+the outcome counts per operation. With --metrics the latencies of every
+outcome are also written as JSON and as a Prometheus histogram (see
+instrumentation.py), labelled by operation with the outcome as the phase.
+Stored procedures and views exist only on SQL Server, so there is no SQLite
+backend here.
+"""
+import argparse
+import csv
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from colstore import ColumnStoreReader
+from compressed_io import open_text_input
+from db import get_backend
+from distributions import DEFAULT_PROFILE, add_profile_argument, pick_products, pick_users
+from instrumentation import METRICS, PERCENTILES, add_metrics_argument, configure, export
+
+OPERATIONS = ('browse', 'add_to_cart', 'place_order', 'update_status')
+DEFAULT_MIX = 'browse=60,add_to_cart=25,place_order=10,update_status=5'
+OUTCOMES = ('ok', 'rejected', 'deadlock', 'error', 'dropped')
+STATUSES = ['Processing', 'Shipped', 'Delivered', 'Cancelled']
+DRAW_BLOCK = 4096
+
+# SQL Server error numbers, as they appear in pyodbc messages.
+DEADLOCK_ERRORS = ('(1205)',)
+REJECTED_ERRORS = ('(50000)', '(3609)', '(547)', '(2627)', '(2601)')
+
+
+def parse_mix(text):
+    """'browse=60,add_to_cart=25,...' -> {operation: weight}."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation {name!r}, expected one of {OPERATIONS}")
+        mix[name] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("the operation mix needs at least one positive weight")
+    return mix
+
+
+def read_columns(path, names):
+    """Columns of a generated CSV or column store, as lists of strings (CSV) or arrays (store)."""
+    if os.path.isdir(path):
+        reader = ColumnStoreReader(path)
+        return [np.concatenate([reader.column(chunk, name) for chunk in reader.chunks]) for name in names]
+    with open_text_input(path) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        indexes = [header.index(name) for name in names]
+        columns = [[] for _ in names]
+        for row in reader:
+            for column, index in zip(columns, indexes):
+                column.append(row[index])
+    return columns
+
+
+def classify(error):
+    message = str(error)
+    if (error.args and error.args[0] == '40001') or any(e in message for e in DEADLOCK_ERRORS):
+        return 'deadlock'
+    if any(e in message for e in REJECTED_ERRORS):
+        return 'rejected'
+    return 'error'
+
+
+class Shoppers:
+    """Users, products and orders to draw from, plus which shoppers have filled a cart.
+
+    Draws are made in blocks of DRAW_BLOCK through distributions.py, so a
+    skewed --profile concentrates requests on power users and hot products.
+    Only the scheduler thread draws requests; workers only report placed orders.
+    """
+
+    def __init__(self, users_path, products_path, orders_path, seed=None, profile=DEFAULT_PROFILE):
+        user_ids, addresses, cities, postal_codes = read_columns(
+            users_path, ['UserID', 'Address', 'City', 'PostalCode'])
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.addresses = [_text(v) for v in addresses]
+        self.cities = [_text(v) for v in cities]
+        self.postal_codes = [_text(v) for v in postal_codes]
+        product_ids, category_ids = read_columns(products_path, ['ProductID', 'CategoryID'])
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.category_ids = np.asarray(category_ids, dtype=np.int64)
+        self.order_ids = np.asarray(read_columns(orders_path, ['OrderID'])[0], dtype=np.int64).tolist()
+
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        self.profile = profile
+        self.carts = []
+        self._users = iter(())
+        self._products = iter(())
+
+    def user(self):
+        """Index of a random shopper in the users file."""
+        try:
+            return next(self._users)
+        except StopIteration:
+            self._users = iter((pick_users(self.rng, self.profile, len(self.user_ids), DRAW_BLOCK) - 1).tolist())
+            return next(self._users)
+
+    def product(self):
+        """Index of a random product in the products file."""
+        try:
+            return next(self._products)
+        except StopIteration:
+            self._products = iter((pick_products(self.rng, self.profile, len(self.product_ids), DRAW_BLOCK) - 1).tolist())
+            return next(self._products)
+
+    def request(self, operation):
+        """(SQL, params) for one request of `operation`."""
+        if operation == 'browse':
+            category = int(self.category_ids[self.product()])
+            return ("SELECT TOP 20 ProductID, ProductName, Price, StockStatus FROM vw_ProductCatalog "
+                    "WHERE CategoryID = ? ORDER BY Price;", (category,))
+        if operation == 'add_to_cart':
+            user = self.user()
+            self.carts.append(user)
+            return ("INSERT INTO Cart (UserID, ProductID, Quantity, DateAdded) VALUES (?, ?, ?, GETDATE());",
+                    (int(self.user_ids[user]), int(self.product_ids[self.product()]), self.random.randint(1, 3)))
+        if operation == 'place_order':
+            if self.carts:
+                index = self.random.randrange(len(self.carts))
+                self.carts[index], self.carts[-1] = self.carts[-1], self.carts[index]
+                user = self.carts.pop()
+            else:
+                user = self.user()
+            return ("EXEC sp_PlaceOrder ?, ?, ?, ?;", (int(self.user_ids[user]), self.addresses[user],
+                                                      self.cities[user], self.postal_codes[user]))
+        order_id = self.order_ids[self.random.randrange(len(self.order_ids))]
+        return "EXEC sp_UpdateOrderStatus ?, ?;", (order_id, self.random.choice(STATUSES))
+
+    def placed(self, order_id):
+        # list.append is atomic, so worker threads may report new orders directly.
+        self.order_ids.append(order_id)
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+class LoadGenerator:
+    """Schedules requests at a fixed rate and runs them on a pool of worker threads."""
+
+    def __init__(self, shoppers, mix, rate, duration, concurrency, max_backlog):
+        self.shoppers = shoppers
+        self.operations = list(mix)
+        self.weights = list(mix.values())
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.max_backlog = max_backlog
+        self.backend = get_backend()
+        self.outcomes = Counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.connections = []
+        self.backlog = 0
+        self.elapsed = 0.0
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.backend.connect()
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def _execute(self, operation, sql, params, scheduled):
+        conn = self._connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            if operation == 'browse':
+                cursor.fetchall()
+            elif operation == 'place_order':
+                row = cursor.fetchone()
+                if row is not None:
+                    self.shoppers.placed(int(row[0]))
+            conn.commit()
+            outcome = 'ok'
+        except Exception as e:
+            conn.rollback()
+            outcome = classify(e)
+        finally:
+            cursor.close()
+        latency = time.perf_counter() - scheduled
+        with self.lock:
+            self.backlog -= 1
+            self.outcomes[operation, outcome] += 1
+            METRICS.observe(operation, outcome, latency)
+            if outcome == 'ok':
+                METRICS.count(operation, 1)
+
+    def run(self):
+        interval = 1.0 / self.rate
+        start = time.perf_counter()
+        for operation in self.operations:
+            METRICS.start(operation)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='shopper') as pool:
+            scheduled = start
+            next_report = start + 10
+            while scheduled < start + self.duration:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                operation = self.shoppers.random.choices(self.operations, self.weights)[0]
+                with self.lock:
+                    dropped = self.backlog >= self.max_backlog
+                    if dropped:
+                        self.outcomes[operation, 'dropped'] += 1
+                    else:
+                        self.backlog += 1
+                if not dropped:
+                    sql, params = self.shoppers.request(operation)
+                    pool.submit(self._execute, operation, sql, params, scheduled)
+                scheduled += interval
+                if scheduled >= next_report:
+                    done = sum(n for (_, outcome), n in self.outcomes.items() if outcome != 'dropped')
+                    print(f"{scheduled - start:.0f}s: {done} requests completed, {self.backlog} waiting...")
+                    next_report += 10
+        self.elapsed = time.perf_counter() - start
+        for conn in self.connections:
+            conn.close()
+
+    def report(self):
+        summary = METRICS.summary()
+        header = f"{'operation':<14}{'req/s':>9}" + ''.join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+        header += ''.join(f"{outcome:>10}" for outcome in OUTCOMES)
+        print(header)
+        for operation in self.operations:
+            ok = self.outcomes[operation, 'ok']
+            latency = summary.get(operation, {}).get('phases', {}).get('ok', {})
+            line = f"{operation:<14}{ok / self.elapsed:>9.1f}"
+            line += ''.join(f"{latency.get(f'p{p}', 0.0) * 1000:>10.1f}" for p in PERCENTILES)
+            line += ''.join(f"{self.outcomes[operation, outcome]:>10}" for outcome in OUTCOMES)
+            print(line)
+        total = sum(self.outcomes[operation, 'ok'] for operation in self.operations)
+        print(f"\n{total} requests committed in {self.elapsed:.1f}s ({total / self.elapsed:.1f} req/s, "
+              f"target {self.rate:g} req/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent shoppers against ECommerceDB and report latencies")
+    parser.add_argument('--rate', type=float, default=200, help="requests per second to schedule (default: 200)")
+    parser.add_argument('--duration', type=float, default=60, help="seconds to run (default: 60)")
+    parser.add_argument('--concurrency', type=int, default=64, help="worker threads, each with its own connection (default: 64)")
+    parser.add_argument('--max-backlog', type=int, default=10000,
+                        help="requests allowed to wait for a worker before new ones are dropped (default: 10000)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--users', default='users.csv', help="users CSV or column store to draw shoppers from")
+    parser.add_argument('--products', default='products.csv', help="products CSV or column store to draw products from")
+    parser.add_argument('--orders', default='orders.csv', help="orders CSV or column store to draw status updates from")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for the request sequence")
+    add_profile_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    configure(args.metrics)
+
+    try:
+        mix = parse_mix(args.mix)
+        print("Reading users, products and orders...")
+        shoppers = Shoppers(args.users, args.products, args.orders, args.seed, args.profile)
+        print(f"{len(shoppers.user_ids)} shoppers, {len(shoppers.product_ids)} products, {len(shoppers.order_ids)} orders")
+
+        generator = LoadGenerator(shoppers, mix, args.rate, args.duration, args.concurrency, args.max_backlog)
+        print(f"Running {args.rate:g} req/s for {args.duration:g}s on {args.concurrency} connections...")
+        generator.run()
+        generator.report()
+        export(args.metrics)
+    except Exception as e:
+        print(f"Error: {e}")
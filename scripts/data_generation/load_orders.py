@@ -1,102 +1,81 @@
-import pyodbc
-import csv
+import argparse
 
-conn_str = (
-    'DRIVER={ODBC Driver 18 for SQL Server};'
-    # 'SERVER=localhost,1433;'
-    'SERVER=localhost;'
-    'DATABASE=ECommerceDB;'
-    'UID=sa;'
-    'PWD=YourStrong!Passw0rd;'
-    'TrustServerCertificate=yes;'
-)
+from bulk_load import DEFAULT_STRATEGY, add_strategy_argument
+from checkpoint import LoadCheckpoint, add_resume_argument, load_columns, load_csv
+from colstore import add_format_argument, output_path
+from db import add_backend_argument, connect
+from index_management import add_index_argument, indexes_disabled
+from instrumentation import add_metrics_argument, configure, export
+from reconcile_stock import reconcile_stock
+from schema import ORDER, ORDER_ITEM
 
-try:
-    conn = pyodbc.connect(conn_str)
+BATCH_SIZE = 5000
+
+
+def load_orders(conn, strategy=DEFAULT_STRATEGY, resume=False, data_format='csv', keep_indexes=False):
+    checkpoint = LoadCheckpoint(conn, 'load_orders', resume)
     cursor = conn.cursor()
-    print("Connected to database successfully!")
 
     print("Disabling stock update trigger...")
-    cursor.execute("DISABLE TRIGGER trg_AfterOrderItem_UpdateStock ON OrderItem;")
+    conn.backend.disable_trigger(cursor, 'OrderItem', 'trg_AfterOrderItem_UpdateStock')
     conn.commit()
 
-    print("Loading orders...")
-    with open('orders.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
-        batch = []
-        for row in reader:
-            batch.append((
-                int(row['UserID']),
-                row['OrderDate'],
-                float(row['TotalAmount']),
-                row['Status'],
-                row['ShippingAddress'],
-                row['ShippingCity'],
-                row['ShippingPostalCode']
-            ))
-            
-            if len(batch) >= 5000:
-                cursor.executemany(
-                    "INSERT INTO [Order] (UserID, OrderDate, TotalAmount, Status, ShippingAddress, ShippingCity, ShippingPostalCode) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    batch
-                )
-                conn.commit()
-                count += len(batch)
-                print(f"Loaded {count} orders...")
-                batch = []
-        
-        if batch:
-            cursor.executemany(
-                "INSERT INTO [Order] (UserID, OrderDate, TotalAmount, Status, ShippingAddress, ShippingCity, ShippingPostalCode) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                batch
-            )
-            conn.commit()
-            count += len(batch)
-        
-        print(f"Loaded {count} orders successfully!")
+    try:
+        with indexes_disabled(conn, [ORDER, ORDER_ITEM], keep_indexes):
+            print("Loading orders...")
+            if data_format == 'columns':
+                load_columns(conn, checkpoint, ORDER, 'orders.cols', "orders", strategy, BATCH_SIZE)
+            else:
+                load_csv(conn, checkpoint, ORDER, output_path('orders.csv', data_format), "orders", strategy,
+                         BATCH_SIZE)
 
-    print("Loading order items...")
-    with open('order_items.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
-        batch = []
-        for row in reader:
-            batch.append((
-                int(row['OrderID']),
-                row['OrderDate'],
-                int(row['ProductID']),
-                int(row['Quantity']),
-                float(row['PriceAtPurchase'])
-            ))
-            
-            if len(batch) >= 5000:
-                cursor.executemany(
-                    "INSERT INTO OrderItem (OrderID, OrderDate, ProductID, Quantity, PriceAtPurchase) VALUES (?, ?, ?, ?, ?)",
-                    batch
-                )
-                conn.commit()
-                count += len(batch)
-                print(f"Loaded {count} order items...")
-                batch = []
-        
-        if batch:
-            cursor.executemany(
-                "INSERT INTO OrderItem (OrderID, OrderDate, ProductID, Quantity, PriceAtPurchase) VALUES (?, ?, ?, ?, ?)",
-                batch
-            )
-            conn.commit()
-            count += len(batch)
-        
-        print(f"Loaded {count} order items successfully!")
+            print("Loading order items...")
+            if data_format == 'columns':
+                load_columns(conn, checkpoint, ORDER_ITEM, 'order_items.cols', "order items", strategy, BATCH_SIZE)
+            else:
+                load_csv(conn, checkpoint, ORDER_ITEM, output_path('order_items.csv', data_format), "order items",
+                         strategy, BATCH_SIZE)
+    finally:
+        print("Re-enabling stock update trigger...")
+        conn.backend.enable_trigger(cursor, 'OrderItem', 'trg_AfterOrderItem_UpdateStock')
+        conn.commit()
+        cursor.close()
+    checkpoint.clear()
 
-    print("Re-enabling stock update trigger...")
-    cursor.execute("ENABLE TRIGGER trg_AfterOrderItem_UpdateStock ON OrderItem;")
-    conn.commit()
-    
-    cursor.close()
-    conn.close()
-    print("\nAll order data loaded successfully!")
-    
-except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load orders.csv and order_items.csv")
+    add_strategy_argument(parser)
+    add_resume_argument(parser)
+    add_format_argument(parser)
+    parser.add_argument('--partitioned', action='store_true',
+                        help="load each pf_OrderDate partition in parallel through a staging table and SWITCH it in")
+    parser.add_argument('--skip-stock', action='store_true',
+                        help="do not apply the loaded items' quantities to Product.StockQuantity afterwards")
+    add_index_argument(parser)
+    add_backend_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    if args.partitioned and args.data_format != 'csv':
+        parser.error("--partitioned reads orders.csv and order_items.csv; use --format csv")
+    configure(args.metrics)
+
+    try:
+        conn = connect(args.backend)
+        print("Connected to database successfully!")
+
+        if args.partitioned:
+            from partition_load import load_orders_partitioned
+            load_orders_partitioned(conn, args.strategy)
+        else:
+            load_orders(conn, args.strategy, args.resume, args.data_format, args.keep_indexes)
+
+        if not args.skip_stock:
+            reconcile_stock(conn, output_path('order_items.csv', args.data_format))
+
+        conn.close()
+        print("\nAll order data loaded successfully!")
+        export(args.metrics)
+        
+    except Exception as e:
+        print(f"Error: {e}")
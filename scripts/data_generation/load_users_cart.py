@@ -1,127 +1,69 @@
-import pyodbc
-import csv
+import argparse
 
-conn_str = (
-    'DRIVER={ODBC Driver 18 for SQL Server};'
-    # 'SERVER=localhost,1433;'
-    'SERVER=localhost;'
-    'DATABASE=ECommerceDB;'
-    'UID=sa;'
-    'PWD=YourStrong!Passw0rd;'
-    'TrustServerCertificate=yes;'
-)
+from bulk_load import DEFAULT_STRATEGY, add_strategy_argument
+from checkpoint import LoadCheckpoint, add_resume_argument, load_columns, load_csv
+from colstore import add_format_argument, output_path
+from db import add_backend_argument, connect
+from index_management import add_index_argument, indexes_disabled
+from instrumentation import add_metrics_argument, configure, export
+from schema import ADMIN, CART, USER
 
-try:
-    conn = pyodbc.connect(conn_str)
+BATCH_SIZE = 1000
+
+
+def load_users_cart(conn, strategy=DEFAULT_STRATEGY, resume=False, data_format='csv', keep_indexes=False):
+    checkpoint = LoadCheckpoint(conn, 'load_users_cart', resume)
     cursor = conn.cursor()
-    print("Connected to database successfully!")
 
     print("Disabling cart validation trigger...")
-    cursor.execute("DISABLE TRIGGER trg_InsteadOfCart_ValidateStock ON Cart;")
+    conn.backend.disable_trigger(cursor, 'Cart', 'trg_InsteadOfCart_ValidateStock')
     conn.commit()
 
-    print("Loading users...")
-    with open('users.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
-        batch = []
-        for row in reader:
-            batch.append((
-                row['Email'],
-                row['PasswordHash'],
-                row['FirstName'],
-                row['LastName'],
-                row['PhoneNumber'],
-                row['Address'],
-                row['City'],
-                row['PostalCode'],
-                row['DateJoined'],
-                int(row['IsActive'])
-            ))
-            
-            if len(batch) >= 1000:
-                cursor.executemany(
-                    "INSERT INTO [User] (Email, PasswordHash, FirstName, LastName, PhoneNumber, Address, City, PostalCode, DateJoined, IsActive) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    batch
-                )
-                conn.commit()
-                count += len(batch)
-                print(f"Loaded {count} users...")
-                batch = []
-        
-        if batch:
-            cursor.executemany(
-                "INSERT INTO [User] (Email, PasswordHash, FirstName, LastName, PhoneNumber, Address, City, PostalCode, DateJoined, IsActive) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                batch
-            )
-            conn.commit()
-            count += len(batch)
-        
-        print(f"Loaded {count} users successfully!")
+    try:
+        with indexes_disabled(conn, [USER, ADMIN, CART], keep_indexes):
+            print("Loading users...")
+            if data_format == 'columns':
+                load_columns(conn, checkpoint, USER, 'users.cols', "users", strategy, BATCH_SIZE)
+            else:
+                load_csv(conn, checkpoint, USER, output_path('users.csv', data_format), "users", strategy, BATCH_SIZE)
 
-    print("Loading admins...")
-    with open('admins.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
-        batch = []
-        for row in reader:
-            batch.append((
-                row['Email'],
-                row['PasswordHash'],
-                row['FirstName'],
-                row['LastName'],
-                row['Role'],
-                row['DateCreated'],
-                int(row['IsActive'])
-            ))
-        
-        cursor.executemany(
-            "INSERT INTO Admin (Email, PasswordHash, FirstName, LastName, Role, DateCreated, IsActive) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            batch
-        )
+            print("Loading admins...")
+            load_csv(conn, checkpoint, ADMIN, 'admins.csv', "admins", strategy, BATCH_SIZE)
+
+            print("Loading cart items...")
+            if data_format == 'columns':
+                load_columns(conn, checkpoint, CART, 'cart.cols', "cart items", strategy, BATCH_SIZE)
+            else:
+                load_csv(conn, checkpoint, CART, output_path('cart.csv', data_format), "cart items", strategy,
+                         BATCH_SIZE)
+    finally:
+        print("Re-enabling cart validation trigger...")
+        conn.backend.enable_trigger(cursor, 'Cart', 'trg_InsteadOfCart_ValidateStock')
         conn.commit()
-        print(f"Loaded {len(batch)} admins successfully!")
+        cursor.close()
+    checkpoint.clear()
 
-    print("Loading cart items...")
-    with open('cart.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
-        batch = []
-        for row in reader:
-            batch.append((
-                int(row['UserID']),
-                int(row['ProductID']),
-                int(row['Quantity']),
-                row['DateAdded']
-            ))
-            
-            if len(batch) >= 1000:
-                cursor.executemany(
-                    "INSERT INTO Cart (UserID, ProductID, Quantity, DateAdded) VALUES (?, ?, ?, ?)",
-                    batch
-                )
-                conn.commit()
-                count += len(batch)
-                print(f"Loaded {count} cart items...")
-                batch = []
-        
-        if batch:
-            cursor.executemany(
-                "INSERT INTO Cart (UserID, ProductID, Quantity, DateAdded) VALUES (?, ?, ?, ?)",
-                batch
-            )
-            conn.commit()
-            count += len(batch)
-        
-        print(f"Loaded {count} cart items successfully!")
 
-    print("Re-enabling cart validation trigger...")
-    cursor.execute("ENABLE TRIGGER trg_InsteadOfCart_ValidateStock ON Cart;")
-    conn.commit()
-    
-    cursor.close()
-    conn.close()
-    print("\nAll data loaded successfully!")
-    
-except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load users.csv, admins.csv and cart.csv")
+    add_strategy_argument(parser)
+    add_resume_argument(parser)
+    add_format_argument(parser)
+    add_index_argument(parser)
+    add_backend_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    configure(args.metrics)
+
+    try:
+        conn = connect(args.backend)
+        print("Connected to database successfully!")
+
+        load_users_cart(conn, args.strategy, args.resume, args.data_format, args.keep_indexes)
+
+        conn.close()
+        print("\nAll data loaded successfully!")
+        export(args.metrics)
+        
+    except Exception as e:
+        print(f"Error: {e}")
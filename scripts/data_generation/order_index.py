@@ -0,0 +1,76 @@
+"""Compact OrderID -> OrderDate index.
+
+Order dates are kept as int64 epoch seconds in a .npy file, position OrderID - 1,
+so an order costs 8 bytes instead of a dict entry holding a datetime string.
+The orders generators write it as a side output of orders.csv and the order item
+generators memory-map it instead of parsing orders.csv again.
+"""
+import csv
+import os
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+from columnar import DATE_FORMAT
+from compressed_io import open_text_input
+
+INDEX_PATH = 'order_dates.npy'
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value):
+    """Epoch seconds for a naive datetime, matching NumPy's datetime64[s]."""
+    return int((value - EPOCH).total_seconds())
+
+
+def create(num_orders, path=INDEX_PATH):
+    """Create an index file for num_orders orders and return it as a writable memmap."""
+    return np.lib.format.open_memmap(path, mode='w+', dtype=np.int64, shape=(num_orders,))
+
+
+def open_for_update(path=INDEX_PATH):
+    return np.lib.format.open_memmap(path, mode='r+')
+
+
+def record(index, first_id, dates):
+    """Store a chunk of datetime64 OrderDates for OrderIDs first_id, first_id + 1, ..."""
+    index[first_id - 1:first_id - 1 + len(dates)] = dates.astype('datetime64[s]').astype(np.int64)
+
+
+def save(epoch_seconds, path=INDEX_PATH):
+    """Save a sequence of epoch seconds (e.g. an array('q')) as the index file."""
+    np.save(path, np.asarray(epoch_seconds, dtype=np.int64))
+
+
+def build_from_csv(orders_path='orders.csv', path=INDEX_PATH):
+    """Build the index from an existing orders.csv, one pass, without holding the strings.
+
+    Dates are placed by the file's OrderID column, so the rows may be in any order.
+    """
+    order_ids = array('q')
+    epoch_seconds = array('q')
+    with open_text_input(orders_path) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        id_idx = header.index('OrderID')
+        date_idx = header.index('OrderDate')
+        for row in reader:
+            order_ids.append(int(row[id_idx]))
+            epoch_seconds.append(to_epoch(datetime.strptime(row[date_idx], DATE_FORMAT)))
+    order_ids = np.frombuffer(order_ids, dtype=np.int64)
+    index = np.zeros(order_ids.max(initial=0), dtype=np.int64)
+    index[order_ids - 1] = np.frombuffer(epoch_seconds, dtype=np.int64)
+    save(index, path)
+
+
+def load(path=INDEX_PATH, orders_path='orders.csv'):
+    """Memory-map the index as a read-only datetime64[s] array indexed by OrderID - 1.
+
+    If the index is missing (orders.csv came from elsewhere) it is built from orders.csv first.
+    """
+    if not os.path.exists(path):
+        print(f"Building {path} from {orders_path}...")
+        build_from_csv(orders_path, path)
+    return np.load(path, mmap_mode='r').view('datetime64[s]')
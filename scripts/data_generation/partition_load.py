@@ -0,0 +1,196 @@
+"""Partition-aware parallel loading of [Order] and OrderItem.
+
+Rows are routed by OrderDate to their pf_OrderDate partition. Each partition is
+bulk-loaded over its own connection into an empty staging table that has the
+target's columns and clustered key, with TABLOCK so the insert is minimally
+logged. The staging tables are then switched into the empty target partitions
+with ALTER TABLE ... SWITCH, so partitions load in parallel instead of as one
+serialized insert stream into the same B-tree. SELECT TOP 0 ... INTO copies no
+constraints, so before the switch each staging table is given the target's
+CHECK constraints and a range CHECK on OrderDate, all trusted (WITH CHECK), as
+SWITCH requires.
+
+Rows carry the OrderID / OrderItemID assigned by the generators, so the result
+does not depend on which partition finishes first. The generators write IDs in
+ascending order, so rows reach each staging table sorted by the clustered key.
+"""
+import bisect
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_load import BulkLoader, DEFAULT_STRATEGY
+from columnar import DATE_FORMAT
+from schema import ORDER, ORDER_ITEM, Table, quoted
+from typed_csv import TypedCsvReader
+
+PARTITION_FUNCTION = 'pf_OrderDate'
+BATCH_SIZE = 5000
+QUEUE_BATCHES = 4
+
+# SWITCH needs the staging table to carry the target's foreign keys and cannot
+# switch into a table other tables reference, so these are dropped for the load
+# and re-created WITH CHECK afterwards (in this order; dropped in reverse).
+FOREIGN_KEYS = [
+    ('Order', 'FK_Order_User', "FOREIGN KEY (UserID) REFERENCES [User](UserID)"),
+    ('OrderItem', 'FK_OrderItem_Order',
+     "FOREIGN KEY (OrderID, OrderDate) REFERENCES [Order](OrderID, OrderDate) ON DELETE CASCADE"),
+    ('OrderItem', 'FK_OrderItem_Product', "FOREIGN KEY (ProductID) REFERENCES Product(ProductID)"),
+]
+
+_DONE = None
+
+
+def read_boundaries(cursor):
+    """pf_OrderDate boundary values, ascending, as 'YYYY-MM-DD HH:MM:SS' strings."""
+    cursor.execute(
+        "SELECT prv.value FROM sys.partition_range_values prv "
+        "JOIN sys.partition_functions pf ON pf.function_id = prv.function_id "
+        "WHERE pf.name = ? ORDER BY prv.boundary_id",
+        PARTITION_FUNCTION,
+    )
+    return [row[0].strftime(DATE_FORMAT) for row in cursor.fetchall()]
+
+
+def partition_number(boundaries, order_date):
+    """$PARTITION.pf_OrderDate(order_date) for a RANGE RIGHT function."""
+    return bisect.bisect_right(boundaries, order_date) + 1
+
+
+def staging_table(table, partition):
+    """Staging layout: the target's columns under a per-partition name."""
+    return Table(f"{table.name}_Stage_p{partition}", table.identity, table.columns)
+
+
+def _range_check(boundaries, partition):
+    conditions = []
+    if partition > 1:
+        conditions.append(f"OrderDate >= '{boundaries[partition - 2]}'")
+    if partition <= len(boundaries):
+        conditions.append(f"OrderDate < '{boundaries[partition - 1]}'")
+    return ' AND '.join(conditions) or 'OrderDate IS NOT NULL'
+
+
+def read_check_constraints(cursor, table):
+    """Definitions of the CHECK constraints on `table`, as stored in sys.check_constraints."""
+    cursor.execute("SELECT definition FROM sys.check_constraints WHERE parent_object_id = OBJECT_ID(?) ORDER BY name",
+                   quoted(table))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _load_partition(backend, table, partition, boundaries, checks, batches, strategy):
+    stage = staging_table(table, partition)
+    conn = backend.connect()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {quoted(stage)};")
+        cursor.execute(f"SELECT TOP 0 * INTO {quoted(stage)} FROM {quoted(table)};")
+        cursor.execute(f"ALTER TABLE {quoted(stage)} ADD CONSTRAINT PK_{stage.name} "
+                       f"PRIMARY KEY CLUSTERED ({table.identity}, OrderDate);")
+        conn.commit()
+
+        loader = BulkLoader(conn, stage, strategy, BATCH_SIZE, tablock=True)
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                break
+            loader.insert(batch)
+        rows = loader.finish()
+
+        # SWITCH needs trusted constraints on the stage that imply the target's CHECKs and partition range.
+        for i, definition in enumerate(checks, 1):
+            cursor.execute(f"ALTER TABLE {quoted(stage)} WITH CHECK ADD CONSTRAINT CK_{stage.name}_{i} "
+                           f"CHECK {definition};")
+        cursor.execute(f"ALTER TABLE {quoted(stage)} WITH CHECK ADD CONSTRAINT CK_{stage.name}_Range "
+                       f"CHECK ({_range_check(boundaries, partition)});")
+        conn.commit()
+        return rows
+    except BaseException:
+        # Keep draining so the reader never blocks on this partition's full queue.
+        while batches.get() is not _DONE:
+            pass
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _check_partitions_empty(cursor, table):
+    cursor.execute(f"SELECT $PARTITION.{PARTITION_FUNCTION}(OrderDate), COUNT(*) FROM {quoted(table)} "
+                   f"GROUP BY $PARTITION.{PARTITION_FUNCTION}(OrderDate);")
+    occupied = [partition for partition, count in cursor.fetchall() if count]
+    if occupied:
+        raise RuntimeError(f"{table.name} partitions {occupied} are not empty; SWITCH needs empty targets")
+
+
+def load_table_partitioned(conn, table, path, strategy=DEFAULT_STRATEGY):
+    """Load one CSV into `table`, one staging table and connection per partition."""
+    cursor = conn.cursor()
+    boundaries = read_boundaries(cursor)
+    partitions = range(1, len(boundaries) + 2)
+    _check_partitions_empty(cursor, table)
+    checks = read_check_constraints(cursor, table)
+
+    queues = {p: queue.Queue(maxsize=QUEUE_BATCHES) for p in partitions}
+    pending = {p: [] for p in partitions}
+    date_index = [c.name for c in table.columns].index('OrderDate')
+
+    print(f"Loading {table.name} into {len(partitions)} partitions in parallel...")
+    with ThreadPoolExecutor(max_workers=len(queues)) as pool:
+        futures = {p: pool.submit(_load_partition, conn.backend, table, p, boundaries, checks, queues[p], strategy)
+                   for p in partitions}
+
+        try:
+            with TypedCsvReader(path, table) as reader:
+                for batch in reader.batches(BATCH_SIZE):
+                    for row in batch:
+                        p = partition_number(boundaries, row[date_index])
+                        pending[p].append(row)
+                        if len(pending[p]) >= BATCH_SIZE:
+                            queues[p].put(pending[p])
+                            pending[p] = []
+
+            for p in partitions:
+                if pending[p]:
+                    queues[p].put(pending[p])
+        finally:
+            for p in partitions:
+                queues[p].put(_DONE)
+
+        loaded = {p: future.result() for p, future in futures.items()}
+
+    for p in partitions:
+        stage = staging_table(table, p)
+        if loaded[p]:
+            cursor.execute(f"ALTER TABLE {quoted(stage)} SWITCH TO {quoted(table)} PARTITION {p};")
+        cursor.execute(f"DROP TABLE {quoted(stage)};")
+        conn.commit()
+        print(f"Switched {loaded[p]} rows into {table.name} partition {p}")
+
+    # SWITCH does not move the target's IDENTITY seed.
+    conn.backend.reseed(cursor, table)
+    conn.commit()
+    cursor.close()
+    return sum(loaded.values())
+
+
+def load_orders_partitioned(conn, strategy=DEFAULT_STRATEGY):
+    if conn.backend.name != 'sqlserver':
+        raise RuntimeError(f"partitioned loading needs SQL Server, not the {conn.backend.name} backend")
+    cursor = conn.cursor()
+
+    print("Dropping foreign keys on [Order] and OrderItem for partition switching...")
+    for table, name, _ in reversed(FOREIGN_KEYS):
+        cursor.execute(f"ALTER TABLE [{table}] DROP CONSTRAINT IF EXISTS {name};")
+    conn.commit()
+
+    try:
+        count = load_table_partitioned(conn, ORDER, 'orders.csv', strategy)
+        print(f"Loaded {count} orders successfully!")
+        count = load_table_partitioned(conn, ORDER_ITEM, 'order_items.csv', strategy)
+        print(f"Loaded {count} order items successfully!")
+    finally:
+        print("Re-creating and validating foreign keys...")
+        for table, name, definition in FOREIGN_KEYS:
+            cursor.execute(f"ALTER TABLE [{table}] WITH CHECK ADD CONSTRAINT {name} {definition};")
+        conn.commit()
+        cursor.close()
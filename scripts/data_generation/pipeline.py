@@ -0,0 +1,177 @@
+"""Generate-to-load streaming pipeline.
+
+Instead of writing CSVs and parsing them back in the load_*.py scripts, the
+columnar generators' chunks are turned into batches of typed tuples and passed
+straight to executemany. A bounded queue between the generator thread and the
+database writer lets generation overlap with network round trips while keeping
+memory flat.
+"""
+import argparse
+import csv
+import queue
+import threading
+
+import numpy as np
+
+from bulk_load import BulkLoader, DEFAULT_STRATEGY, add_strategy_argument
+from columnar import as_datetime64, chunk_ranges
+from db import DEFAULT_BACKEND, add_backend_argument, connect
+from distributions import DEFAULT_PROFILE, add_profile_argument
+from generate_cart import cart_columns, check_capacity, users_per_chunk
+from generate_order_items import order_item_columns
+from generate_orders import order_columns
+from generate_products import product_columns
+from generate_users import user_columns
+from index_management import add_index_argument, indexes_disabled
+from instrumentation import add_metrics_argument, configure, export
+from reconcile_stock import StockTally, apply_stock_changes
+from schema import CART, CATEGORY, ORDER, ORDER_ITEM, PRODUCT, USER
+
+BATCH_SIZE = 5000
+QUEUE_BATCHES = 8
+
+_DONE = object()
+
+
+def to_rows(columns):
+    """Turn a list of column arrays into a list of tuples of plain Python values."""
+    return list(zip(*[c.tolist() if isinstance(c, np.ndarray) else c for c in columns]))
+
+
+def iter_batches(build_chunk, total, rng, batch_size=BATCH_SIZE, **params):
+    """Yield batches of typed tuples from a columnar chunk builder over ids 1..total."""
+    for first_id, n in chunk_ranges(total, batch_size):
+        yield to_rows(build_chunk(rng, first_id, n, **params))
+
+
+def iter_cart_batches(rng, num_items, num_users, num_products, now, profile=DEFAULT_PROFILE):
+    check_capacity(num_items, num_users, num_products)
+    for first_user, n_users in chunk_ranges(num_users, users_per_chunk(num_users, num_items, BATCH_SIZE)):
+        yield to_rows(cart_columns(rng, first_user, n_users, num_users, num_items, num_products, now, profile))
+
+
+def stream_load(conn, table, batches, label, strategy=DEFAULT_STRATEGY, queue_batches=QUEUE_BATCHES):
+    """Insert batches produced on a background thread through a BulkLoader."""
+    pending = queue.Queue(maxsize=queue_batches)
+    stopped = threading.Event()
+    errors = []
+
+    def put(item):
+        # Gives up once the consumer has stopped, so a failed insert never leaves this thread blocked.
+        while not stopped.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    break
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            put(_DONE)
+
+    producer = threading.Thread(target=produce, name=f"generate-{label}", daemon=True)
+    producer.start()
+
+    try:
+        loader = BulkLoader(conn, table, strategy, BATCH_SIZE)
+        while True:
+            batch = pending.get()
+            if batch is _DONE:
+                break
+            loader.insert(batch)
+            print(f"Loaded {loader.rows} {label}...")
+    finally:
+        stopped.set()
+        producer.join()
+    if errors:
+        raise errors[0]
+    count = loader.finish()
+    print(f"Loaded {count} {label} successfully!")
+    return count
+
+
+def tally_items(batches, tally):
+    """Pass order item batches through, summing their quantities per product."""
+    for batch in batches:
+        _, _, _, product_ids, quantities, _ = zip(*batch)
+        tally.add(product_ids, quantities)
+        yield batch
+
+
+def read_categories(path='categories.csv'):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [(int(row['CategoryID']), row['CategoryName'], row['Description'], int(row['IsActive'])) for row in csv.DictReader(f)]
+
+
+def run_pipeline(num_products=100000, num_users=10000, num_cart_items=50000, num_orders=500000,
+                 num_order_items=400000, seed=None, as_of=None, strategy=DEFAULT_STRATEGY,
+                 queue_batches=QUEUE_BATCHES, backend=DEFAULT_BACKEND, profile=DEFAULT_PROFILE, keep_indexes=False):
+    rng = np.random.default_rng(seed)
+    now = as_datetime64(as_of)
+
+    conn = connect(backend)
+    cursor = conn.cursor()
+    print("Connected to database successfully!")
+
+    print("Disabling cart validation and stock update triggers...")
+    conn.backend.disable_trigger(cursor, 'Cart', 'trg_InsteadOfCart_ValidateStock')
+    conn.backend.disable_trigger(cursor, 'OrderItem', 'trg_AfterOrderItem_UpdateStock')
+    conn.commit()
+
+    try:
+        with indexes_disabled(conn, [PRODUCT, USER, CART, ORDER, ORDER_ITEM], keep_indexes):
+            stream_load(conn, CATEGORY, [read_categories()], "categories", strategy, queue_batches)
+            stream_load(conn, PRODUCT, iter_batches(product_columns, num_products, rng, now=now, profile=profile),
+                        "products", strategy, queue_batches)
+            stream_load(conn, USER, iter_batches(user_columns, num_users, rng, now=now),
+                        "users", strategy, queue_batches)
+            stream_load(conn, CART, iter_cart_batches(rng, num_cart_items, num_users, num_products, now, profile),
+                        "cart items", strategy, queue_batches)
+
+            # In-memory counterpart of order_dates.npy, filled by the order stage for the item stage.
+            date_index = np.zeros(num_orders, dtype=np.int64)
+            order_batches = iter_batches(order_columns, num_orders, rng, num_users=num_users,
+                                         start_date=now - np.timedelta64(730, 'D'), date_index=date_index, profile=profile)
+            stream_load(conn, ORDER, order_batches, "orders", strategy, queue_batches)
+            tally = StockTally()
+            item_batches = iter_batches(order_item_columns, num_order_items, rng, order_dates=date_index.view('datetime64[s]'),
+                                        num_orders=num_orders, num_products=num_products, fallback_date=now, profile=profile)
+            stream_load(conn, ORDER_ITEM, tally_items(item_batches, tally), "order items", strategy, queue_batches)
+            apply_stock_changes(conn, tally)
+    finally:
+        print("Re-enabling cart validation and stock update triggers...")
+        conn.backend.enable_trigger(cursor, 'Cart', 'trg_InsteadOfCart_ValidateStock')
+        conn.backend.enable_trigger(cursor, 'OrderItem', 'trg_AfterOrderItem_UpdateStock')
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    print("\nAll data generated and loaded successfully!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the dataset and load it directly, without intermediate CSVs")
+    parser.add_argument('--seed', type=int, default=None, help="random seed; the same seed reproduces the same rows")
+    parser.add_argument('--as-of', default=None, help="reference 'YYYY-MM-DD HH:MM:SS' that dates count back from (default: now)")
+    add_profile_argument(parser)
+    add_strategy_argument(parser)
+    add_index_argument(parser)
+    add_backend_argument(parser)
+    add_metrics_argument(parser)
+    parser.add_argument('--queue-batches', type=int, default=QUEUE_BATCHES, help="generated batches allowed to wait for the writer")
+    args = parser.parse_args()
+    configure(args.metrics)
+
+    try:
+        run_pipeline(seed=args.seed, as_of=args.as_of, strategy=args.strategy, queue_batches=args.queue_batches,
+                     backend=args.backend, profile=args.profile, keep_indexes=args.keep_indexes)
+        export(args.metrics)
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,323 @@
+"""Timing harness for the views, functions, stored procedures and CTEs.
+
+Each query runs --warmup times untimed and then --runs times with
+SET STATISTICS TIME, IO ON. The server's messages are parsed into elapsed
+time, CPU time and logical reads per run; the medians are reported and saved
+as JSON. The queries are:
+
+    views       SELECT * FROM each view in 04_views.sql
+    functions   each scalar UDF in 06_functions.sql called once per row of its
+                table, the way a report would call it
+    procedures  sp_GetTopSellingProducts (sp_PlaceOrder and sp_UpdateOrderStatus
+                change data; load_generator.py exercises them)
+    ctes        each WITH query in 09_ctes.sql, read from the file
+
+SQL Server does not count the reads made inside a scalar UDF in STATISTICS IO,
+so compare the functions on CPU and elapsed time, not logical reads.
+
+--plans DIR runs every query once more with SET STATISTICS XML ON and saves
+its actual execution plan as DIR/<query>.sqlplan, which SSMS opens.
+--compare diffs the run against an earlier results file and exits non-zero
+when a query got slower than --threshold allows. To measure what the
+05_indexes.sql indexes buy, save one run with them and compare a run made with
+--without-indexes, which drops them for the run and re-creates them afterwards.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from db import connect
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+VIEWS_SCRIPT = os.path.join(SQL_DIR, '04_views.sql')
+INDEXES_SCRIPT = os.path.join(SQL_DIR, '05_indexes.sql')
+CTES_SCRIPT = os.path.join(SQL_DIR, '09_ctes.sql')
+RESULTS_PATH = 'query_bench_results.json'
+DEFAULT_WARMUP = 1
+DEFAULT_RUNS = 5
+DEFAULT_THRESHOLD = 0.2
+SHOWPLAN_COLUMN = 'Microsoft SQL Server 2005 XML Showplan'
+
+EXECUTION_RE = re.compile(r'Execution Times:\s*CPU time = (\d+) ms,\s*elapsed time = (\d+) ms')
+COMPILE_RE = re.compile(r'parse and compile time:\s*CPU time = (\d+) ms,\s*elapsed time = (\d+) ms')
+IO_RE = re.compile(r"Table '([^']+)'\. Scan count (\d+), logical reads (\d+), physical reads (\d+)")
+
+Query = namedtuple('Query', ['name', 'kind', 'sql'])
+
+FUNCTION_QUERIES = [
+    Query('CalculateCartTotal', 'function',
+          "SELECT u.UserID, dbo.CalculateCartTotal(u.UserID) AS CartTotal FROM [User] u;"),
+    Query('GetUserOrderCount', 'function',
+          "SELECT u.UserID, dbo.GetUserOrderCount(u.UserID) AS OrderCount FROM [User] u;"),
+    Query('CheckStockAvailability', 'function',
+          "SELECT p.ProductID, dbo.CheckStockAvailability(p.ProductID, 5) AS Available FROM Product p;"),
+]
+
+PROCEDURE_QUERIES = [
+    Query('sp_GetTopSellingProducts', 'procedure', "EXEC sp_GetTopSellingProducts @TopN = 10;"),
+]
+
+
+def sql_batches(path):
+    """The batches of a SQL script, split on its GO lines."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [batch.strip() for batch in re.split(r'^\s*GO\s*$', f.read(), flags=re.MULTILINE)]
+
+
+def _slug(title):
+    return re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_')
+
+
+def view_queries(path=VIEWS_SCRIPT):
+    with open(path, 'r', encoding='utf-8') as f:
+        names = re.findall(r'CREATE VIEW (\w+)', f.read())
+    return [Query(name, 'view', f"SELECT * FROM {name};") for name in names]
+
+
+def cte_queries(path=CTES_SCRIPT):
+    """The WITH queries of 09_ctes.sql, named after their '-- CTE n: Title' comments."""
+    queries = []
+    title = None
+    for batch in sql_batches(path):
+        match = re.search(r'^-- (CTE \d+: .*)$', batch, flags=re.MULTILINE)
+        if match:
+            title = match.group(1)
+        if batch.upper().startswith('WITH'):
+            queries.append(Query(_slug(title or f"cte {len(queries) + 1}"), 'cte', batch))
+    return queries
+
+
+def all_queries():
+    return view_queries() + FUNCTION_QUERIES + PROCEDURE_QUERIES + cte_queries()
+
+
+def index_statements(path=INDEXES_SCRIPT):
+    """(name, table, CREATE INDEX statement) for each index in 05_indexes.sql."""
+    indexes = []
+    for batch in sql_batches(path):
+        match = re.search(r'CREATE NONCLUSTERED INDEX (\w+)\s+ON\s+(\[?\w+\]?)', batch)
+        if match:
+            indexes.append((match.group(1), match.group(2), batch[match.start():]))
+    return indexes
+
+
+def drop_indexes(cursor):
+    for name, table, _ in index_statements():
+        cursor.execute(f"DROP INDEX IF EXISTS {name} ON {table};")
+        print(f"Dropped {name}")
+
+
+def create_indexes(cursor):
+    for name, table, statement in index_statements():
+        cursor.execute("SELECT 1 FROM sys.indexes WHERE name = ? AND object_id = OBJECT_ID(?);", name, table)
+        if cursor.fetchone() is None:
+            cursor.execute(statement)
+            print(f"Re-created {name}")
+
+
+def execute(cursor, sql):
+    """Run `sql`, read every result set, and return (rows, server messages, plan XML or None)."""
+    cursor.execute(sql)
+    rows, messages, plan = 0, [], None
+    while True:
+        messages.extend(message for _, message in cursor.messages)
+        if cursor.description:
+            data = cursor.fetchall()
+            if cursor.description[0][0] == SHOWPLAN_COLUMN:
+                plan = data[0][0]
+            else:
+                rows += len(data)
+        if not cursor.nextset():
+            break
+    messages.extend(message for _, message in cursor.messages)
+    return rows, messages, plan
+
+
+def parse_statistics(messages):
+    """Elapsed and CPU ms and logical reads from STATISTICS TIME/IO messages.
+
+    A procedure reports one Execution Times block per statement plus one for the
+    EXEC that covers them all, so the largest block is taken as the query's time.
+    """
+    text = '\n'.join(messages)
+    executions = [(int(cpu), int(elapsed)) for cpu, elapsed in EXECUTION_RE.findall(text)]
+    compiles = [int(cpu) for cpu, _ in COMPILE_RE.findall(text)]
+    reads = {}
+    for table, _, logical, _ in IO_RE.findall(text):
+        reads[table] = reads.get(table, 0) + int(logical)
+    return {
+        'elapsed_ms': max((e for _, e in executions), default=0),
+        'cpu_ms': max((c for c, _ in executions), default=0),
+        'compile_cpu_ms': sum(compiles),
+        'logical_reads': sum(reads.values()),
+        'reads_by_table': reads,
+    }
+
+
+def bench_query(cursor, query, warmup=DEFAULT_WARMUP, runs=DEFAULT_RUNS):
+    for _ in range(warmup):
+        execute(cursor, query.sql)
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows, messages, _ = execute(cursor, query.sql)
+        sample = parse_statistics(messages)
+        sample['client_ms'] = (time.perf_counter() - start) * 1000
+        sample['rows'] = rows
+        samples.append(sample)
+
+    def median(key):
+        return round(statistics.median(s[key] for s in samples), 1)
+
+    return {
+        'query': query.name,
+        'kind': query.kind,
+        'runs': runs,
+        'rows': samples[-1]['rows'],
+        'elapsed_ms': median('elapsed_ms'),
+        'elapsed_ms_min': min(s['elapsed_ms'] for s in samples),
+        'cpu_ms': median('cpu_ms'),
+        'compile_cpu_ms': median('compile_cpu_ms'),
+        'logical_reads': median('logical_reads'),
+        'reads_by_table': samples[-1]['reads_by_table'],
+        'client_ms': median('client_ms'),
+    }
+
+
+def save_plan(cursor, query, plans_dir):
+    cursor.execute("SET STATISTICS XML ON;")
+    try:
+        _, _, plan = execute(cursor, query.sql)
+    finally:
+        cursor.execute("SET STATISTICS XML OFF;")
+    if plan is None:
+        return None
+    path = os.path.join(plans_dir, f"{query.name}.sqlplan")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(plan)
+    return path
+
+
+def run_benchmarks(conn, selected=None, warmup=DEFAULT_WARMUP, runs=DEFAULT_RUNS, plans_dir=None):
+    queries = [q for q in all_queries() if not selected or any(name in q.name for name in selected)]
+    cursor = conn.cursor()
+    cursor.execute("SET STATISTICS IO ON; SET STATISTICS TIME ON;")
+    if plans_dir:
+        os.makedirs(plans_dir, exist_ok=True)
+
+    results = []
+    for query in queries:
+        result = bench_query(cursor, query, warmup, runs)
+        results.append(result)
+        print(f"{query.name:<40} {result['rows']:>8} rows {result['elapsed_ms']:>10.1f} ms elapsed "
+              f"{result['cpu_ms']:>10.1f} ms CPU {result['logical_reads']:>12,.0f} logical reads")
+        if plans_dir:
+            path = save_plan(cursor, query, plans_dir)
+            if path:
+                print(f"{'':<40} plan saved to {path}")
+        conn.rollback()
+
+    cursor.execute("SET STATISTICS IO OFF; SET STATISTICS TIME OFF;")
+    cursor.close()
+    return results
+
+
+def save_results(results, path=RESULTS_PATH, label=None, indexes=True):
+    report = {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'label': label,
+        'indexes': indexes,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {len(results)} results to {path}")
+
+
+def _change(before, after):
+    return after / before - 1 if before else 0.0
+
+
+def compare(results, baseline_path, threshold=DEFAULT_THRESHOLD):
+    """Print elapsed, CPU and reads against a baseline file and return the queries that slowed beyond `threshold`."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    before_by_name = {r['query']: r for r in baseline['results']}
+    print(f"Compared with {baseline_path} ({baseline.get('label') or baseline['created']}, "
+          f"indexes {'on' if baseline.get('indexes', True) else 'off'}):")
+
+    regressions = []
+    for result in results:
+        before = before_by_name.get(result['query'])
+        if before is None:
+            continue
+        elapsed = _change(before['elapsed_ms'], result['elapsed_ms'])
+        flag = ''
+        if elapsed > threshold:
+            flag = '  REGRESSION'
+            regressions.append(result)
+        if before['rows'] != result['rows']:
+            flag += f"  ROWS {before['rows']} -> {result['rows']}"
+        print(f"{result['query']:<40} {before['elapsed_ms']:>9.1f} -> {result['elapsed_ms']:>9.1f} ms ({elapsed:+.1%}), "
+              f"CPU {_change(before['cpu_ms'], result['cpu_ms']):+.1%}, "
+              f"reads {before['logical_reads']:,.0f} -> {result['logical_reads']:,.0f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the views, functions, stored procedures and CTEs on SQL Server")
+    parser.add_argument('--queries', nargs='+', default=None, help="only run queries whose name contains one of these")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help=f"untimed runs per query (default: {DEFAULT_WARMUP})")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help=f"timed runs per query (default: {DEFAULT_RUNS})")
+    parser.add_argument('--plans', default=None, metavar='DIR', help="save each query's actual execution plan to DIR")
+    parser.add_argument('--without-indexes', action='store_true',
+                        help="drop the 05_indexes.sql indexes for this run and re-create them afterwards")
+    parser.add_argument('--label', default=None, help="name for this run in the results file")
+    parser.add_argument('--output', default=RESULTS_PATH, help=f"results file (default: {RESULTS_PATH})")
+    parser.add_argument('--compare', default=None, help="baseline results file to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed elapsed-time increase before a query counts as a regression (default: 0.2)")
+    parser.add_argument('--list', action='store_true', help="list the queries and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for query in all_queries():
+            print(f"{query.kind:<10} {query.name}")
+        sys.exit(0)
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+
+    regressions = []
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        print("Connected to database successfully!")
+        if args.without_indexes:
+            drop_indexes(cursor)
+            conn.commit()
+        try:
+            results = run_benchmarks(conn, args.queries, args.warmup, args.runs, args.plans)
+        finally:
+            if args.without_indexes:
+                create_indexes(cursor)
+                conn.commit()
+        cursor.close()
+        conn.close()
+
+        save_results(results, args.output, args.label, not args.without_indexes)
+        if args.compare:
+            regressions = compare(results, args.compare, args.threshold)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if regressions:
+        print(f"{len(regressions)} queries slowed by more than {args.threshold:.0%}")
+        sys.exit(1)
@@ -0,0 +1,162 @@
+"""Set-based stock reconciliation after a bulk load.
+
+The loaders disable trg_AfterOrderItem_UpdateStock, so Product.StockQuantity
+does not reflect the loaded order items. This script sums Quantity per ProductID
+from order_items.csv with np.bincount, stages the totals in a temp table and
+applies them in one UPDATE. That leaves the table as if the trigger had fired
+for every row, without paying for the trigger row by row.
+
+Stock is clamped at 0, since StockQuantity has a CHECK (>= 0), and the clamped
+products are reported. Cart rows that trg_InsteadOfCart_ValidateStock would now
+reject are reported as well.
+
+Run it once per loaded order_items.csv: every run subtracts the totals again.
+A column store (order_items.cols, see colstore.py) is summed straight from its
+memory-mapped ProductID and Quantity columns.
+"""
+import argparse
+import csv
+import os
+from itertools import islice
+
+import numpy as np
+
+from bulk_load import BulkLoader
+from colstore import ColumnStoreReader
+from compressed_io import open_text_input
+from db import add_backend_argument, connect
+from schema import Column, Table
+
+CHUNK_SIZE = 100000
+BATCH_SIZE = 5000
+
+STOCK_DELTA = Table('#StockDelta', None, [
+    Column('ProductID', 'INT'),
+    Column('Quantity', 'INT'),
+])
+
+
+class StockTally:
+    """Running SUM(Quantity) per ProductID, kept as a dense array indexed by ProductID."""
+
+    def __init__(self):
+        self.totals = np.zeros(0, dtype=np.int64)
+
+    def add(self, product_ids, quantities):
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        sums = np.bincount(product_ids, weights=quantities, minlength=len(self.totals)).astype(np.int64)
+        sums[:len(self.totals)] += self.totals
+        self.totals = sums
+
+    def rows(self):
+        """(ProductID, Quantity) tuples for every product that was ordered."""
+        product_ids = np.flatnonzero(self.totals)
+        return list(zip(product_ids.tolist(), self.totals[product_ids].tolist()))
+
+
+def tally_csv(path='order_items.csv', chunk_size=CHUNK_SIZE):
+    """Sum order item quantities per product, parsing the CSV a chunk of lines at a time.
+
+    np.loadtxt splits the chunk and converts only the ProductID and Quantity
+    columns, in C, so no Python object is made per row or field.
+    """
+    tally = StockTally()
+    with open_text_input(path) as f:
+        header = next(csv.reader([f.readline()]))
+        columns = (header.index('ProductID'), header.index('Quantity'))
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            chunk = np.loadtxt(lines, dtype=np.int64, delimiter=',', quotechar='"', usecols=columns, ndmin=2)
+            tally.add(chunk[:, 0], chunk[:, 1])
+    return tally
+
+
+def tally_columns(path='order_items.cols'):
+    """Sum order item quantities per product, one column store chunk at a time."""
+    tally = StockTally()
+    reader = ColumnStoreReader(path)
+    for chunk in reader.chunks:
+        tally.add(reader.column(chunk, 'ProductID'), reader.column(chunk, 'Quantity'))
+    return tally
+
+
+def apply_stock_changes(conn, tally, dry_run=False):
+    """Subtract the tallied quantities from Product.StockQuantity in one UPDATE."""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {STOCK_DELTA.name};")
+    cursor.execute(f"CREATE TABLE {STOCK_DELTA.name} (ProductID INT PRIMARY KEY, Quantity INT NOT NULL);")
+
+    print("Staging quantities per product...")
+    loader = BulkLoader(conn, STOCK_DELTA, batch_size=BATCH_SIZE)
+    rows = tally.rows()
+    for start in range(0, len(rows), BATCH_SIZE):
+        loader.insert(rows[start:start + BATCH_SIZE])
+    loader.finish()
+
+    cursor.execute(f"""
+        SELECT COUNT(*), COALESCE(SUM(d.Quantity - p.StockQuantity), 0)
+        FROM Product p
+        INNER JOIN {STOCK_DELTA.name} d ON p.ProductID = d.ProductID
+        WHERE d.Quantity > p.StockQuantity;
+    """)
+    clamped, shortfall = cursor.fetchone()
+    print(f"{clamped} products were ordered beyond their stock ({shortfall} units short); they will be set to 0")
+
+    if dry_run:
+        updated = 0
+    else:
+        print("Applying stock changes...")
+        cursor.execute(f"""
+            UPDATE Product
+            SET StockQuantity = CASE WHEN d.Quantity < Product.StockQuantity
+                                     THEN Product.StockQuantity - d.Quantity ELSE 0 END
+            FROM {STOCK_DELTA.name} d
+            WHERE Product.ProductID = d.ProductID;
+        """)
+        updated = cursor.rowcount
+
+    cursor.execute(f"DROP TABLE {STOCK_DELTA.name};")
+    conn.commit()
+
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM Cart c
+        INNER JOIN Product p ON c.ProductID = p.ProductID
+        WHERE p.StockQuantity < c.Quantity OR p.IsActive = 0;
+    """)
+    print(f"{cursor.fetchone()[0]} cart rows reference inactive products or exceed stock "
+          f"(trg_InsteadOfCart_ValidateStock would reject them)")
+    cursor.close()
+
+    print(f"Updated stock for {updated} products")
+    return updated
+
+
+def reconcile_stock(conn, path='order_items.csv', dry_run=False):
+    print(f"Summing order item quantities from {path}...")
+    tally = tally_columns(path) if os.path.isdir(path) else tally_csv(path)
+    print(f"{int(tally.totals.sum())} units ordered across {np.count_nonzero(tally.totals)} products")
+    return apply_stock_changes(conn, tally, dry_run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the stock changes of a bulk-loaded order_items.csv")
+    parser.add_argument('--path', default='order_items.csv', help="order items CSV or column store that was loaded")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would change")
+    add_backend_argument(parser)
+    args = parser.parse_args()
+
+    try:
+        conn = connect(args.backend)
+        print("Connected to database successfully!")
+
+        reconcile_stock(conn, args.path, args.dry_run)
+
+        conn.close()
+        print("\nStock reconciled successfully!")
+
+    except Exception as e:
+        print(f"Error: {e}")
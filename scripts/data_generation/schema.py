@@ -0,0 +1,96 @@
+"""Column layouts of the tables the loaders fill, as created by master_script.sql.
+
+`columns` lists the inserted columns in CSV order. The generators assign every
+primary key themselves, so the first column is always the table's `identity`
+column and the loaders insert it with IDENTITY_INSERT.
+"""
+from collections import namedtuple
+
+Column = namedtuple('Column', ['name', 'sql_type'])
+Table = namedtuple('Table', ['name', 'identity', 'columns'])
+
+CATEGORY = Table('Category', 'CategoryID', [
+    Column('CategoryID', 'INT'),
+    Column('CategoryName', 'VARCHAR(100)'),
+    Column('Description', 'VARCHAR(500)'),
+    Column('IsActive', 'BIT'),
+])
+
+PRODUCT = Table('Product', 'ProductID', [
+    Column('ProductID', 'INT'),
+    Column('CategoryID', 'INT'),
+    Column('ProductName', 'VARCHAR(200)'),
+    Column('Description', 'TEXT'),
+    Column('Price', 'DECIMAL(10,2)'),
+    Column('StockQuantity', 'INT'),
+    Column('ImageURL', 'VARCHAR(500)'),
+    Column('DateAdded', 'DATETIME'),
+    Column('IsActive', 'BIT'),
+])
+
+USER = Table('User', 'UserID', [
+    Column('UserID', 'INT'),
+    Column('Email', 'VARCHAR(255)'),
+    Column('PasswordHash', 'VARCHAR(255)'),
+    Column('FirstName', 'VARCHAR(100)'),
+    Column('LastName', 'VARCHAR(100)'),
+    Column('PhoneNumber', 'VARCHAR(20)'),
+    Column('Address', 'VARCHAR(500)'),
+    Column('City', 'VARCHAR(100)'),
+    Column('PostalCode', 'VARCHAR(20)'),
+    Column('DateJoined', 'DATETIME'),
+    Column('IsActive', 'BIT'),
+])
+
+ADMIN = Table('Admin', 'AdminID', [
+    Column('AdminID', 'INT'),
+    Column('Email', 'VARCHAR(255)'),
+    Column('PasswordHash', 'VARCHAR(255)'),
+    Column('FirstName', 'VARCHAR(100)'),
+    Column('LastName', 'VARCHAR(100)'),
+    Column('Role', 'VARCHAR(50)'),
+    Column('DateCreated', 'DATETIME'),
+    Column('IsActive', 'BIT'),
+])
+
+CART = Table('Cart', 'CartID', [
+    Column('CartID', 'INT'),
+    Column('UserID', 'INT'),
+    Column('ProductID', 'INT'),
+    Column('Quantity', 'INT'),
+    Column('DateAdded', 'DATETIME'),
+])
+
+ORDER = Table('Order', 'OrderID', [
+    Column('OrderID', 'INT'),
+    Column('UserID', 'INT'),
+    Column('OrderDate', 'DATETIME'),
+    Column('TotalAmount', 'DECIMAL(10,2)'),
+    Column('Status', 'VARCHAR(50)'),
+    Column('ShippingAddress', 'VARCHAR(500)'),
+    Column('ShippingCity', 'VARCHAR(100)'),
+    Column('ShippingPostalCode', 'VARCHAR(20)'),
+])
+
+ORDER_ITEM = Table('OrderItem', 'OrderItemID', [
+    Column('OrderItemID', 'INT'),
+    Column('OrderID', 'INT'),
+    Column('OrderDate', 'DATETIME'),
+    Column('ProductID', 'INT'),
+    Column('Quantity', 'INT'),
+    Column('PriceAtPurchase', 'DECIMAL(10,2)'),
+])
+
+TABLES = {table.name: table for table in (CATEGORY, PRODUCT, USER, ADMIN, CART, ORDER, ORDER_ITEM)}
+
+
+def quoted(table):
+    """Bracketed table name, e.g. [Order]."""
+    return f"[{table.name}]"
+
+
+def insert_sql(table, tablock=False):
+    names = ', '.join(c.name for c in table.columns)
+    params = ', '.join('?' for _ in table.columns)
+    hint = ' WITH (TABLOCK)' if tablock else ''
+    return f"INSERT INTO {quoted(table)}{hint} ({names}) VALUES ({params})"
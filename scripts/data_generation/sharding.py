@@ -0,0 +1,144 @@
+"""Multi-process sharded generation with deterministic per-shard seeds.
+
+The id range 1..total is cut into fixed-size shards. Shard i draws from its own
+generator seeded with (seed, i), so the output depends only on the seed and the
+shard size, never on how many worker processes ran the shards or in what order.
+
+Compressed parts (--format csv.gz or csv.zst) are written without a header row,
+except the first, so they concatenate byte for byte into one valid file of
+back-to-back gzip members or zstd frames. With --keep-parts every part keeps
+its header.
+"""
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import colstore
+from colstore import add_format_argument, open_output, output_path
+from columnar import DEFAULT_CHUNK_SIZE, chunk_ranges
+from distributions import DEFAULT_PROFILE, add_profile_argument
+from instrumentation import METRICS, Metrics, add_metrics_argument, batch_timer
+
+DEFAULT_SHARD_SIZE = 250000
+DEFAULT_SEED = 22
+
+
+def shard_rng(seed, shard_index):
+    """Independent generator for one shard, derived from the global seed and the shard index."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(shard_index,)))
+
+
+def shard_ranges(total, shard_size=DEFAULT_SHARD_SIZE):
+    """Yield (shard_index, first_id, count) covering ids 1..total."""
+    for index, (first_id, count) in enumerate(chunk_ranges(total, shard_size)):
+        yield index, first_id, count
+
+
+def part_path(out_path, shard_index):
+    base, ext = os.path.splitext(out_path)
+    return f"{base}.part{shard_index:04d}{ext}"
+
+
+def _write_part(build_chunk, path, header, table, data_format, seed, shard_index, first_id, count, chunk_size, params,
+                label, instrument):
+    rng = shard_rng(seed, shard_index)
+    rows = 0
+    # Each shard records into a fresh registry and hands it back to the parent.
+    metrics = Metrics()
+    metrics.enabled = instrument
+    timer = batch_timer(label, metrics)
+    with open_output(path, header, table, data_format, fresh=False) as out:
+        for chunk_first, n in chunk_ranges(count, chunk_size):
+            chunk_id = first_id + chunk_first - 1
+            columns = build_chunk(rng, chunk_id, n, **params)
+            timer.lap('build')
+            out.write(chunk_id, columns)
+            timer.lap('write', len(columns[0]))
+            rows += len(columns[0])
+    return shard_index, rows, metrics.snapshot() if instrument else None
+
+
+def concat_parts(out_path, paths, headers=True):
+    """Concatenate part files into out_path, then remove them.
+
+    With `headers` every part starts with its own header row, and only the
+    first one is kept; otherwise the parts are copied whole.
+    """
+    with open(out_path, 'wb') as out:
+        for i, path in enumerate(paths):
+            with open(path, 'rb') as part:
+                if headers:
+                    header = part.readline()
+                    if i == 0:
+                        out.write(header)
+                shutil.copyfileobj(part, out, 1 << 20)
+            os.remove(path)
+
+
+def run_sharded(build_chunk, total, out_path, header, seed=DEFAULT_SEED, workers=None,
+                shard_size=DEFAULT_SHARD_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, keep_parts=False,
+                table=None, data_format='csv', **params):
+    """Generate ids 1..total across a process pool and write them to out_path.
+
+    `build_chunk(rng, first_id, n, **params)` must be a module-level function that
+    returns a list of columns. With keep_parts the numbered part files are left in
+    place instead of being concatenated. In the columns format every shard
+    writes its chunks into the one store for `table`, so there are no parts.
+    Returns the number of rows written.
+    """
+    shards = list(shard_ranges(total, shard_size))
+    label = os.path.basename(output_path(out_path, data_format))
+    if data_format == 'columns':
+        colstore.create(output_path(out_path, data_format), table)
+        paths = [out_path] * len(shards)
+    else:
+        paths = [part_path(out_path, index) for index, _, _ in shards]
+    # Compressed streams cannot drop a part's header line when concatenating, so they never get one.
+    headers = data_format in ('csv', 'columns') or keep_parts
+    rows = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_write_part, build_chunk, path, header if headers or index == 0 else None, table,
+                        data_format, seed, index, first_id, count, chunk_size, params, label, METRICS.enabled)
+            for (index, first_id, count), path in zip(shards, paths)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            _, shard_rows, snapshot = future.result()
+            rows += shard_rows
+            if snapshot:
+                METRICS.merge(snapshot)
+            print(f"Finished shard {done}/{len(shards)} ({rows} rows so far)...")
+
+    if data_format != 'columns' and not keep_parts:
+        concat_parts(output_path(out_path, data_format), [output_path(path, data_format) for path in paths], headers)
+
+    return rows
+
+
+def add_generation_arguments(parser, sharded=True, profile=True):
+    """Common --columnar/--sharded/--seed/--format/--profile options for the generator scripts."""
+    parser.add_argument('--columnar', action='store_true', help="generate whole column chunks with NumPy")
+    if sharded:
+        parser.add_argument('--sharded', action='store_true', help="generate fixed-size shards across a process pool")
+        parser.add_argument('--workers', type=int, default=None, help="worker processes for --sharded (default: all cores)")
+        parser.add_argument('--keep-parts', action='store_true', help="leave numbered part files instead of concatenating")
+    parser.add_argument('--seed', type=int, default=None, help="random seed; the same seed reproduces the same rows")
+    add_format_argument(parser)
+    if profile:
+        add_profile_argument(parser)
+    parser.add_argument('--as-of', default=None, help="reference 'YYYY-MM-DD HH:MM:SS' that dates count back from (default: now)")
+    add_metrics_argument(parser)
+
+
+def parse_generation_arguments(parser):
+    """parse_args(), rejecting --format other than csv and --profile for the row-by-row generators."""
+    args = parser.parse_args()
+    vectorised = args.columnar or getattr(args, 'sharded', False)
+    if args.data_format != 'csv' and not vectorised:
+        parser.error(f"--format {args.data_format} needs --columnar or --sharded")
+    if getattr(args, 'profile', DEFAULT_PROFILE) != DEFAULT_PROFILE and not vectorised:
+        parser.error("--profile needs --columnar or --sharded")
+    return args
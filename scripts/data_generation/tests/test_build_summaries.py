@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from build_summaries import ProductSalesTally
+
+
+def order_items(rng, num_orders=300, num_products=20):
+    counts = rng.integers(1, 6, num_orders)
+    order_ids = np.repeat(np.arange(1, num_orders + 1), counts)
+    product_ids = rng.integers(1, num_products + 1, len(order_ids))
+    quantities = rng.integers(1, 11, len(order_ids))
+    prices = rng.integers(500, 10000, len(order_ids)) / 100
+    return order_ids, product_ids, quantities, prices
+
+
+def expected_times(order_ids, product_ids):
+    times = {}
+    for order_id, product_id in set(zip(order_ids.tolist(), product_ids.tolist())):
+        times[product_id] = times.get(product_id, 0) + 1
+    return times
+
+
+def tally(columns, grouped, batch_size):
+    result = ProductSalesTally(grouped)
+    for start in range(0, len(columns[0]), batch_size):
+        result.add(*[c[start:start + batch_size] for c in columns])
+    return {product_id: times for product_id, times, _, _ in result.rows()}
+
+
+@pytest.mark.parametrize('batch_size', [1, 7, 64, 10000])
+def test_grouped_times_ordered_counts_orders_that_straddle_batches(batch_size):
+    columns = order_items(np.random.default_rng(1))
+    assert tally(columns, True, batch_size) == expected_times(columns[0], columns[1])
+
+
+def test_ungrouped_times_ordered_matches_grouped():
+    rng = np.random.default_rng(2)
+    columns = order_items(rng)
+    order = rng.permutation(len(columns[0]))
+    assert tally([c[order] for c in columns], False, 50) == expected_times(columns[0], columns[1])
+
+
+def test_grouped_rejects_items_out_of_order():
+    result = ProductSalesTally(grouped=True)
+    result.add([5, 6], [1, 2], [1, 1], [1.0, 1.0])
+    with pytest.raises(ValueError):
+        result.add([4], [1], [1], [1.0])
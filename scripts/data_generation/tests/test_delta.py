@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from db import connect
+from delta import MANIFEST_PATH, run_delta
+from pipeline import stream_load
+from schema import CATEGORY, PRODUCT
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """An SQLite database in tmp_path with one category and a few products, as a delta needs."""
+    monkeypatch.chdir(tmp_path)
+    conn = connect('sqlite')
+    stream_load(conn, CATEGORY, [[(1, "Desks", "", 1)]], "categories")
+    products = [(i, 1, f"Desk {i}", "", 100.0 + i, 50, "", "2024-01-01 00:00:00", 1) for i in range(1, 11)]
+    stream_load(conn, PRODUCT, [products], "products")
+    yield conn
+    conn.close()
+
+
+def count(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM [{table}];")
+    value = cursor.fetchone()[0]
+    cursor.close()
+    return value
+
+
+def test_summaries_without_summary_tables_fail_before_loading(database, tmp_path):
+    with pytest.raises(ValueError, match="build_summaries.py"):
+        run_delta(users_per_day=2, orders_per_day=5, seed=1, backend='sqlite', summaries=True)
+    assert count(database, 'User') == 0
+    assert count(database, 'Order') == 0
+    assert not (tmp_path / MANIFEST_PATH).exists()
+
+
+def test_manifest_marks_follow_the_loaded_rows(database, tmp_path):
+    marks = run_delta(users_per_day=2, orders_per_day=5, seed=1, backend='sqlite')
+    with open(tmp_path / MANIFEST_PATH) as f:
+        assert json.load(f) == marks._asdict()
+    assert marks.user_id == count(database, 'User') == 2
+    assert marks.order_id == count(database, 'Order') == 5
+
+
+def test_manifest_windows_follow_each_other(database):
+    # No orders in the first window, so its last day has no OrderDate to continue from.
+    first = run_delta(days=3, users_per_day=1, orders_per_day=0, seed=1, backend='sqlite')
+    second = run_delta(days=3, users_per_day=1, orders_per_day=5, seed=2, backend='sqlite', from_manifest=True)
+
+    start = np.datetime64(first.window_end)
+    assert np.datetime64(second.window_end) == start + np.timedelta64(3, 'D')
+    cursor = database.cursor()
+    cursor.execute("SELECT MIN(OrderDate) FROM [Order];")
+    assert np.datetime64(cursor.fetchone()[0]) >= start
+    cursor.close()
@@ -0,0 +1,33 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db import SqliteBackend
+from pipeline import stream_load
+from schema import CATEGORY
+
+
+def category_batches(count):
+    for i in range(count):
+        # Every batch reuses CategoryID 1, so the second insert violates the primary key.
+        yield [(1, f"Category {i}", "", 1)]
+
+
+def test_stream_load_stops_producer_when_insert_fails(tmp_path):
+    conn = SqliteBackend(str(tmp_path / 'test.sqlite')).connect()
+    try:
+        with pytest.raises(sqlite3.IntegrityError):
+            stream_load(conn, CATEGORY, category_batches(100), "categories", queue_batches=1)
+    finally:
+        conn.close()
+    assert not [t for t in threading.enumerate() if t.name == 'generate-categories']
+
+
+def test_stream_load_inserts_every_batch(tmp_path):
+    conn = SqliteBackend(str(tmp_path / 'test.sqlite')).connect()
+    try:
+        batches = ([(i, f"Category {i}", "", 1)] for i in range(1, 21))
+        assert stream_load(conn, CATEGORY, batches, "categories", queue_batches=1) == 20
+    finally:
+        conn.close()
@@ -0,0 +1,21 @@
+import csv
+import gzip
+
+import pytest
+
+from reconcile_stock import tally_csv
+from schema import ORDER_ITEM
+
+ITEMS = [(1, 10, "2024-01-01 00:00:00", 3, 2, 9.99), (2, 10, "2024-01-01 00:00:00", 5, 1, 4.50),
+         (3, 11, "2024-01-02 00:00:00", 3, 4, 9.99)]
+
+
+@pytest.mark.parametrize('name, opener', [('order_items.csv', open), ('order_items.csv.gz', gzip.open)])
+def test_tally_csv_sums_quantity_per_product_across_chunks(tmp_path, name, opener):
+    path = tmp_path / name
+    with opener(path, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([c.name for c in ORDER_ITEM.columns])
+        writer.writerows(ITEMS)
+
+    assert tally_csv(str(path), chunk_size=2).rows() == [(3, 6), (5, 1)]
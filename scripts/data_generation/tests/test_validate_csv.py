@@ -0,0 +1,57 @@
+import csv
+import gzip
+
+from schema import USER
+from validate_csv import validate_all
+
+
+def user_row(user_id, email):
+    return [user_id, email, f"hash_{user_id}", "Ada", "Lovelace", "+1-555-0100", "1 Main St", "Denver", "80202",
+            "2024-01-01 00:00:00", 1]
+
+
+def write_users(path, emails, opener=open):
+    with opener(path, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([c.name for c in USER.columns])
+        writer.writerows(user_row(i, email) for i, email in enumerate(emails, 1))
+
+
+def read_rows(path, opener=open):
+    with opener(path, 'rt', newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_duplicate_emails_are_rejected_within_and_across_chunks(tmp_path):
+    emails = [f"user{i}@example.com" for i in range(10)]
+    # Same chunk, next chunk and a longer address than any seen before.
+    emails += [emails[1], emails[3], emails[0], "a.much.longer.address@example.com", emails[9],
+               "a.much.longer.address@example.com"]
+    write_users(tmp_path / 'users.csv', emails)
+
+    assert validate_all(str(tmp_path), chunk_size=4) == 5
+
+    kept = read_rows(tmp_path / 'users.csv')[1:]
+    assert [row[1] for row in kept] == emails[:10] + ["a.much.longer.address@example.com"]
+    rejected = read_rows(tmp_path / 'users.rejected.csv')[1:]
+    assert [row[0] for row in rejected] == ['11', '12', '13', '15', '16']
+    assert {row[-1] for row in rejected} == {"duplicate Email"}
+
+
+def test_check_only_leaves_files_alone(tmp_path):
+    write_users(tmp_path / 'users.csv', ["a@example.com", "b@example.com", "a@example.com"])
+    before = (tmp_path / 'users.csv').read_bytes()
+
+    assert validate_all(str(tmp_path), check_only=True) == 1
+    assert (tmp_path / 'users.csv').read_bytes() == before
+    assert not (tmp_path / 'users.rejected.csv').exists()
+
+
+def test_compressed_files_are_read_and_rewritten_compressed(tmp_path):
+    write_users(tmp_path / 'users.csv.gz', ["a@example.com", "b@example.com", "a@example.com"], gzip.open)
+
+    assert validate_all(str(tmp_path), data_format='csv.gz') == 1
+
+    assert [row[1] for row in read_rows(tmp_path / 'users.csv.gz', gzip.open)[1:]] == ["a@example.com", "b@example.com"]
+    assert [row[0] for row in read_rows(tmp_path / 'users.rejected.csv')[1:]] == ['3']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['users.csv.gz', 'users.rejected.csv']
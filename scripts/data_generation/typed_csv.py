@@ -0,0 +1,94 @@
+"""Typed, batch-at-a-time CSV reader shared by the loaders.
+
+csv.DictReader builds a dict per row, and the loaders then converted every
+field with int()/float() and copied it into a tuple by name: one dict, one
+tuple and a handful of temporary values per row, all in Python bytecode.
+
+TypedCsvReader maps the table's columns (schema.py) to header positions once.
+It then works a batch at a time: it reads the batch's lines, splits them with
+one csv.reader pass, transposes the rows into columns with zip, converts each
+INT, BIT and DECIMAL column with a single map(int/float, ...), and zips the
+columns back into the row tuples executemany binds. The per-value loops all
+run in C. VARCHAR and DATETIME columns are passed through as the strings
+that were read.
+
+Like ColumnStoreReader, it yields batches through batches(batch_size) and
+tracks `offset`, the byte offset just past the last row returned, which the
+load checkpoints record. Rows must not contain embedded newlines, which holds
+for every generated CSV. Compressed files (compressed_io.py) are read the same
+way, with offsets counting uncompressed bytes.
+"""
+import csv
+import io
+import time
+from itertools import islice
+
+from compressed_io import open_input, skip
+
+_CONVERTERS = {'INT': int, 'BIT': int}
+
+
+def converter(sql_type):
+    """int, float or None (keep the string) for a schema.py SQL type."""
+    sql_type = sql_type.upper()
+    if sql_type.startswith('DECIMAL'):
+        return float
+    return _CONVERTERS.get(sql_type)
+
+
+class TypedCsvReader:
+    """Reads a generated CSV as batches of typed row tuples in `table`'s column order."""
+
+    def __init__(self, path, table, offset=None):
+        self.path = path
+        self.table = table
+        self.parse_seconds = 0.0
+        self.file = open_input(path)
+        header = self.file.readline()
+        self.fieldnames = next(csv.reader([header.decode('utf-8')]))
+        missing = [c.name for c in table.columns if c.name not in self.fieldnames]
+        if missing:
+            raise ValueError(f"{path} has no column {', '.join(missing)} for {table.name}")
+        self.positions = [self.fieldnames.index(c.name) for c in table.columns]
+        self.converters = [converter(c.sql_type) for c in table.columns]
+        self.offset = len(header)
+        if offset:
+            skip(self.file, offset - self.offset)
+            self.offset = offset
+
+    def _typed(self, lines):
+        text = b''.join(lines).decode('utf-8')
+        rows = [row for row in csv.reader(io.StringIO(text, newline='')) if row]
+        if not rows:
+            return []
+        widths = set(map(len, rows))
+        if widths != {len(self.fieldnames)}:
+            raise ValueError(f"{self.path} has rows with {sorted(widths)} fields near byte {self.offset}, "
+                             f"expected {len(self.fieldnames)}")
+        fields = list(zip(*rows))
+        columns = [fields[position] if convert is None else list(map(convert, fields[position]))
+                   for position, convert in zip(self.positions, self.converters)]
+        return list(zip(*columns))
+
+    def batches(self, batch_size):
+        """Yield lists of up to batch_size typed row tuples."""
+        while True:
+            started = time.perf_counter()
+            lines = list(islice(self.file, batch_size))
+            if not lines:
+                return
+            batch = self._typed(lines)
+            self.offset += sum(map(len, lines))
+            self.parse_seconds += time.perf_counter() - started
+            if batch:
+                yield batch
+
+    def take_parse_seconds(self):
+        seconds, self.parse_seconds = self.parse_seconds, 0.0
+        return seconds
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
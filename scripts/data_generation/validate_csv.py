@@ -0,0 +1,416 @@
+"""Pre-load validation of the generated CSVs.
+
+A bad row otherwise surfaces only when SQL Server rejects the 5000-row batch
+it is in, and the load script stops there. This script checks every file
+before any connection is opened, a chunk of rows at a time with NumPy:
+
+    types        INT, DECIMAL, DATETIME and BIT values parse and fit the SQL type;
+                 VARCHAR(n) values are at most n characters
+    NOT NULL     required columns are not empty
+    CHECK        the column checks of master_script.sql, e.g. Quantity > 0 and
+                 Status IN ('Pending', ...)
+    keys         IDs are unique within their file, UNIQUE columns (Email,
+                 CategoryName) are unique, and Cart has at most one row per
+                 (UserID, ProductID)
+    foreign keys referenced IDs exist among the accepted rows of the referenced
+                 file, and an order item's OrderDate equals its order's, so both
+                 land in the same pf_OrderDate partition
+
+NOT NULL, UNIQUE, CHECK and FOREIGN KEY clauses are read from
+master_script.sql, so the rules follow the schema. Files are checked in load
+order, so a row that references a rejected row is rejected as well. Referenced
+files that are missing are skipped with a warning.
+
+Rejected rows are written to <name>.rejected.csv with a RejectReason column,
+and <name>.csv is rewritten with the remaining rows, so the loaders go through
+in one clean pass. With --format csv.gz or csv.zst the compressed files are
+read and rewritten in the same format (categories.csv and admins.csv are always
+plain); the rejected rows stay a plain CSV. --check-only reports without writing anything and exits
+non-zero when a row would be rejected. The accepted OrderDates are also
+counted per pf_OrderDate partition.
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+from collections import Counter
+
+import numpy as np
+
+from colstore import add_format_argument, output_path
+from compressed_io import codec, open_text_input, open_text_output
+from db import MASTER_SCRIPT, sqlite_schema
+from schema import ADMIN, CART, CATEGORY, ORDER, ORDER_ITEM, PRODUCT, USER
+
+CHUNK_SIZE = 100000
+REJECT_SUFFIX = '.rejected.csv'
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+DATETIME_MIN = np.datetime64('1753-01-01T00:00:00')
+
+FILES = [
+    (CATEGORY, 'categories.csv'),
+    (PRODUCT, 'products.csv'),
+    (USER, 'users.csv'),
+    (ADMIN, 'admins.csv'),
+    (CART, 'cart.csv'),
+    (ORDER, 'orders.csv'),
+    (ORDER_ITEM, 'order_items.csv'),
+]
+# Written as plain CSV whatever the --format.
+PLAIN_FILES = ('categories.csv', 'admins.csv')
+
+COMPARISONS = {
+    '>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal, '=': np.equal, '<>': np.not_equal,
+}
+
+
+class Constraints:
+    """NOT NULL / UNIQUE columns, CHECKs and FOREIGN KEYs of one table in master_script.sql."""
+
+    def __init__(self, statement):
+        self.not_null = set()
+        self.unique = set()
+        self.checks = []
+        self.foreign_keys = []
+        for line in statement.splitlines()[1:]:
+            column = re.match(r'\s+(\w+) [A-Z]', line)
+            if column and column.group(1) not in ('CONSTRAINT', 'PRIMARY', 'FOREIGN'):
+                if 'NOT NULL' in line or 'PRIMARY KEY' in line:
+                    self.not_null.add(column.group(1))
+                if re.search(r'\bUNIQUE\b', line):
+                    self.unique.add(column.group(1))
+        for name, op, value in re.findall(r'CHECK \((\w+) (>=|<=|<>|>|<|=) (-?[\d.]+)\)', statement):
+            self.checks.append((name, f"{name} {op} {value}", lambda v, op=op, value=float(value): COMPARISONS[op](v, value)))
+        for name, values in re.findall(r'CHECK \((\w+) IN \(([^)]*)\)\)', statement):
+            allowed = [v.strip().strip("'") for v in values.split(',')]
+            self.checks.append((name, f"{name} IN ({', '.join(allowed)})", lambda v, allowed=allowed: np.isin(v, allowed)))
+        for columns, table, _ in re.findall(r'FOREIGN KEY \(([\w, ]+)\)\s+REFERENCES \[?(\w+)\]?\(([\w, ]+)\)', statement):
+            self.foreign_keys.append(([c.strip() for c in columns.split(',')], table))
+
+
+def read_constraints(script_path=MASTER_SCRIPT):
+    constraints = {}
+    for statement in sqlite_schema(script_path):
+        name = re.match(r'CREATE TABLE \[?(\w+)\]?', statement).group(1)
+        constraints[name] = Constraints(statement)
+    return constraints
+
+
+def read_boundaries(script_path=MASTER_SCRIPT):
+    """pf_OrderDate boundaries as declared in master_script.sql."""
+    with open(script_path, 'r', encoding='utf-8') as f:
+        match = re.search(r'CREATE PARTITION FUNCTION pf_OrderDate.*?FOR VALUES \(([^)]*)\)', f.read(), re.DOTALL)
+    return np.array([v.strip().strip("'") for v in match.group(1).split(',')], dtype='datetime64[s]')
+
+
+def _parse(values, dtype):
+    """Parse strings into `dtype`; returns (parsed, ok). Unparseable values are 0 / NaT with ok False."""
+    try:
+        return values.astype(dtype), np.ones(len(values), dtype=bool)
+    except (ValueError, OverflowError):
+        pass
+    parsed = np.zeros(len(values), dtype=dtype)
+    ok = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = np.asarray(value).astype(dtype)
+            ok[i] = True
+        except (ValueError, OverflowError):
+            pass
+    return parsed, ok
+
+
+def parse_column(values, sql_type):
+    """(typed values, NULL mask, invalid mask, reject message) for one column of strings."""
+    sql_type = sql_type.upper()
+    null = values == ''
+    bad = np.zeros(len(values), dtype=bool)
+    filled = np.where(null, '0', values)
+    if sql_type == 'INT':
+        parsed, ok = _parse(filled, np.int64)
+        bad = ~ok | (parsed < INT_MIN) | (parsed > INT_MAX)
+        message = 'not an INT'
+    elif sql_type == 'BIT':
+        parsed = (filled == '1').astype(np.int8)
+        bad = ~np.isin(filled, ['0', '1'])
+        message = 'not a BIT'
+    elif sql_type.startswith('DECIMAL'):
+        precision, scale = map(int, re.findall(r'\d+', sql_type))
+        parsed, ok = _parse(filled, np.float64)
+        bad = ~ok | ~(np.abs(parsed) < 10.0 ** (precision - scale))
+        message = f"not a {sql_type}"
+    elif sql_type == 'DATETIME':
+        parsed, ok = _parse(np.where(null, '1970-01-01', values), 'datetime64[s]')
+        bad = ~ok | (parsed < DATETIME_MIN)
+        message = 'not a DATETIME'
+    else:
+        parsed = values
+        limit = re.search(r'\((\d+)\)', sql_type)
+        if limit:
+            bad = np.char.str_len(values) > int(limit.group(1))
+        message = f"longer than {sql_type}"
+    return parsed, null, bad & ~null, message
+
+
+class Context:
+    """Accepted IDs per table (as dense boolean arrays) and the values composite foreign keys compare against."""
+
+    def __init__(self, constraints):
+        self.constraints = constraints
+        self.ids = {}
+        self.values = {}
+
+    def has(self, table):
+        return table in self.ids
+
+    def accept(self, table, ids, columns):
+        known = self.ids.setdefault(table, np.zeros(0, dtype=bool))
+        if len(ids) and ids.max() >= len(known):
+            known = np.concatenate([known, np.zeros(int(ids.max()) + 1 - len(known), dtype=bool)])
+        known[ids] = True
+        self.ids[table] = known
+        for name, values in columns.items():
+            stored = self.values.setdefault((table, name), np.zeros(len(known), dtype=values.dtype))
+            if len(stored) < len(known):
+                stored = np.concatenate([stored, np.zeros(len(known) - len(stored), dtype=values.dtype)])
+            stored[ids] = values
+            self.values[table, name] = stored
+
+    def exists(self, table, ids):
+        known = self.ids[table]
+        inside = (ids >= 0) & (ids < len(known))
+        found = np.zeros(len(ids), dtype=bool)
+        found[inside] = known[ids[inside]]
+        return found
+
+    def value(self, table, name, ids):
+        return self.values[table, name][ids]
+
+
+class FileValidator:
+    """Validates one CSV in chunks, keeping the state that spans chunks (seen keys and pairs)."""
+
+    def __init__(self, table, constraints, context, boundaries):
+        self.table = table
+        self.constraints = constraints
+        self.context = context
+        self.boundaries = boundaries
+        self.header = [c.name for c in table.columns]
+        self.seen_ids = np.zeros(0, dtype=bool)
+        self.seen_unique = {name: np.zeros(0, dtype=str) for name in constraints.unique}
+        self.seen_pairs = np.zeros(0, dtype=np.int64)
+        # Composite foreign keys into this table compare against these columns.
+        self.kept = {fk[0][1] for c in context.constraints.values() for fk in c.foreign_keys
+                     if fk[1] == table.name and len(fk[0]) > 1}
+        self.reasons = Counter()
+        self.partitions = Counter()
+
+    def check(self, rows):
+        """Return the reject reason per row ('' for good rows) for a chunk of parsed CSV rows."""
+        n = len(rows)
+        reason = np.full(n, '', dtype=object)
+        bad = np.zeros(n, dtype=bool)
+
+        def flag(mask, text):
+            new = mask & ~bad
+            reason[new] = text
+            bad[new] = True
+
+        width = np.array([len(row) for row in rows])
+        flag(width != len(self.header), f"expected {len(self.header)} fields")
+        blank = [''] * len(self.header)
+        # One array per column, so a long Description does not widen every other column.
+        grid = [np.array(values, dtype=str) for values in zip(*(row if len(row) == len(blank) else blank for row in rows))]
+
+        typed = {}
+        for i, column in enumerate(self.table.columns):
+            parsed, null, invalid, message = parse_column(grid[i], column.sql_type)
+            typed[column.name] = parsed
+            if column.name in self.constraints.not_null:
+                flag(null, f"{column.name} is NULL")
+            flag(invalid, f"{column.name} {message}")
+
+        for name, text, predicate in self.constraints.checks:
+            flag(~predicate(typed[name]), f"violates CHECK ({text})")
+
+        ids = typed[self.table.identity]
+        flag(ids < 1, f"{self.table.identity} < 1")
+        ids = np.where(bad, 0, ids)
+        flag(self._repeated(ids, bad), f"duplicate {self.table.identity}")
+
+        for name, seen in self.seen_unique.items():
+            repeated, self.seen_unique[name] = _repeated_values(grid[self.header.index(name)], bad, seen)
+            flag(repeated, f"duplicate {name}")
+
+        for columns, referenced in self.constraints.foreign_keys:
+            if not self.context.has(referenced):
+                continue
+            ref_ids = np.where(bad, 0, typed[columns[0]])
+            flag(~self.context.exists(referenced, ref_ids), f"{columns[0]} not in {referenced}")
+            for name in columns[1:]:
+                ref_ids = np.where(bad, 0, ref_ids)
+                flag(self.context.value(referenced, name, ref_ids) != typed[name],
+                     f"{name} differs from its {referenced} row")
+
+        if self.table is CART:
+            flag(self._repeated_pairs(typed['UserID'], typed['ProductID'], bad), "duplicate (UserID, ProductID)")
+
+        good = ~bad
+        if self.table.identity:
+            self.context.accept(self.table.name, ids[good], {name: typed[name][good] for name in self.kept})
+        if 'OrderDate' in typed:
+            partitions = np.searchsorted(self.boundaries, typed['OrderDate'][good], side='right') + 1
+            self.partitions.update(Counter(partitions.tolist()))
+        self.reasons.update(reason[bad].tolist())
+        return reason
+
+    def _repeated(self, ids, bad):
+        """Rows whose ID appeared earlier in this chunk or in an earlier chunk."""
+        if len(ids) and ids.max() >= len(self.seen_ids):
+            self.seen_ids = np.concatenate([self.seen_ids, np.zeros(int(ids.max()) + 1 - len(self.seen_ids), dtype=bool)])
+        repeated = self.seen_ids[ids] & ~bad
+        candidates = np.flatnonzero(~bad & ~repeated)
+        _, first = np.unique(ids[candidates], return_index=True)
+        later = np.ones(len(candidates), dtype=bool)
+        later[first] = False
+        repeated[candidates[later]] = True
+        self.seen_ids[ids[~bad & ~repeated]] = True
+        return repeated
+
+    def _repeated_pairs(self, user_ids, product_ids, bad):
+        codes = (user_ids.astype(np.int64) << 32) | product_ids.astype(np.int64)
+        repeated, self.seen_pairs = _repeated_values(codes, bad, self.seen_pairs)
+        return repeated
+
+
+def _repeated_values(values, bad, seen):
+    """Rows whose value appeared earlier in this chunk or is in the sorted array `seen`; returns (rows, new seen).
+
+    The chunk's distinct values are looked up in `seen` with a binary search and
+    inserted at the positions it finds, so `seen` is never sorted again.
+    """
+    candidates = np.flatnonzero(~bad)
+    repeated = np.zeros(len(values), dtype=bool)
+    unique, first = np.unique(values[candidates], return_index=True)
+    later = np.ones(len(candidates), dtype=bool)
+    later[first] = False
+    repeated[candidates[later]] = True
+    positions = np.searchsorted(seen, unique)
+    known = np.zeros(len(unique), dtype=bool)
+    if len(seen):
+        known = seen[np.minimum(positions, len(seen) - 1)] == unique
+    repeated[candidates[first[known]]] = True
+    # Widen `seen` first if this chunk has longer strings, or np.insert would truncate them.
+    seen = seen.astype(np.result_type(seen, unique), copy=False)
+    return repeated, np.insert(seen, positions[~known], unique[~known])
+
+
+def _chunks(reader, chunk_size):
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def validate_file(table, path, context, boundaries, chunk_size=CHUNK_SIZE, check_only=False, quiet=False):
+    """Validate `path`; unless check_only, move rejected rows to the side file and rewrite `path`.
+
+    Rejected rows are appended to an existing side file, so rows quarantined by
+    an earlier run are kept.
+    """
+    validator = FileValidator(table, context.constraints[table.name], context, boundaries)
+    csv_path = os.path.splitext(path)[0] if codec(path) else path
+    stem = os.path.splitext(csv_path)[0]
+    reject_path = stem + REJECT_SUFFIX
+    # orders.tmp.csv.gz, so the rewritten file keeps its codec.
+    good_path = stem + '.tmp' + path[len(stem):]
+    new_rejects = not os.path.exists(reject_path)
+    total = rejected = 0
+
+    with open_text_input(path) as f, \
+            open_text_output(os.devnull if check_only else good_path) as good_file, \
+            open(os.devnull if check_only else reject_path, 'a', newline='', encoding='utf-8') as reject_file:
+        reader = csv.reader(f)
+        header = next(reader)
+        if header != validator.header:
+            raise ValueError(f"{path} has columns {header}, expected {validator.header}")
+        good_writer = csv.writer(good_file)
+        reject_writer = csv.writer(reject_file)
+        good_writer.writerow(header)
+        if new_rejects:
+            reject_writer.writerow(header + ['RejectReason'])
+        for rows in _chunks(reader, chunk_size):
+            reason = validator.check(rows)
+            total += len(rows)
+            bad = np.flatnonzero(reason != '')
+            rejected += len(bad)
+            good_writer.writerows(rows[i] for i in np.flatnonzero(reason == ''))
+            reject_writer.writerows(rows[i] + [reason[i]] for i in bad)
+
+    if not check_only:
+        if rejected:
+            os.replace(good_path, path)
+        else:
+            os.remove(good_path)
+            if new_rejects:
+                os.remove(reject_path)
+
+    if quiet:
+        return total, rejected
+    print(f"{path}: {total} rows, {rejected} rejected")
+    for text, count in validator.reasons.most_common():
+        print(f"    {count:>9}  {text}")
+    if validator.partitions:
+        print("    rows per pf_OrderDate partition: "
+              + ', '.join(f"{p}: {count}" for p, count in sorted(validator.partitions.items())))
+    if rejected and not check_only:
+        print(f"    rejected rows moved to {reject_path}")
+    return total, rejected
+
+
+def validate_all(directory='.', tables=None, chunk_size=CHUNK_SIZE, check_only=False, script_path=MASTER_SCRIPT,
+                 data_format='csv'):
+    if data_format == 'columns':
+        raise ValueError("validate_csv.py checks CSV files, not column stores")
+    context = Context(read_constraints(script_path))
+    boundaries = read_boundaries(script_path)
+    rejected = 0
+    for table, name in FILES:
+        file_name = output_path(name, 'csv' if name in PLAIN_FILES else data_format)
+        path = os.path.join(directory, file_name)
+        if not os.path.exists(path):
+            print(f"{path}: missing, skipped (foreign keys into {table.name} are not checked)")
+            continue
+        if tables and not {table.name, name, file_name} & set(tables):
+            # Not selected, but scanned for the IDs that selected files reference.
+            validate_file(table, path, context, boundaries, chunk_size, check_only=True, quiet=True)
+            continue
+        rejected += validate_file(table, path, context, boundaries, chunk_size, check_only)[1]
+    return rejected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the generated CSVs against the schema and quarantine bad rows")
+    parser.add_argument('--dir', default='.', help="directory holding the CSVs (default: current directory)")
+    parser.add_argument('--tables', nargs='+', default=None,
+                        help="only validate and rewrite these tables or files; the files they reference are only read")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f"rows per vectorised check (default: {CHUNK_SIZE})")
+    parser.add_argument('--check-only', action='store_true', help="report only; exit non-zero if any row would be rejected")
+    add_format_argument(parser)
+    args = parser.parse_args()
+    if args.data_format == 'columns':
+        parser.error("validate_csv.py checks CSV files; use --format csv, csv.gz or csv.zst")
+
+    try:
+        rejected = validate_all(args.dir, args.tables, args.chunk_size, args.check_only, data_format=args.data_format)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"\n{rejected} rows rejected in total")
+    if rejected and args.check_only:
+        sys.exit(1)